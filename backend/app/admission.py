@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, fields
+from typing import Deque, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .metrics import admission_in_flight, admission_queued, admission_rejected, admission_wait
+
+
+# Priority classes, highest first: freed slots go to the first class with a
+# waiter, so under overload bulk requests are the ones left to time out
+CLASSES = ("critical", "default", "bulk")
+
+# Rate limits and concurrency slots per priority class; 0 turns them off
+ADMISSION_CONTROL = os.getenv("APP_ADMISSION_CONTROL", "1").lower() in ("1", "true", "yes")
+
+# Route prefixes and their class, longest prefix first. "POST /api/eeg/jobs=bulk"
+# only matches that method; unmatched requests are "default". Uploads of many
+# rows are bulk; single-row predictions from devices stay "default".
+ADMISSION_ROUTES = os.getenv(
+    "APP_ADMISSION_ROUTES",
+    "/api/resources=critical,/api/chat=critical,"
+    "POST /api/eeg/predict/batch=bulk,POST /api/eeg/predict/multi=bulk,"
+    "POST /api/eeg/jobs=bulk,POST /api/eeg/sessions=bulk",
+)
+
+# Requests served at once across every class; the last
+# APP_RESERVED_CONCURRENT of them only go to critical requests. 0 is unlimited.
+ADMISSION_MAX_CONCURRENT = int(os.getenv("APP_MAX_CONCURRENT", "64"))
+ADMISSION_RESERVED = int(os.getenv("APP_RESERVED_CONCURRENT", "16"))
+
+# Per-class limits as "key=value,..." pairs; see ClassLimits
+ADMISSION_LIMITS_SPEC = {
+    "critical": os.getenv("APP_ADMISSION_CRITICAL", "queue=256,timeout=10"),
+    "default": os.getenv("APP_ADMISSION_DEFAULT", "queue=128,timeout=5,rate=50,burst=100"),
+    "bulk": os.getenv("APP_ADMISSION_BULK", "concurrency=4,queue=16,timeout=1,rate=5,burst=20"),
+}
+
+# Clients with a rate-limit bucket; the least recently seen are forgotten first
+ADMISSION_MAX_CLIENTS = int(os.getenv("APP_ADMISSION_MAX_CLIENTS", "10000"))
+
+
+@dataclass
+class ClassLimits:
+    """Limits of one priority class; a 0 turns that limit off."""
+
+    # Requests of the class served at once, within the shared limit
+    concurrency: int = 0
+    # Requests waiting for a slot; more are shed with 503 straight away
+    queue: int = 0
+    # Seconds a request may wait for a slot before it is shed with 503
+    timeout: float = 5.0
+    # Per-client token bucket: requests per second and burst size
+    rate: float = 0.0
+    burst: float = 0.0
+
+
+def parse_limits(spec: str) -> ClassLimits:
+    limits = ClassLimits()
+    types = {f.name: type(getattr(limits, f.name)) for f in fields(ClassLimits)}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.partition("=")
+        key = key.strip()
+        if key not in types:
+            raise ValueError(f"Unknown admission limit {key!r} in {spec!r}")
+        setattr(limits, key, types[key](value.strip()))
+    if limits.rate and limits.burst < 1:
+        limits.burst = max(1.0, limits.rate)
+    return limits
+
+
+def parse_routes(spec: str) -> List[Tuple[str, str, str]]:
+    """``(method, prefix, class)`` rules, longest prefix first; an empty method matches any."""
+    rules = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        target, _, name = item.rpartition("=")
+        method, _, prefix = target.strip().rpartition(" ")
+        name = name.strip()
+        if name not in CLASSES or not prefix.startswith("/"):
+            raise ValueError(f"Invalid admission route {item!r}; expected '[METHOD ]/prefix={'|'.join(CLASSES)}'")
+        rules.append((method.strip().upper(), prefix, name))
+    rules.sort(key=lambda rule: (len(rule[1]), bool(rule[0])), reverse=True)
+    return rules
+
+
+ADMISSION_LIMITS = {name: parse_limits(spec) for name, spec in ADMISSION_LIMITS_SPEC.items()}
+
+
+class RateLimiter:
+    """Token buckets per ``(client, class)`` key, refilled lazily on use."""
+
+    def __init__(self, max_clients: int) -> None:
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: Tuple[str, str], rate: float, burst: float) -> float:
+        """Take a token for ``key``: 0 if there was one, else seconds until there is."""
+        now = time.monotonic()
+        bucket = self._buckets.pop(key, None)
+        tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class Slots:
+    """Concurrency slots shared by the priority classes.
+
+    Non-critical classes stop short of the reserved slots, so crisis
+    resources and chat always find capacity however much EEG work is
+    queued. Waiters are served in priority order, first come first served
+    within a class, and are shed once they have waited their class timeout.
+    """
+
+    def __init__(self, max_concurrent: int, reserved: int, limits: Mapping[str, ClassLimits]) -> None:
+        self.max_concurrent = max_concurrent
+        self.reserved = min(reserved, max_concurrent)
+        self.limits = limits
+        self.in_flight = 0
+        self.active = dict.fromkeys(CLASSES, 0)
+        self.waiting: Dict[str, Deque[asyncio.Future]] = {name: deque() for name in CLASSES}
+
+    def _fits(self, name: str) -> bool:
+        limit = self.limits[name].concurrency
+        if limit and self.active[name] >= limit:
+            return False
+        if not self.max_concurrent:
+            return True
+        shared = self.max_concurrent if name == "critical" else self.max_concurrent - self.reserved
+        return self.in_flight < shared
+
+    def _take(self, name: str) -> None:
+        self.in_flight += 1
+        self.active[name] += 1
+        admission_in_flight.inc(priority=name)
+
+    async def acquire(self, name: str) -> Optional[str]:
+        """Take a slot for a ``name`` request, or return why it was shed."""
+        waiting = self.waiting[name]
+        if not waiting and self._fits(name):
+            self._take(name)
+            return None
+        limits = self.limits[name]
+        if len(waiting) >= limits.queue:
+            return "queue_full"
+        future = asyncio.get_running_loop().create_future()
+        waiting.append(future)
+        admission_queued.inc(priority=name)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait((future,), timeout=limits.timeout or None)
+        except BaseException:
+            # Gone while waiting; a slot handed over meanwhile is passed on
+            if future.cancel():
+                waiting.remove(future)
+            else:
+                self.release(name)
+            raise
+        finally:
+            admission_queued.dec(priority=name)
+        if future.cancel():
+            waiting.remove(future)
+            return "timeout"
+        admission_wait.observe(time.perf_counter() - started, priority=name)
+        return None
+
+    def release(self, name: str) -> None:
+        self.in_flight -= 1
+        self.active[name] -= 1
+        admission_in_flight.dec(priority=name)
+        for waiting_name in CLASSES:
+            waiting = self.waiting[waiting_name]
+            while waiting and self._fits(waiting_name):
+                self._take(waiting_name)
+                waiting.popleft().set_result(None)
+
+
+class AdmissionMiddleware:
+    """Per-client rate limits and prioritized concurrency limits, as pure ASGI.
+
+    Each request is classified by method and path prefix. A client over its
+    class rate gets ``429``; a request that finds no slot waits in its class
+    queue and gets ``503`` when the queue is full or it times out. Both carry
+    ``Retry-After``. Rejected requests are answered before the app reads
+    their body.
+    """
+
+    def __init__(
+        self,
+        app,
+        routes: Sequence[Tuple[str, str, str]],
+        limits: Mapping[str, ClassLimits],
+        max_concurrent: int,
+        reserved: int,
+        max_clients: int = ADMISSION_MAX_CLIENTS,
+    ) -> None:
+        self.app = app
+        self.routes = list(routes)
+        self.limits = limits
+        self.slots = Slots(max_concurrent, reserved, limits)
+        self.rate_limiter = RateLimiter(max_clients)
+
+    def classify(self, method: str, path: str) -> str:
+        for rule_method, prefix, name in self.routes:
+            if path.startswith(prefix) and (not rule_method or rule_method == method):
+                return name
+        return "default"
+
+    async def _reject(self, send, name: str, reason: str, status: int, retry_after: float) -> None:
+        admission_rejected.inc(priority=name, reason=reason)
+        detail = "Too many requests, please slow down" if status == 429 else "Server is busy, please retry shortly"
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = self.classify(scope["method"], scope["path"])
+        limits = self.limits[name]
+        if limits.rate:
+            # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+            client = scope.get("client")
+            wait = self.rate_limiter.take((client[0] if client else "", name), limits.rate, limits.burst)
+            if wait:
+                await self._reject(send, name, "rate_limited", 429, wait)
+                return
+        reason = await self.slots.acquire(name)
+        if reason is not None:
+            await self._reject(send, name, reason, 503, limits.timeout)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.slots.release(name)
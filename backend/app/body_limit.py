@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+from typing import Sequence, Tuple
+
+
+class BodyLimitMiddleware:
+    """Answers ``413`` to request bodies over a per-path-prefix limit.
+
+    A declared ``Content-Length`` is checked before anything is read, so an
+    oversized JSON body is never parsed or validated. Chunked bodies are
+    counted as they arrive and cut off once they pass the limit.
+    """
+
+    def __init__(self, app, limits: Sequence[Tuple[str, int]]) -> None:
+        self.app = app
+        self.limits = list(limits)
+
+    def _limit(self, path: str) -> int:
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return 0
+
+    async def _reject(self, send, limit: int) -> None:
+        body = json.dumps({"detail": f"Request body is larger than {limit} bytes"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send) -> None:
+        limit = self._limit(scope["path"]) if scope["type"] == "http" else 0
+        if limit <= 0:
+            await self.app(scope, receive, send)
+            return
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                if value.isdigit() and int(value) > limit:
+                    await self._reject(send, limit)
+                    return
+                break
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit and not rejected:
+                    rejected = True
+                    await self._reject(send, limit)
+                    # The app sees the client go away and stops reading
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message) -> None:
+            # Once the 413 is out, whatever the app answers is dropped
+            if not rejected:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Optional, Sequence, Tuple, Type, Union
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Select, insert
+from sqlmodel import Session, SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .db import engine, get_async_engine
+from .pagination import naive_utc
+
+
+BulkFormat = Literal["ndjson", "csv"]
+
+_EXTENSIONS = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+
+# Rows per executemany insert and transaction
+IMPORT_BATCH_ROWS = 5000
+
+# Rows fetched per round trip and per streamed chunk on export
+EXPORT_BATCH_ROWS = 1000
+
+# Rejected rows reported back in detail; the rest are only counted
+MAX_IMPORT_ERRORS = 20
+
+# Characters buffered for one CSV record still inside quotes once a chunk
+# ends; past this its quote is taken as unbalanced and the row is rejected
+MAX_CSV_RECORD_CHARS = 1 << 20
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def bulk_format(fmt: Optional[str], filename: Optional[str]) -> BulkFormat:
+    if fmt:
+        return fmt  # type: ignore[return-value]
+    name = (filename or "").lower()
+    for ext, value in _EXTENSIONS.items():
+        if name.endswith(ext):
+            return value  # type: ignore[return-value]
+    raise HTTPException(status_code=400, detail="Please upload a .ndjson/.jsonl or .csv file, or pass format=")
+
+
+class _CsvLines:
+    """Line source for one ``csv.reader`` that spans the whole upload.
+
+    Lines are buffered as chunks arrive; ``complete`` counts those up to the
+    last line that ends outside a quoted field, so the reader is only asked
+    for records it can finish and a quoted newline never splits a row.
+    """
+
+    def __init__(self) -> None:
+        self.lines: "deque[str]" = deque()
+        self.complete = 0
+        # Characters in the lines after ``complete``
+        self.pending = 0
+        self._quoted = False
+
+    def feed(self, text: str, final: bool = False) -> None:
+        # Split on "\n" only, as StringIO did; csv treats the end of every
+        # line it is given as a line break
+        start = 0
+        while start < len(text):
+            end = text.find("\n", start) + 1 or len(text)
+            line = text[start:end]
+            self.lines.append(line)
+            # Quotes toggle quoting; an escaped "" toggles it twice
+            self._quoted ^= line.count('"') % 2 == 1
+            if self._quoted:
+                self.pending += len(line)
+            else:
+                self.complete = len(self.lines)
+                self.pending = 0
+            start = end
+        if final:
+            self.complete = len(self.lines)
+
+    def drop_pending(self) -> int:
+        """Discard the lines after ``complete``; returns how many there were."""
+        count = len(self.lines) - self.complete
+        for _ in range(count):
+            self.lines.pop()
+        self.pending = 0
+        self._quoted = False
+        return count
+
+    def __iter__(self) -> "_CsvLines":
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        self.complete = max(0, self.complete - 1)
+        return self.lines.popleft()
+
+
+async def iter_records(file: UploadFile, fmt: BulkFormat) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield ``(line, record)`` pairs.
+
+    NDJSON records are the raw line, left for pydantic to parse; CSV records
+    are dicts keyed by the header row. A ``None`` record is a CSV row dropped
+    for being longer than :data:`MAX_CSV_RECORD_CHARS`.
+    """
+    # Imported here so the CRUD routers do not load numpy with eeg_io
+    from .eeg_io import iter_csv_text
+
+    if fmt == "ndjson":
+        line = 0
+        async for text in iter_csv_text(file):
+            # Only "\n" ends a record; str.splitlines would also split on
+            # U+2028 and the like, which JSON strings may hold unescaped
+            raws = text.split("\n")
+            if not raws[-1]:
+                raws.pop()
+            for raw in raws:
+                line += 1
+                raw = raw.removesuffix("\r")
+                if raw.strip():
+                    yield line, raw
+        return
+
+    # One reader for the whole upload, so a quoted field may span chunks;
+    # line_num counts physical lines, so quoted newlines keep numbers right;
+    # ``dropped`` adds those of rejected rows the reader never saw
+    lines = _CsvLines()
+    dropped = 0
+    reader = csv.reader(lines)
+    header: Optional[List[str]] = None
+    chunks = iter_csv_text(file)
+    final = False
+    while not final:
+        try:
+            lines.feed(await chunks.__anext__())
+        except StopAsyncIteration:
+            lines.feed("", final=True)
+            final = True
+        while lines.complete:
+            row = next(reader, None)
+            if row is None:
+                break
+            if header is None:
+                header = [h.strip().lstrip("\ufeff") for h in row]
+                continue
+            if not any(cell.strip() for cell in row):
+                continue
+            # Blank CSV cells mean "not given", like a missing JSON key
+            yield reader.line_num + dropped, {k: v for k, v in zip(header, row) if v != ""}
+        # Every finished record has been read, so the reader is between rows
+        if lines.pending > MAX_CSV_RECORD_CHARS:
+            line = reader.line_num + dropped + 1
+            dropped += lines.drop_pending()
+            yield line, None
+
+
+def insert_batch(
+    session: Session,
+    model: Type[SQLModel],
+    rows: List[Dict[str, Any]],
+    on_batch: Optional[Callable[[Session, List[Dict[str, Any]]], None]] = None,
+) -> None:
+    """One executemany INSERT and one commit; ``on_batch`` updates derived tables in the same transaction."""
+    session.execute(insert(model), rows)
+    if on_batch is not None:
+        on_batch(session, rows)
+    session.commit()
+
+
+async def import_rows(
+    session: Union[Session, AsyncSession],
+    file: UploadFile,
+    fmt: BulkFormat,
+    model: Type[SQLModel],
+    schema: Type[BaseModel],
+    on_batch: Optional[Callable[[Session, List[Dict[str, Any]]], None]] = None,
+) -> Dict[str, Any]:
+    """Validate records against ``schema`` and insert them ``IMPORT_BATCH_ROWS`` at a time.
+
+    Batches are written off the event loop: in the threadpool for a sync
+    session, through the driver for an async one. Invalid rows are skipped
+    and reported.
+    """
+    imported = 0
+    rejected = 0
+    errors: List[Dict[str, Any]] = []
+    batch: List[Dict[str, Any]] = []
+
+    async def flush(rows: List[Dict[str, Any]]) -> None:
+        if isinstance(session, AsyncSession):
+            await session.run_sync(insert_batch, model, rows, on_batch)
+        else:
+            await run_in_threadpool(insert_batch, session, model, rows, on_batch)
+
+    async for line, record in iter_records(file, fmt):
+        if record is None:
+            rejected += 1
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append({"line": line, "error": f"Row is longer than {MAX_CSV_RECORD_CHARS} characters; is a quote unbalanced?"})
+            continue
+        try:
+            if isinstance(record, str):
+                row = schema.model_validate_json(record).model_dump()
+            else:
+                row = schema.model_validate(record).model_dump()
+        except ValidationError as exc:
+            rejected += 1
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append({"line": line, "error": exc.errors()[0]["msg"]})
+            continue
+        # Column defaults do not apply to executemany parameters
+        row["created_at"] = naive_utc(row["created_at"]) or datetime.utcnow()
+        batch.append(row)
+        if len(batch) >= IMPORT_BATCH_ROWS:
+            await flush(batch)
+            imported += len(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+        imported += len(batch)
+    return {"imported": imported, "rejected": rejected, "errors": errors}
+
+
+def _plain(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _export_statement(model: Type[SQLModel], fields: Sequence[str]) -> Select:
+    return (
+        select(*(getattr(model, f) for f in fields))
+        .order_by(model.created_at, model.id)  # type: ignore[attr-defined]
+        .execution_options(yield_per=EXPORT_BATCH_ROWS)
+    )
+
+
+def _export_header(fields: Sequence[str]) -> bytes:
+    return (",".join(fields) + "\r\n").encode("utf-8")
+
+
+def _export_chunk(fields: Sequence[str], rows: Sequence[Any], fmt: BulkFormat) -> bytes:
+    out = io.StringIO()
+    if fmt == "csv":
+        csv.writer(out).writerows([_plain(v) for v in row] for row in rows)
+    else:
+        for row in rows:
+            out.write(json.dumps({f: _plain(v) for f, v in zip(fields, row)}) + "\n")
+    return out.getvalue().encode("utf-8")
+
+
+def export_rows(model: Type[SQLModel], fields: Sequence[str], fmt: BulkFormat) -> Iterator[bytes]:
+    """Stream every row of ``model`` oldest first, one chunk per batch.
+
+    Rows come from a single server-side cursor (``yield_per``), so memory
+    stays bounded by ``EXPORT_BATCH_ROWS``. The generator owns its session
+    because it outlives the request's dependencies.
+    """
+    with Session(engine) as session:
+        if fmt == "csv":
+            yield _export_header(fields)
+        for partition in session.execute(_export_statement(model, fields)).partitions():
+            yield _export_chunk(fields, partition, fmt)
+
+
+async def export_rows_async(model: Type[SQLModel], fields: Sequence[str], fmt: BulkFormat) -> AsyncIterator[bytes]:
+    """:func:`export_rows` on the async engine."""
+    async with AsyncSession(get_async_engine()) as session:
+        if fmt == "csv":
+            yield _export_header(fields)
+        result = await session.stream(_export_statement(model, fields))
+        async for partition in result.partitions():
+            yield _export_chunk(fields, partition, fmt)
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+from .metrics import chat_cache_lookups, chat_cache_saved_seconds, chat_cache_saved_tokens, registry
+from .models import ChatResponse
+
+
+# Model replies kept in memory; 0 entries turns the cache off
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "512"))
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", "3600"))
+
+# Messages mentioning any of these always get a fresh reply. Matched as word
+# prefixes of the normalized text, so "overdosed" and "Self-harm!" count;
+# a false match only costs an uncached call.
+CRISIS_KEYWORDS = (
+    "suicide",
+    "suicidal",
+    "kill myself",
+    "killing myself",
+    "end my life",
+    "end it all",
+    "want to die",
+    "better off dead",
+    "self harm",
+    "selfharm",
+    "hurt myself",
+    "harm myself",
+    "cut myself",
+    "cutting myself",
+    "overdose",
+    "no reason to live",
+    "kill someone",
+    "hurt someone",
+    "harm others",
+)
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+_CRISIS = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in CRISIS_KEYWORDS) + ")")
+
+
+def normalize(text: str) -> str:
+    """Case-, width- and punctuation-insensitive form of ``text``.
+
+    "I feel anxious..." and "i feel  ANXIOUS" normalize alike, as do
+    "can't" and "cant". Hyphens become spaces so "self-harm" still matches
+    its keyword.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold().replace("-", " ")
+    text = _PUNCTUATION.sub("", text.replace("’", "'"))
+    return _SPACES.sub(" ", text).strip()
+
+
+def is_crisis(texts: Iterable[str]) -> bool:
+    return any(_CRISIS.search(normalize(text)) for text in texts)
+
+
+def chat_key(model: str, messages: Sequence[dict]) -> str:
+    """Cache key over the model and the prompt messages, normalized.
+
+    ``messages`` are what goes upstream: the system prompt, any history
+    summary, the recent turns and the new message.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(model.encode("utf-8") + b"\0")
+    for m in messages:
+        digest.update(f"{m['role']}\0{normalize(m['content'])}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _Entry:
+    __slots__ = ("response", "expires_at", "seconds", "tokens")
+
+    def __init__(self, response: ChatResponse, expires_at: float, seconds: float, tokens: int) -> None:
+        self.response = response
+        self.expires_at = expires_at
+        # What producing the reply cost, credited again on every hit
+        self.seconds = seconds
+        self.tokens = tokens
+
+
+class ChatCache:
+    """LRU with TTL of model replies, plus coalescing of identical misses.
+
+    The first miss for a key starts the upstream call as its own task;
+    identical requests arriving before it finishes wait on that task
+    instead of calling upstream again. A waiter that disconnects does not
+    cancel the call for the others. Failures are not cached, so each
+    waiter falls back on its own and the next request retries.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _hit(self, entry: _Entry) -> ChatResponse:
+        self.hits += 1
+        chat_cache_lookups.inc(outcome="hit")
+        chat_cache_saved_seconds.inc(entry.seconds)
+        chat_cache_saved_tokens.inc(entry.tokens)
+        return entry.response
+
+    def _miss(self) -> None:
+        self.misses += 1
+        chat_cache_lookups.inc(outcome="miss")
+
+    def get(self, key: str) -> Optional[ChatResponse]:
+        entry = self._lookup(key)
+        if entry is None:
+            self._miss()
+            return None
+        return self._hit(entry)
+
+    def put(self, key: str, response: ChatResponse, seconds: float = 0.0, tokens: int = 0) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = _Entry(response, time.monotonic() + self.ttl, seconds, tokens)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def bypass(self) -> None:
+        self.bypassed += 1
+        chat_cache_lookups.inc(outcome="bypass")
+
+    async def get_or_call(self, key: str, call: Callable[[], Awaitable[Tuple[ChatResponse, int]]]) -> ChatResponse:
+        """Cached reply for ``key``, or the result of ``call`` (reply and tokens used)."""
+        entry = self._lookup(key)
+        if entry is not None:
+            return self._hit(entry)
+        task = self._in_flight.get(key)
+        if task is None:
+            self._miss()
+            task = self._in_flight[key] = asyncio.ensure_future(self._call(key, call))
+            task.add_done_callback(lambda done: self._done(key, done))
+            return await asyncio.shield(task)
+        self.coalesced += 1
+        chat_cache_lookups.inc(outcome="coalesced")
+        response = await asyncio.shield(task)
+        entry = self._entries.get(key)
+        if entry is not None:
+            # Waited for the reply, but did not pay for it again
+            chat_cache_saved_tokens.inc(entry.tokens)
+        return response
+
+    async def _call(self, key: str, call: Callable[[], Awaitable[Tuple[ChatResponse, int]]]) -> ChatResponse:
+        start = time.perf_counter()
+        response, tokens = await call()
+        self.put(key, response, time.perf_counter() - start, tokens)
+        return response
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        self._in_flight.pop(key, None)
+        # Retrieved here in case every waiter has gone; each one that is
+        # still there gets the exception from its own await
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            # Coalesced requests also skipped an upstream call
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+        }
+
+
+chat_cache = ChatCache(CHAT_CACHE_MAX_ENTRIES, CHAT_CACHE_TTL_SECONDS)
+registry.gauge("chat_cache_entries", "Model replies held by the chat cache.", function=lambda: len(chat_cache))
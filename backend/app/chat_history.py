@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from .chat_cache import is_crisis
+from .db import session_scope
+from .metrics import chat_prompt_tokens, chat_turns_compacted
+from .models import ChatConversation, ChatRequest
+
+
+# Largest chat request body; bigger ones get 413 before they are parsed
+CHAT_MAX_BODY_BYTES = int(os.getenv("CHAT_MAX_BODY_BYTES", str(256 << 10)))
+
+# Estimated tokens of history sent upstream verbatim; older turns are
+# compacted into a summary
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "1500"))
+
+# Estimated tokens of that summary; its oldest lines are dropped beyond this
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
+
+# Characters of each compacted turn kept in the summary
+_SUMMARY_LINE_CHARS = 160
+
+# Per-message framing the chat API adds on top of the content
+_MESSAGE_OVERHEAD = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+Turn = Tuple[str, str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about four characters per token for English text.
+
+    Only used to bound prompt size, so a tokenizer dependency is not worth
+    its import time.
+    """
+    return (len(text) + 3) // 4 + _MESSAGE_OVERHEAD
+
+
+def _turn_digest(previous: Optional[Turn], turn: Turn) -> str:
+    # Keyed on the turn and the one before it, so a repeated "ok" is not
+    # mistaken for an earlier one
+    digest = hashlib.blake2b(digest_size=12)
+    for role, content in (previous or ("", ""), turn):
+        digest.update(f"{role}\0{content}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _summary_line(turn: Turn) -> str:
+    role, content = turn
+    text = _SENTENCE_END.split(" ".join(content.split()), 1)[0]
+    if len(text) > _SUMMARY_LINE_CHARS:
+        text = text[: _SUMMARY_LINE_CHARS - 1].rstrip() + "…"
+    return f"{'User' if role == 'user' else 'Assistant'}: {text}"
+
+
+def _fold(summary: str, turns: Sequence[Turn]) -> str:
+    """Append one line per turn, then drop the oldest lines beyond the summary budget."""
+    lines = summary.split("\n") if summary else []
+    lines.extend(_summary_line(t) for t in turns)
+    used = sum(estimate_tokens(line) for line in lines)
+    start = 0
+    while used > CHAT_SUMMARY_TOKEN_BUDGET and start < len(lines) - 1:
+        used -= estimate_tokens(lines[start])
+        start += 1
+    return "\n".join(lines[start:])
+
+
+@dataclass
+class CompactedHistory:
+    messages: List[dict]
+    # Whether a compacted user turn mentioned a crisis; the recent ones are
+    # still in ``messages``
+    crisis: bool = False
+
+
+def _split(turns: List[Turn]) -> int:
+    """Index of the first turn kept verbatim: the newest turns that fit the budget.
+
+    The latest turn is always kept.
+    """
+    used = 0
+    for index in range(len(turns) - 1, -1, -1):
+        used += estimate_tokens(turns[index][1])
+        if used > CHAT_HISTORY_TOKEN_BUDGET and index < len(turns) - 1:
+            return index + 1
+    return 0
+
+
+def _stored_summary(conversation_id: str, older: List[Turn]) -> Tuple[str, bool]:
+    # Only turns after the last one folded in are summarized, found by
+    # scanning back from the newest; anything else rebuilds from ``older``
+    with session_scope() as session:
+        state = session.get(ChatConversation, conversation_id)
+        start = 0
+        summary = ""
+        # Sticky: a rebuilt summary may no longer see the turn that set it
+        crisis = state is not None and state.crisis
+        if state is not None:
+            for index in range(len(older) - 1, -1, -1):
+                if _turn_digest(older[index - 1] if index else None, older[index]) == state.last_turn:
+                    start = index + 1
+                    summary = state.summary
+                    break
+        new = older[start:]
+        if not new and state is not None:
+            return summary, crisis
+        summary = _fold(summary, new)
+        crisis = crisis or is_crisis(content for role, content in new if role == "user")
+        chat_turns_compacted.inc(len(new))
+        last = _turn_digest(older[-2] if len(older) > 1 else None, older[-1])
+        if state is None:
+            state = ChatConversation(id=conversation_id, last_turn=last, summary=summary, crisis=crisis)
+        else:
+            state.last_turn, state.summary, state.crisis = last, summary, crisis
+            state.updated_at = datetime.utcnow()
+        session.add(state)
+        return summary, crisis
+
+
+def compact_history(req: ChatRequest) -> CompactedHistory:
+    """History messages to send upstream for ``req``, within the token budgets.
+
+    Turns that fit :data:`CHAT_HISTORY_TOKEN_BUDGET` are sent verbatim;
+    older ones are replaced by a system message summarizing them. With a
+    ``conversation_id`` the summary is stored and extended incrementally,
+    so a turn costs the same however long the conversation is; without one
+    it is rebuilt from the request's history every time.
+    """
+    turns: List[Turn] = [
+        (m.role, m.content) for m in req.history or () if m.role in {"user", "assistant"} and m.content
+    ]
+    split = _split(turns)
+    messages = [{"role": role, "content": content} for role, content in turns[split:]]
+    result = CompactedHistory(messages)
+    if split:
+        older = turns[:split]
+        if req.conversation_id:
+            summary, result.crisis = _stored_summary(req.conversation_id, older)
+        else:
+            summary = _fold("", older)
+            result.crisis = is_crisis(content for role, content in older if role == "user")
+            chat_turns_compacted.inc(len(older))
+        messages.insert(0, {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    chat_prompt_tokens.observe(sum(estimate_tokens(m["content"]) for m in messages) + estimate_tokens(req.message))
+    return result
@@ -1,29 +1,300 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import inspect
 import os
+import sqlite3
+import threading
+import zlib
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, AsyncGenerator, Callable, Generator, Optional
 
+from fastapi.routing import APIRoute
+from sqlalchemy import Connection, Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import ConnectionPoolEntry, QueuePool
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.util import await_only
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .metrics import instrument_engine
 
 
 DB_PATH = os.getenv("APP_DB_PATH", os.path.join(os.path.dirname(__file__), "app.db"))
 DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
+
+# Serve the mood and journal routers from an aiosqlite engine on the event
+# loop instead of the threadpool
+DB_ASYNC = os.getenv("APP_DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+# "production" enables WAL and the pragmas below; "basic" is plain SQLite
+# with SQLAlchemy's default pool
+DB_PROFILE = os.getenv("APP_DB_PROFILE", "production")
+
+# Connect-time pragmas of the production profile
+DB_SYNCHRONOUS = os.getenv("APP_DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_KIB = int(os.getenv("APP_DB_CACHE_KIB", str(64 << 10)))
+DB_MMAP_BYTES = int(os.getenv("APP_DB_MMAP_BYTES", str(256 << 20)))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("APP_DB_BUSY_TIMEOUT_MS", "5000"))
+
+# One connection per worker thread; 40 is the size of uvicorn's threadpool
+DB_POOL_SIZE = int(os.getenv("APP_DB_POOL_SIZE", "40"))
+# Extra connections beyond DB_POOL_SIZE for the event loop's own sessions;
+# -1 is unbounded. Sync handlers give theirs back before their response is
+# validated (see SessionRoute), so a cap cannot deadlock the threadpool.
+DB_POOL_OVERFLOW = int(os.getenv("APP_DB_POOL_OVERFLOW", "40"))
+DB_POOL_TIMEOUT = float(os.getenv("APP_DB_POOL_TIMEOUT", "30"))
+
+_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def _apply_pragmas(dbapi_connection: sqlite3.Connection, _record: object) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        # WAL lets readers run alongside the single writer; it is persistent,
+        # so after the first connection this is a no-op
+        cursor.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable against application crashes in WAL mode and
+        # skips an fsync per commit
+        cursor.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size={-DB_CACHE_KIB}")
+        cursor.execute(f"PRAGMA mmap_size={DB_MMAP_BYTES}")
+        cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+class _WriterLock:
+    """``threading.Lock`` that the thread holding it may not wait on.
+
+    It is held from a session's first write until its commit, so a second
+    session writing on the same thread, such as a nested
+    :func:`session_scope`, would wait on itself until the busy timeout.
+    That is a bug, and raises at once instead.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._owner: Optional[int] = None
+
+    def acquire(self, timeout: float) -> bool:
+        if self._owner == threading.get_ident():
+            raise RuntimeError("This thread already has a write transaction open; commit it before writing in another session")
+        if not self._lock.acquire(timeout=timeout):
+            return False
+        self._owner = threading.get_ident()
+        return True
+
+    def release(self) -> None:
+        self._owner = None
+        self._lock.release()
+
+
+# SQLite has a single writer. Writers in this process queue on a lock
+# instead of polling in SQLite's busy handler, whose growing sleeps starve
+# some of them under load; busy_timeout still covers other processes.
+_write_lock = _WriterLock()
+
+_WRITE_VERBS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def _starts_write(conn: Connection, statement: str) -> bool:
+    return "writer" not in conn.info and statement.lstrip().upper().startswith(_WRITE_VERBS)
+
+
+def _acquire_writer(conn: Connection, _cursor: object, statement: str, *_args: object) -> None:
+    if not _starts_write(conn, statement):
+        return
+    if not _write_lock.acquire(timeout=DB_BUSY_TIMEOUT_MS / 1000):
+        raise sqlite3.OperationalError("database is locked")
+    conn.info["writer"] = _write_lock
+
+
+def _async_writer_hook(lock: asyncio.Lock) -> Callable[..., None]:
+    # Async engines run these hooks inside SQLAlchemy's greenlet, where
+    # await_only suspends just this request rather than the event loop.
+    # Without a threadpool in front, this lock is the queue of writers, so
+    # it is waited on as long as a pooled connection would be.
+    def acquire(conn: Connection, _cursor: object, statement: str, *_args: object) -> None:
+        if not _starts_write(conn, statement):
+            return
+        try:
+            await_only(asyncio.wait_for(lock.acquire(), DB_POOL_TIMEOUT))
+        except asyncio.TimeoutError:
+            raise sqlite3.OperationalError("database is locked")
+        conn.info["writer"] = lock
+
+    return acquire
+
+
+def _release_writer(conn: Connection) -> None:
+    lock = conn.info.pop("writer", None)
+    if lock is not None:
+        lock.release()
+
+
+def _release_on_checkin(_dbapi_connection: object, record: ConnectionPoolEntry) -> None:
+    # A connection returned to the pool mid-transaction is rolled back
+    lock = record.info.pop("writer", None)
+    if lock is not None:
+        lock.release()
+
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+def _listen_writer_lock(target: Engine, acquire: Callable[..., None]) -> None:
+    event.listen(target, "before_cursor_execute", acquire)
+    event.listen(target, "commit", _release_writer)
+    event.listen(target, "rollback", _release_writer)
+    event.listen(target.pool, "checkin", _release_on_checkin)
+
+
+def _check_profile(profile: str) -> None:
+    if profile not in ("basic", "production"):
+        raise ValueError(f"Unknown APP_DB_PROFILE {profile!r}")
+    if DB_SYNCHRONOUS.upper() not in _SYNCHRONOUS_MODES:
+        raise ValueError(f"APP_DB_SYNCHRONOUS must be one of {', '.join(_SYNCHRONOUS_MODES)}")
+
+
+def build_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE) -> Engine:
+    """Create the SQLite engine for ``profile`` ("production" or "basic")."""
+    _check_profile(profile)
+    if profile == "basic":
+        return create_engine(url, connect_args={"check_same_thread": False})
+    prod_engine = create_engine(
+        url,
+        # busy_timeout below takes over from the driver's lock wait
+        connect_args={"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT_MS / 1000},
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_POOL_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    event.listen(prod_engine, "connect", _apply_pragmas)
+    _listen_writer_lock(prod_engine, _acquire_writer)
+    return prod_engine
+
+
+def build_async_engine(url: str = ASYNC_DATABASE_URL, profile: str = DB_PROFILE) -> AsyncEngine:
+    """Async counterpart of :func:`build_engine` on aiosqlite.
+
+    Each connection runs SQLite in its own driver thread, so queries never
+    block the event loop. Writers queue on an ``asyncio.Lock`` of their own;
+    the sync engine's writers are only ordered by ``busy_timeout``.
+    """
+    _check_profile(profile)
+    if profile == "basic":
+        return create_async_engine(url)
+    async_engine = create_async_engine(
+        url,
+        connect_args={"timeout": DB_BUSY_TIMEOUT_MS / 1000},
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_POOL_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    event.listen(async_engine.sync_engine, "connect", _apply_pragmas)
+    _listen_writer_lock(async_engine.sync_engine, _async_writer_hook(asyncio.Lock()))
+    return async_engine
+
+
+engine = build_engine()
+instrument_engine(engine)
+
+# Built on first use so the sync mode does not need aiosqlite
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = build_async_engine()
+        instrument_engine(_async_engine.sync_engine)
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
 
 
 def create_db_and_tables() -> None:
     SQLModel.metadata.create_all(engine)
 
 
-def get_session() -> Generator[Session, None, None]:
+def schema_version(*extra_ddl: str) -> int:
+    """Fingerprint of every table and index definition plus ``extra_ddl``.
+
+    Kept in SQLite's 31-bit ``user_version`` header field, so a database
+    whose stamp matches needs no reflection at startup. Any model change
+    alters the DDL and so the version.
+    """
+    parts = []
+    for table in SQLModel.metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=engine.dialect)))
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            parts.append(str(CreateIndex(index).compile(dialect=engine.dialect)))
+    parts.extend(extra_ddl)
+    # 0 is SQLite's "never stamped"
+    return zlib.crc32("\n".join(parts).encode("utf-8")) & 0x7FFFFFFF or 1
+
+
+def stored_schema_version() -> int:
+    with engine.connect() as conn:
+        return int(conn.exec_driver_sql("PRAGMA user_version").scalar() or 0)
+
+
+def stamp_schema_version(version: int) -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+async def get_session() -> AsyncGenerator[Session, None]:
+    # Opened and closed on the event loop, saving two threadpool hops per
+    # request; the handler itself still runs in the threadpool
     with Session(engine) as session:
         yield session
 
 
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(get_async_engine()) as session:
+        yield session
+
+
+def _closing_sessions(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(endpoint)
+    def run(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            for value in kwargs.values():
+                if isinstance(value, Session):
+                    value.close()
+
+    return run
+
+
+class SessionRoute(APIRoute):
+    """Closes the :func:`get_session` session as soon as a sync endpoint returns.
+
+    FastAPI validates a sync endpoint's response in the threadpool too, so
+    a session left open until then holds its connection while waiting for
+    a slot, and the slots may all be held by handlers waiting for a
+    connection. Returned objects keep the attributes already loaded.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = _closing_sessions(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
 @contextmanager
 def session_scope() -> Generator[Session, None, None]:
+    # Never nest a writing session_scope inside another on one thread; see _WriterLock
     session = Session(engine)
     try:
         yield session
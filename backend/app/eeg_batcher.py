@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+
+from .eeg_models import ModelSpec, ModelUnavailable, predict_with_models
+from .metrics import (
+    eeg_batch_flushes,
+    eeg_batch_rows,
+    eeg_batch_wait,
+    eeg_request_score_time,
+    eeg_unit_score_time,
+    registry,
+)
+
+
+# How long the first row of a batch waits for others; 0 scores every request
+# on its own
+EEG_BATCH_WINDOW_MS = float(os.getenv("EEG_BATCH_WINDOW_MS", "2"))
+
+# A batch is scored as soon as it has this many rows
+EEG_BATCH_MAX_ROWS = int(os.getenv("EEG_BATCH_MAX_ROWS", "64"))
+
+
+class _Batch:
+    __slots__ = ("rows", "futures", "arrived", "timer")
+
+    def __init__(self) -> None:
+        self.rows: List[np.ndarray] = []
+        self.futures: List[asyncio.Future] = []
+        self.arrived: List[float] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions into one matrix.
+
+    Rows are grouped by model spec, so a hot swap never mixes versions in
+    one batch. A batch is scored when it reaches ``max_rows`` or when its
+    first row has waited ``window`` seconds, whichever comes first; no
+    request waits longer than the window before scoring starts. Scoring is
+    per row, so results are the same as scoring each row alone.
+    """
+
+    def __init__(self, window: float, max_rows: int) -> None:
+        self.window = window
+        self.max_rows = max_rows
+        self.pending = 0
+        self._open: Dict[ModelSpec, _Batch] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_rows > 1
+
+    async def predict(self, row: np.ndarray, spec: ModelSpec) -> dict:
+        """Result for the ``(1, NUM_FEATURES)`` matrix ``row`` under ``spec``."""
+        if not self.enabled:
+            return self._score([row], spec)[0]
+        loop = asyncio.get_running_loop()
+        batch = self._open.get(spec)
+        if batch is None:
+            batch = self._open[spec] = _Batch()
+            batch.timer = loop.call_later(self.window, self._flush, spec, batch, "window")
+        future = loop.create_future()
+        batch.rows.append(row)
+        batch.futures.append(future)
+        batch.arrived.append(time.perf_counter())
+        self.pending += 1
+        if len(batch.rows) >= self.max_rows:
+            self._flush(spec, batch, "full")
+        return await future
+
+    def _flush(self, spec: ModelSpec, batch: _Batch, reason: str) -> None:
+        if self._open.get(spec) is batch:
+            del self._open[spec]
+        if batch.timer is not None:
+            batch.timer.cancel()
+        self.pending -= len(batch.rows)
+        now = time.perf_counter()
+        for arrived in batch.arrived:
+            eeg_batch_wait.observe(now - arrived)
+        eeg_batch_rows.observe(len(batch.rows))
+        eeg_batch_flushes.inc(reason=reason)
+        try:
+            results = self._score(batch.rows, spec)
+        except Exception as exc:
+            # Handed to every waiting request
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        # A request that was cancelled meanwhile just drops its result
+        for future, result in zip(batch.futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _score(self, rows: List[np.ndarray], spec: ModelSpec) -> List[dict]:
+        matrix = rows[0] if len(rows) == 1 else np.concatenate(rows)
+        start = time.perf_counter()
+        try:
+            results = predict_with_models(matrix, [spec.target], {spec.target: spec})[spec.target]
+        except ModelUnavailable as exc:
+            raise HTTPException(status_code=409, detail=str(exc))
+        elapsed = time.perf_counter() - start
+        eeg_unit_score_time.observe(elapsed)
+        # Every request in the batch waited on the whole of it
+        for _ in rows:
+            eeg_request_score_time.observe(elapsed)
+        return results  # type: ignore[return-value]
+
+
+batcher = MicroBatcher(EEG_BATCH_WINDOW_MS / 1000.0, EEG_BATCH_MAX_ROWS)
+registry.gauge("eeg_batch_pending_rows", "Single-row EEG predictions waiting for their batch.", function=lambda: batcher.pending)
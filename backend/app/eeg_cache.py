@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import UploadFile
+
+from .metrics import registry
+
+
+# In-memory tier bounds
+EEG_CACHE_MAX_ENTRIES = int(os.getenv("EEG_CACHE_MAX_ENTRIES", "256"))
+EEG_CACHE_MAX_BYTES = int(os.getenv("EEG_CACHE_MAX_BYTES", str(64 << 20)))
+EEG_CACHE_TTL_SECONDS = float(os.getenv("EEG_CACHE_TTL_SECONDS", "3600"))
+
+# Optional on-disk tier that survives restarts; disabled when unset
+EEG_CACHE_DIR = os.getenv("EEG_CACHE_DIR")
+
+# Bytes the disk tier may hold; the oldest files are removed past it. 0 is unlimited.
+EEG_CACHE_DIR_MAX_BYTES = int(os.getenv("EEG_CACHE_DIR_MAX_BYTES", str(1 << 30)))
+
+_READ_SIZE = 1 << 20
+
+
+async def upload_key(file: UploadFile, *parts: Optional[str]) -> str:
+    """Content address of ``file`` plus request ``parts`` (endpoint, target, ...).
+
+    The upload is hashed in chunks and rewound so it can still be scored on a
+    miss.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        digest.update((part or "").encode("utf-8") + b"\0")
+    while True:
+        chunk = await file.read(_READ_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    await file.seek(0)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """LRU of rendered prediction responses with TTL and an optional disk tier.
+
+    Values are the JSON bytes already sent to a client, so a hit skips
+    parsing, scoring and serialization. The disk tier is kept under
+    ``disk_max_bytes`` by removing the oldest files first.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl: float,
+        directory: Optional[str] = None,
+        disk_max_bytes: int = 0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.size = 0
+        self.disk_size = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        # Sizes of the disk tier's files, oldest first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory or "", f"{key}.json")
+
+    def _evict(self, key: str) -> None:
+        _, body = self._entries.pop(key)
+        self.size -= len(body)
+
+    def _store(self, key: str, body: bytes, expires_at: float) -> None:
+        if key in self._entries:
+            self._evict(key)
+        if len(body) > self.max_bytes or self.max_entries <= 0:
+            return
+        self._entries[key] = (expires_at, body)
+        self.size += len(body)
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def _scan_disk(self) -> None:
+        assert self.directory is not None
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime_ns, entry.name[: -len(".json")], st.st_size))
+        files.sort()
+        self._disk = OrderedDict((key, size) for _, key, size in files)
+        self.disk_size = sum(self._disk.values())
+
+    def _forget_disk(self, key: str) -> None:
+        self.disk_size -= self._disk.pop(key, 0)
+
+    def _remove_disk(self, key: str) -> None:
+        self._forget_disk(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _trim_disk(self) -> None:
+        if not self.disk_max_bytes or self.disk_size <= self.disk_max_bytes:
+            return
+        # Other workers may write to the same directory; count their files too
+        self._scan_disk()
+        while self._disk and self.disk_size > self.disk_max_bytes:
+            self._remove_disk(next(iter(self._disk)))
+
+    def _get_disk(self, key: str, now: float) -> Optional[Tuple[float, bytes]]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            expires_at = os.path.getmtime(path) + self.ttl
+            if expires_at <= now:
+                self._remove_disk(key)
+                return None
+            with open(path, "rb") as fh:
+                return expires_at, fh.read()
+        except OSError:
+            # Evicted by another worker sharing the directory, or never written
+            self._forget_disk(key)
+            return None
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, body = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self._evict(key)
+        disk = self._get_disk(key, time.time())
+        if disk is not None:
+            expires_at, body = disk
+            # Disk expiry is wall-clock; convert to the monotonic clock
+            self._store(key, body, now + (expires_at - time.time()))
+            self.hits += 1
+            self.disk_hits += 1
+            return body
+        self.misses += 1
+        return None
+
+    def put(self, key: str, body: bytes) -> None:
+        self._store(key, body, time.monotonic() + self.ttl)
+        if not self.directory or (self.disk_max_bytes and len(body) > self.disk_max_bytes):
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as fh:
+                fh.write(body)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        # Rewritten files move to the newest end
+        self._forget_disk(key)
+        self._disk[key] = len(body)
+        self.disk_size += len(body)
+        self._trim_disk()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "disk_files": len(self._disk),
+            "disk_bytes": self.disk_size,
+        }
+
+
+prediction_cache = PredictionCache(
+    EEG_CACHE_MAX_ENTRIES, EEG_CACHE_MAX_BYTES, EEG_CACHE_TTL_SECONDS, EEG_CACHE_DIR, EEG_CACHE_DIR_MAX_BYTES,
+)
+registry.counter("eeg_prediction_cache_hits_total", "EEG prediction cache hits.", function=lambda: prediction_cache.hits)
+registry.counter("eeg_prediction_cache_misses_total", "EEG prediction cache misses.", function=lambda: prediction_cache.misses)
+registry.gauge("eeg_prediction_cache_bytes", "Bytes held by the in-memory EEG prediction cache.", function=lambda: prediction_cache.size)
+registry.gauge("eeg_prediction_cache_disk_bytes", "Bytes held by the EEG prediction cache's disk tier.", function=lambda: prediction_cache.disk_size)
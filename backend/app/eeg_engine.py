@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import io
+import csv
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Tuple, Union, get_args
+
+import numpy as np
+
+
+NUM_FEATURES = 1024
+
+# Parsed feature rows are kept in double precision so that vectorized scores
+# round exactly like the original per-row Python arithmetic.
+FEATURE_DTYPE = np.float64
+
+# Rows reduced per block in compute_stats; small enough to stay in cache.
+_STATS_BLOCK_ROWS = 64
+
+
+TargetType = Literal[
+    "depression",
+    "severity",
+    "anxiety",
+    "stress",
+    "ptsd",
+    "ocd",
+    "adhd",
+    "burnout",
+    "insomnia",
+    "wellbeing",
+]
+
+ALL_TARGETS: tuple = get_args(TargetType)
+
+PROBABILITY_TARGETS = {"depression", "anxiety", "ptsd", "ocd", "adhd"}
+
+# Inclusive output scale of every non-probability target
+SCORE_RANGES = {
+    "severity": (0, 10),
+    "stress": (0, 100),
+    "burnout": (0, 100),
+    "insomnia": (0, 10),
+    "wellbeing": (0, 100),
+}
+
+# Label pairs (positive, negative) for probability targets
+_LABELS = {
+    "depression": ("Depressed", "Not Depressed"),
+    "anxiety": ("Anxious", "Calm"),
+    "ptsd": ("PTSD Risk", "Low Risk"),
+    "ocd": ("OCD Traits", "Low Traits"),
+    "adhd": ("ADHD Traits", "Low Traits"),
+}
+
+
+# A block of work: a feature matrix, or CSV text with a flag telling whether
+# its first row is the file header.
+FeatureUnit = Union[np.ndarray, Tuple[str, bool]]
+
+
+@dataclass
+class FeatureStats:
+    """Per-row statistics shared by every target's heuristic."""
+
+    mean: np.ndarray
+    var: np.ndarray
+    pos_mass: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.mean.shape[0])
+
+
+def parse_rows_counted(rows: Iterable[List[str]]) -> Tuple[np.ndarray, int]:
+    """Parse CSV rows into an ``(n, NUM_FEATURES)`` matrix.
+
+    Rows with non-numeric or non-finite values or fewer than
+    ``NUM_FEATURES`` columns are skipped; extra columns are ignored. Also
+    returns how many non-blank rows were rejected.
+    """
+    parsed: List[np.ndarray] = []
+    rejected = 0
+    for row in rows:
+        if len(row) < NUM_FEATURES:
+            rejected += bool(row)
+            continue
+        try:
+            values = np.asarray(row[:NUM_FEATURES], dtype=FEATURE_DTYPE)
+        except ValueError:
+            rejected += 1
+            continue
+        # "nan" and "inf" parse as floats but cannot be scored
+        if not np.isfinite(values).all():
+            rejected += 1
+            continue
+        parsed.append(values)
+    if not parsed:
+        return np.empty((0, NUM_FEATURES), dtype=FEATURE_DTYPE), rejected
+    return np.stack(parsed), rejected
+
+
+def parse_rows(rows: Iterable[List[str]]) -> np.ndarray:
+    return parse_rows_counted(rows)[0]
+
+
+def finite_rows(matrix: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Rows of ``matrix`` whose values are all finite, and how many were dropped."""
+    finite = np.isfinite(matrix).all(axis=1)
+    if finite.all():
+        return matrix, 0
+    return matrix[finite], int(matrix.shape[0] - np.count_nonzero(finite))
+
+
+def unit_matrix(unit: FeatureUnit) -> Tuple[np.ndarray, int]:
+    """Feature matrix of ``unit`` and the number of rows rejected while parsing."""
+    if isinstance(unit, np.ndarray):
+        # Binary uploads are not parsed, but NaN and inf rows are rejected all the same
+        return finite_rows(unit)
+    text, skip_header = unit
+    rows = csv.reader(io.StringIO(text))
+    if skip_header:
+        next(rows, None)
+    return parse_rows_counted(rows)
+
+
+def unit_size(unit: FeatureUnit) -> int:
+    return unit.nbytes if isinstance(unit, np.ndarray) else len(unit[0])
+
+
+def compute_stats(matrix: np.ndarray) -> FeatureStats:
+    """Compute mean, variance and positive mass for every row of ``matrix``.
+
+    Rows are reduced in small column-major blocks so that each row is summed
+    left to right, matching Python's ``sum()`` bit for bit.
+    """
+    n_rows = matrix.shape[0]
+    n = max(matrix.shape[1], 1)
+    mean = np.empty(n_rows, dtype=np.float64)
+    var = np.empty(n_rows, dtype=np.float64)
+    pos_mass = np.empty(n_rows, dtype=np.float64)
+    for start in range(0, n_rows, _STATS_BLOCK_ROWS):
+        rows = matrix[start:start + _STATS_BLOCK_ROWS]
+        count = rows.shape[0]
+        if count == 1:
+            # A one-row array is C- and F-contiguous at once, and numpy sums
+            # it pairwise; a padding row keeps the column-by-column order
+            rows = np.vstack((rows, np.zeros_like(rows)))
+        block = np.asfortranarray(rows, dtype=np.float64)
+        block_mean = block.sum(axis=1) / n
+        centered = block - block_mean[:, None]
+        stop = start + count
+        mean[start:stop] = block_mean[:count]
+        var[start:stop] = np.square(centered).sum(axis=1)[:count] / n
+        pos_mass[start:stop] = np.where(block > 0, block, 0.0).sum(axis=1)[:count] / n
+    return FeatureStats(mean=mean, var=var, pos_mass=pos_mass)
+
+
+def score(stats: FeatureStats, target: TargetType) -> List[dict]:
+    """Score every row in ``stats`` for ``target``.
+
+    Returns one result dict per row, identical to the per-row heuristic.
+    """
+    avg = stats.mean
+    if target == "anxiety":
+        # Probability skewed by variance
+        raw = stats.var / 5.0
+    elif target == "ptsd":
+        raw = np.abs(avg)
+    elif target == "adhd":
+        raw = stats.pos_mass
+    elif target in {"depression", "ocd"}:
+        raw = (avg + 1.0) / 2.0
+    elif target == "severity":
+        # Map average to 0-10 severity scale
+        raw = (avg + 1.0) * 5
+    elif target in {"stress", "burnout"}:
+        # Map absolute mean to a 0-100 score
+        raw = np.abs(avg) * 100
+    elif target == "insomnia":
+        raw = (1 - avg) * 5 + 5
+    else:  # wellbeing
+        raw = (avg + 1) * 50
+    return format_results(raw, target)
+
+
+def format_results(raw: np.ndarray, target: TargetType) -> List[dict]:
+    """Turn raw model outputs into result dicts.
+
+    Probability targets are clipped to [0, 1] and labelled at 0.5; score
+    targets are rounded and clipped to their ``SCORE_RANGES`` scale.
+    """
+    if target in PROBABILITY_TARGETS:
+        probs = np.clip(raw, 0.0, 1.0)
+        positive, negative = _LABELS[target]
+        return [
+            {"label": positive if p >= 0.5 else negative, "probability": round(p, 3)}
+            for p in probs.tolist()
+        ]
+    low, high = SCORE_RANGES[target]
+    values = np.clip(np.rint(raw), low, high)
+    return [{target: v} for v in values.astype(np.int64).tolist()]
+
+
+def predict_matrix(matrix: np.ndarray, target: TargetType) -> List[dict]:
+    return score(compute_stats(matrix), target)
+
+
+def predict_matrix_multi(matrix: np.ndarray, targets: Sequence[TargetType]) -> Dict[str, List[dict]]:
+    """Score ``matrix`` for several targets, computing the row statistics once."""
+    stats = compute_stats(matrix)
+    return {target: score(stats, target) for target in targets}
+
+
+@dataclass
+class ScoredUnit:
+    """Per-target results of one unit plus the rows it had to skip.
+
+    Timings are taken where the work ran, which may be a pool worker.
+    """
+
+    results: Dict[str, List[dict]]
+    rejected: int = 0
+    parse_seconds: float = 0.0
+    score_seconds: float = 0.0
+
+    def __len__(self) -> int:
+        return len(next(iter(self.results.values()), []))
+
+
+class RunningSummary:
+    """Batch summary for one target, folded incrementally over result blocks."""
+
+    def __init__(self, target: TargetType) -> None:
+        self.target = target
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max: Optional[int] = None
+
+    def update(self, results: List[dict]) -> None:
+        key = "probability" if self.target in PROBABILITY_TARGETS else self.target
+        vals = [r[key] for r in results if key in r]
+        if not vals:
+            return
+        for v in vals:
+            self.total += v
+        self.count += len(vals)
+        if key != "probability":
+            lo, hi = min(vals), max(vals)
+            self.min = lo if self.min is None else min(self.min, lo)
+            self.max = hi if self.max is None else max(self.max, hi)
+
+    def result(self) -> dict:
+        if not self.count:
+            return {}
+        if self.target in PROBABILITY_TARGETS:
+            return {"mean_probability": round(self.total / self.count, 3)}
+        return {
+            "mean": round(self.total / self.count, 2),
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+def summarize(results: List[dict], target: TargetType) -> dict:
+    summary = RunningSummary(target)
+    summary.update(results)
+    return summary.result()
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import io
+import codecs
+import csv
+from typing import AsyncIterator, Iterator, List, Literal, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, UploadFile
+from numpy.lib import format as npy_format
+
+from .eeg_engine import NUM_FEATURES, FeatureUnit
+
+
+UploadFormat = Literal["csv", "npy", "raw"]
+
+# Raw uploads are headerless little-endian float32, row-major
+RAW_DTYPE = np.dtype("<f4")
+
+_EXTENSIONS = {
+    ".csv": "csv",
+    ".npy": "npy",
+    ".f32": "raw",
+    ".bin": "raw",
+}
+
+UNSUPPORTED_FORMAT = "Please upload a CSV, .npy or raw float32 (.f32/.bin) file"
+
+
+# Bytes pulled from the upload per read
+CHUNK_SIZE = 1 << 20
+
+# Rows per feature block for binary uploads
+BLOCK_ROWS = 2048
+
+# Approximate CSV text per block; about a thousand 1024-feature rows
+CSV_BLOCK_BYTES = 8 << 20
+
+# Rows generated and formatted per chunk of a streamed sample file
+SAMPLE_CHUNK_ROWS = 64
+
+
+async def iter_csv_text(file: UploadFile, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[str]:
+    """Yield decoded text from ``file`` one chunk at a time.
+
+    Every piece ends on a line boundary; a trailing partial line is carried
+    over to the next chunk, so memory stays bounded by ``chunk_size``
+    regardless of upload size.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    pending = ""
+    while True:
+        chunk = await file.read(chunk_size)
+        text = pending + decoder.decode(chunk, final=not chunk)
+        if not chunk:
+            if text:
+                yield text
+            return
+        cut = text.rfind("\n") + 1
+        pending = text[cut:]
+        if cut:
+            yield text[:cut]
+
+
+async def iter_csv_rows(file: UploadFile, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[List[List[str]]]:
+    """Yield parsed CSV rows from ``file`` one chunk at a time."""
+    async for text in iter_csv_text(file, chunk_size):
+        yield list(csv.reader(io.StringIO(text)))
+
+
+async def iter_csv_units(file: UploadFile, block_bytes: int = CSV_BLOCK_BYTES) -> AsyncIterator[FeatureUnit]:
+    """Group CSV text into ``(text, skip_header)`` units of about ``block_bytes``.
+
+    Parsing is left to :func:`unit_matrix` so it can run off the event loop.
+    """
+    first = True
+    buffered: List[str] = []
+    size = 0
+    async for text in iter_csv_text(file):
+        buffered.append(text)
+        size += len(text)
+        if size >= block_bytes:
+            yield ("".join(buffered), first)
+            first = False
+            buffered, size = [], 0
+    if buffered:
+        yield ("".join(buffered), first)
+    elif first:
+        raise HTTPException(status_code=400, detail="CSV is empty")
+
+
+def upload_format(filename: Optional[str]) -> Optional[UploadFormat]:
+    name = (filename or "").lower()
+    for ext, fmt in _EXTENSIONS.items():
+        if name.endswith(ext):
+            return fmt  # type: ignore[return-value]
+    return None
+
+
+def parse_shape(shape: Optional[str]) -> Tuple[Optional[int], int]:
+    """Parse a declared ``"rows,features"`` shape; rows may be omitted."""
+    if not shape:
+        return None, NUM_FEATURES
+    parts = shape.replace("x", ",").split(",")
+    try:
+        dims = [int(p) for p in parts if p.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Shape must look like 'rows,features'")
+    if len(dims) == 1:
+        dims = [-1, dims[0]]
+    if len(dims) != 2 or dims[1] <= 0 or dims[0] == 0 or dims[0] < -1:
+        raise HTTPException(status_code=400, detail="Shape must look like 'rows,features'")
+    return (None if dims[0] == -1 else dims[0]), dims[1]
+
+
+def _map_upload(file: UploadFile, dtype: np.dtype, offset: int, shape: Tuple[int, int], fortran: bool = False) -> np.ndarray:
+    # Memory-map the spooled upload so features are read straight from the
+    # page cache; file-likes without a descriptor fall back to their buffer.
+    order = "F" if fortran else "C"
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    try:
+        file.file.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        file.file.seek(0)
+        buf = file.file.read()
+        count = shape[0] * shape[1]
+        return np.frombuffer(buf, dtype=dtype, count=count, offset=offset).reshape(shape, order=order)
+    return np.memmap(file.file, dtype=dtype, mode="r", offset=offset, shape=shape, order=order)
+
+
+def _upload_size(file: UploadFile) -> int:
+    file.file.seek(0, io.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    return size
+
+
+def open_npy(file: UploadFile) -> np.ndarray:
+    """Map a ``.npy`` upload without copying; 1-D arrays are a single row."""
+    if not _upload_size(file):
+        raise HTTPException(status_code=400, detail="Upload is empty")
+    try:
+        version = npy_format.read_magic(file.file)
+        if version == (1, 0):
+            shape, fortran, dtype = npy_format.read_array_header_1_0(file.file)
+        elif version == (2, 0):
+            shape, fortran, dtype = npy_format.read_array_header_2_0(file.file)
+        else:
+            raise ValueError(f"unsupported .npy version {version}")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid .npy file")
+    if dtype.kind != "f" or len(shape) not in (1, 2):
+        raise HTTPException(status_code=400, detail="Expected a 1-D or 2-D float array")
+    if len(shape) == 1:
+        shape, fortran = (1, shape[0]), False
+    offset = file.file.tell()
+    if _upload_size(file) < offset + shape[0] * shape[1] * dtype.itemsize:
+        raise HTTPException(status_code=400, detail="Truncated .npy file")
+    return _map_upload(file, dtype, offset, shape, fortran)
+
+
+def open_raw(file: UploadFile, shape: Optional[str] = None) -> np.ndarray:
+    """Map a raw little-endian float32 upload of the declared shape."""
+    rows, features = parse_shape(shape)
+    size = _upload_size(file)
+    if not size:
+        raise HTTPException(status_code=400, detail="Upload is empty")
+    row_bytes = features * RAW_DTYPE.itemsize
+    if rows is None:
+        if size % row_bytes:
+            raise HTTPException(status_code=400, detail=f"Upload size is not a multiple of {features} float32 values")
+        rows = size // row_bytes
+    elif size != rows * row_bytes:
+        raise HTTPException(status_code=400, detail=f"Expected {rows * row_bytes} bytes for shape {rows},{features}, got {size}")
+    return _map_upload(file, RAW_DTYPE, 0, (rows, features))
+
+
+def open_binary(file: UploadFile, fmt: UploadFormat, shape: Optional[str] = None) -> np.ndarray:
+    """Return the feature matrix of a binary upload, truncated to NUM_FEATURES."""
+    matrix = open_npy(file) if fmt == "npy" else open_raw(file, shape)
+    if matrix.shape[1] < NUM_FEATURES:
+        raise HTTPException(status_code=400, detail=f"Expected {NUM_FEATURES} features, got {matrix.shape[1]}")
+    return matrix[:, :NUM_FEATURES]
+
+
+async def iter_upload_units(
+    file: UploadFile,
+    fmt: UploadFormat,
+    shape: Optional[str] = None,
+    block_rows: int = BLOCK_ROWS,
+) -> AsyncIterator[FeatureUnit]:
+    """Yield scoring units for any supported upload format."""
+    if fmt == "csv":
+        async for unit in iter_csv_units(file):
+            yield unit
+        return
+    matrix = open_binary(file, fmt, shape)
+    for start in range(0, matrix.shape[0], block_rows):
+        yield matrix[start:start + block_rows]
+
+
+def iter_sample_csv(rows: int, seed: Optional[int], chunk_rows: int = SAMPLE_CHUNK_ROWS) -> Iterator[bytes]:
+    """Yield a sample CSV of ``rows`` uniform [-1, 1) feature rows, a chunk at a time.
+
+    The same ``rows`` and ``seed`` always produce the same bytes, so the
+    file can be cached and tagged by its parameters. Without a seed the
+    rows are fresh every time.
+    """
+    rng = np.random.default_rng(seed)
+    yield (",".join(f"f{i}" for i in range(NUM_FEATURES)) + "\r\n").encode("ascii")
+    for start in range(0, rows, chunk_rows):
+        block = rng.uniform(-1.0, 1.0, size=(min(chunk_rows, rows - start), NUM_FEATURES))
+        buf = io.BytesIO()
+        np.savetxt(buf, block, fmt="%.4f", delimiter=",", newline="\r\n")
+        yield buf.getvalue()
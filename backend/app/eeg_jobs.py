@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import select
+
+from .db import DB_PATH, session_scope
+from .eeg_engine import RunningSummary, TargetType
+from .eeg_io import CHUNK_SIZE, UploadFormat, iter_upload_units
+from .eeg_models import registry
+from .eeg_pool import pool
+from .models import EegJob, EegJobRead
+
+
+# Uploads and NDJSON results of background jobs
+EEG_JOB_DIR = os.getenv("EEG_JOB_DIR", os.path.join(os.path.dirname(DB_PATH), "eeg_jobs"))
+
+# Jobs scored at the same time; the rest wait in order
+EEG_JOBS_MAX_CONCURRENT = int(os.getenv("EEG_JOBS_MAX_CONCURRENT", "2"))
+
+# Queued plus running jobs before new submissions get a 503
+EEG_JOBS_MAX_QUEUED = int(os.getenv("EEG_JOBS_MAX_QUEUED", "32"))
+
+# Least seconds between progress writes of a running job
+EEG_JOB_PROGRESS_SECONDS = float(os.getenv("EEG_JOB_PROGRESS_SECONDS", "1"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def job_read(job: EegJob) -> EegJobRead:
+    return EegJobRead(
+        id=job.id,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        target=job.target,
+        filename=job.filename,
+        status=job.status,
+        model_version=job.model_version,
+        rows_processed=job.rows_processed,
+        rows_rejected=job.rows_rejected,
+        summary=json.loads(job.summary) if job.summary else None,
+        error=job.error,
+    )
+
+
+class JobManager:
+    """Runs batch EEG scoring in the background of this process.
+
+    Job state lives in the ``EegJob`` table; uploads and per-row results are
+    kept as files under ``directory``.
+    """
+
+    def __init__(self, directory: str, max_concurrent: int, max_queued: int, progress_interval: float = EEG_JOB_PROGRESS_SECONDS) -> None:
+        self.directory = directory
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.progress_interval = progress_interval
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._closing = False
+
+    def upload_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.upload")
+
+    def results_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.ndjson")
+
+    def _update(self, job_id: str, **fields: object) -> None:
+        with session_scope() as session:
+            job = session.get(EegJob, job_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = datetime.utcnow()
+            session.add(job)
+
+    async def _set(self, job_id: str, **fields: object) -> None:
+        # Job writes wait on the database write lock, so never on the loop
+        await run_in_threadpool(self._update, job_id, **fields)
+
+    def _save_upload(self, source, job_id: str) -> None:
+        with open(self.upload_path(job_id), "wb") as fh:
+            shutil.copyfileobj(source, fh, CHUNK_SIZE)
+
+    @staticmethod
+    def _insert(job: EegJob) -> EegJobRead:
+        with session_scope() as session:
+            session.add(job)
+            session.flush()
+            return job_read(job)
+
+    def recover(self) -> None:
+        """Fail jobs left active by a previous process; their tasks are gone."""
+        os.makedirs(self.directory, exist_ok=True)
+        with session_scope() as session:
+            stale = session.exec(select(EegJob).where(EegJob.status.in_(ACTIVE_STATUSES)))
+            for job in stale:
+                job.status = "failed"
+                job.error = "Server restarted before the job finished"
+                job.updated_at = datetime.utcnow()
+                session.add(job)
+                if os.path.exists(self.upload_path(job.id)):
+                    os.remove(self.upload_path(job.id))
+
+    async def submit(self, file: UploadFile, target: TargetType, fmt: UploadFormat, shape: Optional[str]) -> EegJobRead:
+        if len(self._tasks) >= self.max_queued:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many EEG jobs queued, please retry shortly",
+                headers={"Retry-After": "5"},
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        os.makedirs(self.directory, exist_ok=True)
+
+        job_id = uuid.uuid4().hex
+        await run_in_threadpool(self._save_upload, file.file, job_id)
+        job = EegJob(id=job_id, target=target, filename=file.filename or "", upload_format=fmt, shape=shape)
+        read = await run_in_threadpool(self._insert, job)
+
+        task = asyncio.create_task(self._run(job_id, target, fmt, shape, read.filename))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return read
+
+    async def _run(self, job_id: str, target: TargetType, fmt: UploadFormat, shape: Optional[str], filename: str) -> None:
+        assert self._semaphore is not None
+        try:
+            async with self._semaphore:
+                await self._score(job_id, target, fmt, shape, filename)
+        except asyncio.CancelledError:
+            if self._closing:
+                await self._set(job_id, status="failed", error="Server shut down before the job finished")
+            else:
+                await self._set(job_id, status="cancelled")
+        except HTTPException as exc:
+            await self._set(job_id, status="failed", error=str(exc.detail))
+        except Exception as exc:
+            await self._set(job_id, status="failed", error=str(exc) or exc.__class__.__name__)
+        finally:
+            for path in (self.upload_path(job_id), f"{self.results_path(job_id)}.tmp"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    async def _score(self, job_id: str, target: TargetType, fmt: UploadFormat, shape: Optional[str], filename: str) -> None:
+        # Same record layout as the streamed batch endpoint
+        summary = RunningSummary(target)
+        processed = 0
+        rejected = 0
+        tmp_path = f"{self.results_path(job_id)}.tmp"
+        specs = registry.specs([target])
+        model = specs[target].label
+        await self._set(job_id, status="running", model_version=model)
+        written = time.monotonic()
+        with open(self.upload_path(job_id), "rb") as fh, open(tmp_path, "w", encoding="utf-8") as out:
+            upload = UploadFile(fh, filename=filename)
+            async for scored in pool.score_units(iter_upload_units(upload, fmt, shape), [target], specs):
+                results = scored.results[target]
+                if results:
+                    out.write(json.dumps({"type": "results", "offset": processed, "results": results}) + "\n")
+                processed += len(results)
+                rejected += scored.rejected
+                summary.update(results)
+                # Progress is throttled; the final counts are written with the result
+                if time.monotonic() - written >= self.progress_interval:
+                    await self._set(job_id, rows_processed=processed, rows_rejected=rejected)
+                    written = time.monotonic()
+            record = {"type": "summary", "target": target, "model": model, "count": processed, "summary": summary.result()}
+            out.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.results_path(job_id))
+        await self._set(
+            job_id,
+            status="done",
+            rows_processed=processed,
+            rows_rejected=rejected,
+            summary=json.dumps(summary.result()),
+        )
+
+    @staticmethod
+    def read(job_id: str) -> Optional[EegJobRead]:
+        with session_scope() as session:
+            job = session.get(EegJob, job_id)
+            return job_read(job) if job is not None else None
+
+    async def cancel(self, job_id: str) -> Optional[EegJobRead]:
+        """Cancel the job's task and return its row once ``_run`` has stored the outcome.
+
+        Returns ``None`` if the job has no task in this process. Must be
+        called on the event loop running the task.
+        """
+        task = self._tasks.get(job_id)
+        if task is None:
+            return None
+        task.cancel()
+        await asyncio.wait([task])
+        return await run_in_threadpool(self.read, job_id)
+
+    def delete_files(self, job_id: str) -> None:
+        for path in (self.upload_path(job_id), self.results_path(job_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def shutdown(self) -> None:
+        self._closing = True
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+jobs = JobManager(EEG_JOB_DIR, EEG_JOBS_MAX_CONCURRENT, EEG_JOBS_MAX_QUEUED)
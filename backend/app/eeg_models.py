@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .eeg_engine import (
+    ALL_TARGETS,
+    NUM_FEATURES,
+    PROBABILITY_TARGETS,
+    FeatureUnit,
+    ScoredUnit,
+    TargetType,
+    compute_stats,
+    format_results,
+    score,
+    unit_matrix,
+)
+
+
+# Root of versioned model artifacts: <dir>/<target>/<version>/model.json.
+# Unset means every target uses the built-in heuristic.
+EEG_MODEL_DIR = os.getenv("EEG_MODEL_DIR")
+
+# Loaded versions kept per target. Uploads pin the version they started
+# with, so the ones a hot swap replaced stay loaded while they finish.
+EEG_MODEL_VERSIONS_KEPT = max(1, int(os.getenv("EEG_MODEL_VERSIONS_KEPT", "3")))
+
+HEURISTIC_VERSION = "1"
+
+MANIFEST = "model.json"
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    """Where a model lives and which version it is.
+
+    Specs are small and hashable, so they are what gets sent to pool
+    workers; each process loads the artifact behind a spec once.
+    """
+
+    target: str
+    kind: str
+    version: str
+    path: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.kind}@{self.version}"
+
+
+class ModelUnavailable(LookupError):
+    """The artifact of a pinned model version is gone from disk."""
+
+
+class HeuristicModel:
+    """The original mean/variance heuristic; the default for every target."""
+
+    def predict(self, matrix: np.ndarray, targets: Sequence[TargetType]) -> Dict[str, List[dict]]:
+        stats = compute_stats(matrix)
+        return {target: score(stats, target) for target in targets}
+
+
+class LinearModel:
+    """``link(x @ weights + bias)`` with weights memory-mapped from ``.npy``."""
+
+    def __init__(self, target: str, weights: np.ndarray, bias: float) -> None:
+        if weights.shape != (NUM_FEATURES,):
+            raise ValueError(f"weights must have shape ({NUM_FEATURES},), got {weights.shape}")
+        self.target = target
+        self.weights = weights
+        self.bias = bias
+
+    def raw(self, matrix: np.ndarray) -> np.ndarray:
+        out = matrix @ np.asarray(self.weights, dtype=np.float64) + self.bias
+        if self.target in PROBABILITY_TARGETS:
+            out = 1.0 / (1.0 + np.exp(-out))
+        return out
+
+
+class TreeEnsembleModel:
+    """Sum of regression trees stored as flat node arrays in an ``.npz``.
+
+    Every array is ``(trees, nodes)``; ``left`` is -1 at leaves. Rows walk
+    all trees in lock step, one level per iteration.
+    """
+
+    def __init__(self, target: str, arrays: Dict[str, np.ndarray], base_score: float) -> None:
+        self.target = target
+        self.feature = arrays["feature"].astype(np.intp)
+        self.threshold = arrays["threshold"].astype(np.float64)
+        self.left = arrays["left"].astype(np.intp)
+        self.right = arrays["right"].astype(np.intp)
+        self.value = arrays["value"].astype(np.float64)
+        self.base_score = base_score
+        if self.feature.max(initial=0) >= NUM_FEATURES:
+            raise ValueError("tree splits on a feature index out of range")
+
+    def raw(self, matrix: np.ndarray) -> np.ndarray:
+        n = matrix.shape[0]
+        rows = np.arange(n)
+        out = np.full(n, self.base_score, dtype=np.float64)
+        for t in range(self.feature.shape[0]):
+            node = np.zeros(n, dtype=np.intp)
+            for _ in range(self.feature.shape[1]):
+                left = self.left[t, node]
+                internal = left >= 0
+                if not internal.any():
+                    break
+                go_left = matrix[rows, self.feature[t, node]] <= self.threshold[t, node]
+                node = np.where(internal, np.where(go_left, left, self.right[t, node]), node)
+            out += self.value[t, node]
+        if self.target in PROBABILITY_TARGETS:
+            out = 1.0 / (1.0 + np.exp(-out))
+        return out
+
+
+_HEURISTIC = HeuristicModel()
+_HEURISTIC_SPECS = {t: ModelSpec(target=t, kind="heuristic", version=HEURISTIC_VERSION) for t in ALL_TARGETS}
+
+# Artifacts loaded in this process, keyed by spec, least recently used first.
+# Scoring threads and reloads share it, so it is only touched under the lock.
+_loaded: "OrderedDict[ModelSpec, object]" = OrderedDict()
+_loaded_lock = threading.Lock()
+
+
+def _read_model(spec: ModelSpec) -> object:
+    assert spec.path is not None
+    with open(os.path.join(spec.path, MANIFEST), encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    if spec.kind == "linear":
+        weights = np.load(os.path.join(spec.path, manifest.get("weights", "weights.npy")), mmap_mode="r")
+        return LinearModel(spec.target, weights, float(manifest.get("bias", 0.0)))
+    if spec.kind == "trees":
+        with np.load(os.path.join(spec.path, manifest.get("trees", "trees.npz"))) as arrays:
+            return TreeEnsembleModel(spec.target, dict(arrays), float(manifest.get("base_score", 0.0)))
+    raise ValueError(f"unknown model kind {spec.kind!r}")
+
+
+def load_model(spec: ModelSpec) -> object:
+    if spec.kind == "heuristic":
+        return _HEURISTIC
+    with _loaded_lock:
+        model = _loaded.get(spec)
+        if model is not None:
+            _loaded.move_to_end(spec)
+            return model
+    # Read outside the lock; two threads missing at once both read, and one copy is kept
+    try:
+        model = _read_model(spec)
+    except FileNotFoundError:
+        raise ModelUnavailable(f"Model {spec.target} {spec.label} is no longer available; retry to use the active version")
+    with _loaded_lock:
+        model = _loaded.setdefault(spec, model)
+        _loaded.move_to_end(spec)
+        # Past the limit, the target's least recently used versions are dropped
+        versions = [s for s in _loaded if s.target == spec.target]
+        for stale in versions[: max(0, len(versions) - EEG_MODEL_VERSIONS_KEPT)]:
+            del _loaded[stale]
+    return model
+
+
+def predict_with_models(matrix: np.ndarray, targets: Sequence[TargetType], specs: Dict[str, ModelSpec]) -> Dict[str, List[dict]]:
+    """Score ``matrix`` for ``targets``; heuristic targets share one stats pass."""
+    heuristic = [t for t in targets if specs[t].kind == "heuristic"]
+    results = _HEURISTIC.predict(matrix, heuristic) if heuristic else {}
+    for target in targets:
+        if target not in results:
+            model = load_model(specs[target])
+            results[target] = format_results(model.raw(matrix), target)  # type: ignore[attr-defined]
+    return {target: results[target] for target in targets}
+
+
+def predict_unit(unit: FeatureUnit, targets: Sequence[TargetType], specs: Optional[Dict[str, ModelSpec]] = None) -> ScoredUnit:
+    """Parse and score one unit; the entry point for pool workers."""
+    start = time.perf_counter()
+    matrix, rejected = unit_matrix(unit)
+    parsed = time.perf_counter()
+    results = predict_with_models(matrix, targets, specs or _HEURISTIC_SPECS)
+    return ScoredUnit(results, rejected, parsed - start, time.perf_counter() - parsed)
+
+
+def _version_key(version: str) -> Tuple:
+    # Natural ordering so "10" sorts after "9"
+    return tuple((0, int(p)) if p.isdigit() else (1, p) for p in version.replace("-", ".").split("."))
+
+
+class ModelRegistry:
+    """Maps each target to its active model version.
+
+    Artifacts live in ``<directory>/<target>/<version>/model.json``; the
+    highest version wins unless ``<directory>/<target>/ACTIVE`` names one.
+    :meth:`load` can be called again at any time to pick up new versions.
+    """
+
+    def __init__(self, directory: Optional[str]) -> None:
+        self.directory = directory
+        self._specs: Dict[str, ModelSpec] = dict(_HEURISTIC_SPECS)
+        # Reloads run in the threadpool; one at a time, so the last scan wins
+        self._reload_lock = threading.Lock()
+
+    def _discover(self, target: str) -> Optional[ModelSpec]:
+        assert self.directory is not None
+        root = os.path.join(self.directory, target)
+        if not os.path.isdir(root):
+            return None
+        active_file = os.path.join(root, "ACTIVE")
+        if os.path.exists(active_file):
+            with open(active_file, encoding="utf-8") as fh:
+                version = fh.read().strip()
+        else:
+            versions = [v for v in os.listdir(root) if os.path.exists(os.path.join(root, v, MANIFEST))]
+            if not versions:
+                return None
+            version = max(versions, key=_version_key)
+        path = os.path.join(root, version)
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as fh:
+            kind = json.load(fh)["kind"]
+        return ModelSpec(target=target, kind=kind, version=version, path=path)
+
+    def load(self) -> Dict[str, str]:
+        """Rescan the model directory and swap in the active versions.
+
+        A target whose artifact fails to load keeps its current model; the
+        errors are returned per target.
+        """
+        with self._reload_lock:
+            errors: Dict[str, str] = {}
+            specs = dict(_HEURISTIC_SPECS)
+            if self.directory:
+                for target in ALL_TARGETS:
+                    try:
+                        spec = self._discover(target)
+                        if spec is not None:
+                            # Warm the artifact now rather than on the first request
+                            load_model(spec)
+                            specs[target] = spec
+                    except (OSError, ValueError, LookupError) as exc:
+                        errors[target] = str(exc)
+                        specs[target] = self._specs[target]
+            # One assignment, so requests see the old specs or the new ones
+            self._specs = specs
+            return errors
+
+    def specs(self, targets: Sequence[TargetType]) -> Dict[str, ModelSpec]:
+        return {t: self._specs[t] for t in targets}
+
+    def describe(self) -> List[dict]:
+        return [
+            {"target": t, "model": spec.label, "kind": spec.kind, "version": spec.version}
+            for t, spec in self._specs.items()
+        ]
+
+
+registry = ModelRegistry(EEG_MODEL_DIR)
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Deque, Dict, Optional, Sequence
+
+import numpy as np
+from fastapi import HTTPException
+
+from .eeg_engine import FeatureUnit, ScoredUnit, TargetType, unit_size
+from .eeg_models import ModelSpec, ModelUnavailable, predict_unit
+from .metrics import eeg_parse_time, eeg_rejected_rows, eeg_request_score_time, eeg_rows, eeg_unit_score_time, eeg_upload_rate, registry
+
+
+# Worker processes for EEG scoring; 0 scores everything in-process
+EEG_POOL_WORKERS = int(os.getenv("EEG_POOL_WORKERS", str(os.cpu_count() or 1)))
+
+# Units queued or running across all requests. Further units wait for a
+# slot, and new requests get a 503 while every slot is taken.
+EEG_POOL_MAX_PENDING = int(os.getenv("EEG_POOL_MAX_PENDING", "64"))
+
+# Units smaller than this are scored inline; shipping them costs more than it saves
+EEG_POOL_INLINE_BYTES = int(os.getenv("EEG_POOL_INLINE_BYTES", str(256 << 10)))
+
+
+class ScoringPool:
+    """Process pool for CPU-bound EEG parsing and scoring.
+
+    The executor is created on first use. Each request keeps at most
+    ``workers`` units in flight so one upload is spread across every core
+    without starving the others. At most ``max_pending`` units are queued
+    or running at once; the units of requests already admitted wait their
+    turn, first come first served.
+    """
+
+    def __init__(self, workers: int, max_pending: int, inline_bytes: int) -> None:
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self.inline_bytes = inline_bytes
+        self.pending = 0
+        self._waiting: Deque[asyncio.Future] = deque()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs an event loop and
+            # threads is not safe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def check_capacity(self) -> None:
+        """Reject a new request with 503 while the queue is full."""
+        if self.workers and self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="EEG scoring is at capacity, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+    async def _acquire(self) -> None:
+        if not self._waiting and self.pending < self.max_pending:
+            self.pending += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(future)
+        try:
+            await future
+        except BaseException:
+            # Gone while waiting; a slot handed over meanwhile is passed on
+            if future.cancelled() or future.cancel():
+                if future in self._waiting:
+                    self._waiting.remove(future)
+            else:
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        # A freed slot goes straight to the next waiter, so pending stays put
+        while self._waiting:
+            future = self._waiting.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.pending -= 1
+
+    async def _run(self, unit: FeatureUnit, targets: Sequence[TargetType], specs: Dict[str, ModelSpec]) -> ScoredUnit:
+        await self._acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), predict_unit, unit, list(targets), specs)
+        finally:
+            self._release()
+
+    async def score(self, unit: FeatureUnit, targets: Sequence[TargetType], specs: Dict[str, ModelSpec]) -> ScoredUnit:
+        try:
+            if not self.workers or unit_size(unit) < self.inline_bytes:
+                scored = predict_unit(unit, targets, specs)
+            else:
+                scored = await self._run(unit, targets, specs)
+        except ModelUnavailable as exc:
+            # The upload pinned a version that was removed after a reload
+            raise HTTPException(status_code=409, detail=str(exc))
+        eeg_parse_time.observe(scored.parse_seconds, format="binary" if isinstance(unit, np.ndarray) else "csv")
+        eeg_unit_score_time.observe(scored.score_seconds)
+        eeg_rows.inc(len(scored))
+        if scored.rejected:
+            eeg_rejected_rows.inc(scored.rejected)
+        return scored
+
+    async def score_units(
+        self,
+        units: AsyncIterator[FeatureUnit],
+        targets: Sequence[TargetType],
+        specs: Dict[str, ModelSpec],
+    ) -> AsyncIterator[ScoredUnit]:
+        """Score ``units`` concurrently, yielding results in upload order.
+
+        ``specs`` pins the model versions for the whole upload, even if the
+        registry is reloaded meanwhile.
+        """
+        window: Deque[asyncio.Future] = deque()
+        start = time.perf_counter()
+        rows = 0
+        scoring = 0.0
+        try:
+            async for unit in units:
+                window.append(asyncio.ensure_future(self.score(unit, targets, specs)))
+                if len(window) >= max(self.workers, 1):
+                    scored = await window.popleft()
+                    rows += len(scored)
+                    scoring += scored.score_seconds
+                    yield scored
+            while window:
+                scored = await window.popleft()
+                rows += len(scored)
+                scoring += scored.score_seconds
+                yield scored
+            eeg_request_score_time.observe(scoring)
+            elapsed = time.perf_counter() - start
+            if rows and elapsed > 0:
+                eeg_upload_rate.observe(rows / elapsed)
+        finally:
+            for fut in window:
+                fut.cancel()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+pool = ScoringPool(EEG_POOL_WORKERS, EEG_POOL_MAX_PENDING, EEG_POOL_INLINE_BYTES)
+registry.gauge("eeg_pool_pending_units", "EEG units queued or running in the scoring pool.", function=lambda: pool.pending)
@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, select
+
+from .db import DB_PATH, session_scope
+from .eeg_engine import NUM_FEATURES, PROBABILITY_TARGETS, TargetType, unit_matrix
+from .eeg_io import RAW_DTYPE, UploadFormat, iter_upload_units
+from .eeg_models import registry
+from .eeg_pool import pool
+from .metrics import eeg_request_score_time
+from .models import EegSegment, EegSegmentRead, EegSession, EegSessionRead
+from .mood_rollups import Period
+
+
+# Segment files and per-feature moments of every session
+EEG_SESSION_DIR = os.getenv("EEG_SESSION_DIR", os.path.join(os.path.dirname(DB_PATH), "eeg_sessions"))
+
+# Features and scores are kept as little-endian float32, the raw upload
+# format, so a segment file can be uploaded again as-is
+STORE_DTYPE = RAW_DTYPE
+
+# Per-feature moments over a session's first N segments; the row's segment
+# count names the current file
+_MOMENTS_FILE = "features.{segments:06d}.npz"
+
+
+class Moments:
+    """Running count, mean, M2, min and max, elementwise over arrays.
+
+    Blocks are reduced with NumPy and folded in with Chan's parallel form
+    of Welford's update, so the mean and variance stay accurate over any
+    number of rows without keeping them.
+    """
+
+    def __init__(self, count: int = 0, mean=0.0, m2=0.0, minimum=None, maximum=None) -> None:
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    def update(self, values: np.ndarray) -> None:
+        """Fold in ``values`` along their first axis."""
+        if not values.shape[0]:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        mean = values.mean(axis=0)
+        self.merge(Moments(values.shape[0], mean, np.square(values - mean).sum(axis=0), values.min(axis=0), values.max(axis=0)))
+
+    def merge(self, other: "Moments") -> None:
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self.m2, self.min, self.max = other.count, other.mean, other.m2, other.min, other.max
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self.m2 = self.m2 + other.m2 + delta * delta * (self.count * other.count / count)
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.count = count
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else None
+
+    def to_json(self) -> dict:
+        # Scalar moments only; feature moments are saved with NumPy
+        return {"count": self.count, "mean": float(self.mean), "m2": float(self.m2), "min": _float(self.min), "max": _float(self.max)}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Moments":
+        return cls(data["count"], data["mean"], data["m2"], data["min"], data["max"])
+
+    def read(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+        return {"count": self.count, "mean": float(self.mean), "variance": float(self.variance), "min": _float(self.min), "max": _float(self.max)}
+
+
+def _float(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def _scores(results: List[dict], target: str) -> np.ndarray:
+    key = "probability" if target in PROBABILITY_TARGETS else target
+    return np.fromiter((r[key] for r in results), dtype=np.float64, count=len(results))
+
+
+def _stats(raw: Optional[str]) -> Dict[str, Moments]:
+    return {t: Moments.from_json(m) for t, m in json.loads(raw or "{}").items()}
+
+
+def _bucket_start(day: date, period: Period) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def session_read(record: EegSession) -> EegSessionRead:
+    return EegSessionRead(
+        id=record.id,
+        created_at=record.created_at,
+        updated_at=record.updated_at,
+        name=record.name,
+        rows=record.rows,
+        segments=record.segments,
+        targets={t: m.read() for t, m in _stats(record.target_stats).items()},
+    )
+
+
+def segment_read(segment: EegSegment) -> EegSegmentRead:
+    stats = json.loads(segment.target_stats)
+    return EegSegmentRead(
+        seq=segment.seq,
+        created_at=segment.created_at,
+        filename=segment.filename,
+        rows=segment.rows,
+        rows_rejected=segment.rows_rejected,
+        models=json.loads(segment.models),
+        targets={t: Moments.from_json(m).read() for t, m in stats.items()},
+    )
+
+
+class SessionStore:
+    """Append-only columnar store of scored EEG feature blocks.
+
+    Each upload becomes a segment: a ``(rows, 1024)`` feature file and a
+    ``(rows, targets)`` score file, both float32 and memory-mappable, plus
+    an ``EegSegment`` index row holding the segment's per-target moments.
+    The session keeps running moments per target (in ``EegSession``) and
+    per feature (in a file named by the session's segment count), so
+    summaries and trends are read without touching stored rows. Appends to
+    one session are serialized in this process.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def session_dir(self, session_id: str) -> str:
+        return os.path.join(self.directory, session_id)
+
+    def features_path(self, session_id: str, seq: int) -> str:
+        return os.path.join(self.session_dir(session_id), f"{seq:06d}.f32")
+
+    def scores_path(self, session_id: str, seq: int) -> str:
+        return os.path.join(self.session_dir(session_id), f"{seq:06d}.scores.f32")
+
+    def create(self, name: Optional[str]) -> EegSessionRead:
+        record = EegSession(id=uuid.uuid4().hex, name=name)
+        os.makedirs(self.session_dir(record.id), exist_ok=True)
+        with session_scope() as session:
+            session.add(record)
+            session.flush()
+            return session_read(record)
+
+    def moments_path(self, session_id: str, segments: int) -> str:
+        return os.path.join(self.session_dir(session_id), _MOMENTS_FILE.format(segments=segments))
+
+    def feature_moments(self, session_id: str, segments: int) -> Moments:
+        """Per-feature moments of the session's first ``segments`` segments, its row's count."""
+        path = self.moments_path(session_id, segments)
+        if not os.path.exists(path):
+            return Moments()
+        with np.load(path) as data:
+            return Moments(int(data["count"]), data["mean"], data["m2"], data["min"], data["max"])
+
+    def _stage_feature_moments(self, session_id: str, moments: Moments) -> str:
+        """Write ``moments`` to a temporary file, renamed by :meth:`_commit_segment`."""
+        path = os.path.join(self.session_dir(session_id), f"features.{uuid.uuid4().hex}.npz.tmp")
+        with open(path, "wb") as fh:
+            np.savez(fh, count=moments.count, mean=moments.mean, m2=moments.m2, min=moments.min, max=moments.max)
+        return path
+
+    @staticmethod
+    def _segment_count(session_id: str) -> int:
+        with session_scope() as session:
+            record = session.get(EegSession, session_id)
+            if record is None:
+                raise HTTPException(status_code=404, detail="Session not found")
+            return record.segments
+
+    @staticmethod
+    def _write_block(
+        feature_out,
+        score_out,
+        matrix: np.ndarray,
+        columns: np.ndarray,
+        features: Moments,
+        scores: Dict[str, Moments],
+    ) -> None:
+        feature_out.write(np.ascontiguousarray(matrix, dtype=STORE_DTYPE).tobytes())
+        score_out.write(columns.astype(STORE_DTYPE).tobytes())
+        features.update(matrix)
+        for i, moments in enumerate(scores.values()):
+            moments.update(columns[:, i])
+
+    def _commit_segment(self, session_id: str, staged: Sequence[str], segment: EegSegment, scores: Dict[str, Moments]) -> EegSegmentRead:
+        """Index the segment and rename its ``staged`` features, scores and session moments.
+
+        The files get names nothing reads until the transaction bumps the
+        session's segment count, so they and the row change together.
+        """
+        # The sequence number is taken in the writing transaction, and the
+        # unique (session_id, seq) index rejects a concurrent duplicate
+        renamed: List[str] = []
+        try:
+            with session_scope() as session:
+                record = session.get(EegSession, session_id)
+                if record is None:
+                    raise HTTPException(status_code=404, detail="Session not found")
+                totals = _stats(record.target_stats)
+                for t, moments in scores.items():
+                    totals.setdefault(t, Moments()).merge(moments)
+                seq = segment.seq = record.segments
+                record.rows += segment.rows
+                record.segments += 1
+                record.target_stats = json.dumps({t: m.to_json() for t, m in totals.items()})
+                record.updated_at = datetime.utcnow()
+                session.add(segment)
+                session.add(record)
+                session.flush()
+                final = [self.features_path(session_id, seq), self.scores_path(session_id, seq), self.moments_path(session_id, seq + 1)]
+                for source, target in zip(staged, final):
+                    os.replace(source, target)
+                    renamed.append(target)
+                read = segment_read(segment)
+        except BaseException:
+            for path in renamed:
+                os.remove(path)
+            raise
+        # The previous moments file stays for readers that loaded the row
+        # just before this commit; the one before it is unreferenced
+        if seq and os.path.exists(self.moments_path(session_id, seq - 1)):
+            os.remove(self.moments_path(session_id, seq - 1))
+        return read
+
+    def segment_features(self, segment: EegSegment) -> np.ndarray:
+        return np.memmap(self.features_path(segment.session_id, segment.seq), dtype=STORE_DTYPE, mode="r", shape=(segment.rows, NUM_FEATURES))
+
+    def segment_scores(self, segment: EegSegment) -> Tuple[List[str], np.ndarray]:
+        """Target names and the ``(rows, targets)`` score matrix of ``segment``."""
+        targets = segment.targets.split(",")
+        path = self.scores_path(segment.session_id, segment.seq)
+        return targets, np.memmap(path, dtype=STORE_DTYPE, mode="r", shape=(segment.rows, len(targets)))
+
+    async def append(
+        self,
+        session_id: str,
+        file: UploadFile,
+        fmt: UploadFormat,
+        shape: Optional[str],
+        targets: Sequence[TargetType],
+        recorded_at: Optional[datetime] = None,
+    ) -> EegSegmentRead:
+        """Score an upload for ``targets`` and store it as the session's next segment."""
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            segments = await run_in_threadpool(self._segment_count, session_id)
+            # Pinned for the whole upload, as for batch predictions
+            specs = registry.specs(targets)
+            features = await run_in_threadpool(self.feature_moments, session_id, segments)
+            scores = {t: Moments() for t in targets}
+            rows = rejected = 0
+            scoring = 0.0
+            # Renamed to the segment's files once its sequence number is committed
+            stem = os.path.join(self.session_dir(session_id), uuid.uuid4().hex)
+            staged = [f"{stem}.f32.tmp", f"{stem}.scores.f32.tmp"]
+            os.makedirs(self.session_dir(session_id), exist_ok=True)
+            try:
+                with open(staged[0], "wb") as feature_out, open(staged[1], "wb") as score_out:
+                    async for unit in iter_upload_units(file, fmt, shape):
+                        # Parsed here rather than in the pool: the rows are stored too
+                        matrix, unit_rejected = await run_in_threadpool(unit_matrix, unit)
+                        rejected += unit_rejected
+                        if not matrix.shape[0]:
+                            continue
+                        scored = await pool.score(matrix, targets, specs)
+                        scoring += scored.score_seconds
+                        columns = np.column_stack([_scores(scored.results[t], t) for t in targets])
+                        await run_in_threadpool(self._write_block, feature_out, score_out, matrix, columns, features, scores)
+                        rows += matrix.shape[0]
+                eeg_request_score_time.observe(scoring)
+                if not rows:
+                    raise HTTPException(status_code=400, detail="Upload has no valid data rows")
+                staged.append(await run_in_threadpool(self._stage_feature_moments, session_id, features))
+                segment = EegSegment(
+                    session_id=session_id,
+                    seq=0,
+                    created_at=recorded_at or datetime.utcnow(),
+                    filename=file.filename or "",
+                    rows=rows,
+                    rows_rejected=rejected,
+                    targets=",".join(targets),
+                    models=json.dumps({t: specs[t].label for t in targets}),
+                    target_stats=json.dumps({t: m.to_json() for t, m in scores.items()}),
+                )
+                return await run_in_threadpool(self._commit_segment, session_id, staged, segment, scores)
+            except BaseException:
+                for path in staged:
+                    if os.path.exists(path):
+                        os.remove(path)
+                raise
+
+    def delete(self, session: Session, record: EegSession) -> None:
+        for segment in session.exec(select(EegSegment).where(EegSegment.session_id == record.id)):
+            session.delete(segment)
+        session.delete(record)
+        session.commit()
+        shutil.rmtree(self.session_dir(record.id), ignore_errors=True)
+        self._locks.pop(record.id, None)
+
+
+def trend(
+    session: Session,
+    session_id: str,
+    target: str,
+    period: Period,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> List[dict]:
+    """Moments of ``target`` per period bucket, oldest first, merged from the segment index."""
+    query = select(EegSegment.created_at, EegSegment.target_stats).where(EegSegment.session_id == session_id)
+    if since is not None:
+        query = query.where(EegSegment.created_at >= datetime.combine(since, datetime.min.time()))
+    if until is not None:
+        query = query.where(EegSegment.created_at < datetime.combine(until, datetime.min.time()))
+    buckets: Dict[date, Tuple[int, Moments]] = {}
+    for created_at, raw in session.exec(query.order_by(EegSegment.created_at)):
+        data = json.loads(raw).get(target)
+        if data is None:
+            continue
+        start = _bucket_start(created_at.date(), period)
+        segments, moments = buckets.get(start, (0, Moments()))
+        moments.merge(Moments.from_json(data))
+        buckets[start] = (segments + 1, moments)
+    return [{"start": start, "segments": n, **moments.read()} for start, (n, moments) in buckets.items()]
+
+
+sessions = SessionStore(EEG_SESSION_DIR)
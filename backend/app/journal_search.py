@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import html
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import bindparam, text
+from sqlmodel import Session
+
+from .db import engine
+from .pagination import NEXT_CURSOR_HEADER
+
+
+# External-content FTS5 index over journalentry; the text itself is only
+# stored once. Triggers keep it in step with every write, bulk imports
+# included.
+SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS journal_fts USING fts5(
+        title, content,
+        content='journalentry', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS journal_fts_insert AFTER INSERT ON journalentry BEGIN
+        INSERT INTO journal_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS journal_fts_delete AFTER DELETE ON journalentry BEGIN
+        INSERT INTO journal_fts(journal_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS journal_fts_update AFTER UPDATE OF title, content ON journalentry BEGIN
+        INSERT INTO journal_fts(journal_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO journal_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+# Rank first on the index alone (title matches count double); snippets and
+# the join are then computed for the page only, not for every match
+_RANKED = text(
+    """
+    SELECT rowid AS id, bm25(journal_fts, 2.0, 1.0) AS rank
+    FROM journal_fts
+    WHERE journal_fts MATCH :query
+    ORDER BY rank
+    LIMIT :limit OFFSET :offset
+    """
+)
+
+_SNIPPETS = text(
+    """
+    SELECT j.id, j.created_at, j.title,
+           snippet(journal_fts, 1, char(2), char(3), '…', 16) AS snippet
+    FROM journal_fts JOIN journalentry AS j ON j.id = journal_fts.rowid
+    WHERE journal_fts MATCH :query AND journal_fts.rowid IN :ids
+    """
+).bindparams(bindparam("ids", expanding=True))
+
+
+def create_index() -> None:
+    """Create the index and triggers; a new index is filled from existing entries."""
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'journal_fts'").first()
+        for statement in SCHEMA:
+            conn.exec_driver_sql(statement)
+        if exists is None:
+            conn.exec_driver_sql("INSERT INTO journal_fts(journal_fts) VALUES ('rebuild')")
+
+
+def match_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last as a prefix.
+
+    Words are quoted so operators and punctuation in user input cannot
+    produce a syntax error.
+    """
+    terms = [t.replace('"', "") for t in q.split()]
+    terms = [f'"{t}"' for t in terms if t]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _highlight(snippet: str) -> str:
+    # Escape the entry text, then turn the match markers into <mark> tags
+    return html.escape(snippet).replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+
+def search(session: Session, q: str, limit: int, offset: int) -> Tuple[List[dict], bool]:
+    """Ranked matches for ``q``, best first, with highlighted content snippets.
+
+    Also returns whether more matches follow the page.
+    """
+    query = match_query(q)
+    if not query:
+        return [], False
+    ranked = session.execute(_RANKED, {"query": query, "limit": limit + 1, "offset": offset}).all()
+    more = len(ranked) > limit
+    ranked = ranked[:limit]
+    if not ranked:
+        return [], more
+    details = {row.id: row for row in session.execute(_SNIPPETS, {"query": query, "ids": [r.id for r in ranked]})}
+    # An entry deleted between the two queries has no row to join; it is skipped
+    return [
+        {
+            "id": r.id,
+            "created_at": details[r.id].created_at,
+            "title": details[r.id].title,
+            "snippet": _highlight(details[r.id].snippet),
+            "rank": r.rank,
+        }
+        for r in ranked
+        if r.id in details
+    ], more
+
+
+def search_page(session: Session, response: Response, q: str, limit: int, cursor: Optional[str]) -> List[dict]:
+    """One page of :func:`search`, setting the next-page header; the cursor is the offset of the next page."""
+    try:
+        offset = max(int(cursor or 0), 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    hits, more = search(session, q, limit, offset)
+    if more:
+        response.headers[NEXT_CURSOR_HEADER] = str(offset + limit)
+    return hits
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import importlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import FastAPI
+from starlette.routing import BaseRoute, Match, NoMatchFound
+from starlette.types import Receive, Scope, Send
+
+
+class LazyRouter(BaseRoute):
+    """Stands in for ``module.router`` until the first request under ``path``.
+
+    On that request the module is imported, its router is included in the
+    app where this placeholder was, and the request is dispatched again.
+    Startup therefore skips the module's import tree; the first request
+    pays for it once instead.
+    """
+
+    def __init__(
+        self,
+        app: FastAPI,
+        path: str,
+        module: str,
+        prefix: str = "",
+        on_load: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.app = app
+        self.path = path
+        self.module = module
+        self.prefix = prefix
+        self.on_load = on_load
+        self.loaded = False
+
+    def matches(self, scope: Scope) -> Tuple[Match, Dict[str, Any]]:
+        if scope["type"] == "http" and (scope["path"] == self.path or scope["path"].startswith(self.path + "/")):
+            return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        # Names are unknown until the router is loaded
+        raise NoMatchFound(name, path_params)
+
+    def load(self) -> None:
+        # Marked loaded only once the routes are in place: if the import or
+        # on_load fails, the placeholder stays and the next request retries
+        # (and fails the same way) instead of dispatching back to itself
+        if self.loaded:
+            return
+        router = importlib.import_module(self.module).router
+        if self.on_load is not None:
+            self.on_load()
+        routes = self.app.router.routes
+        before = len(routes)
+        self.app.include_router(router, prefix=self.prefix)
+        added = routes[before:]
+        del routes[before:]
+        # Take this placeholder's place, ahead of the static catch-all
+        index = routes.index(self)
+        routes[index:index + 1] = added
+        self.app.openapi_schema = None
+        self.loaded = True
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.load()
+        await self.app.router(scope, receive, send)
+
+
+def load_all(app: FastAPI) -> None:
+    """Import every router still deferred, e.g. before building the OpenAPI schema."""
+    for route in list(app.router.routes):
+        if isinstance(route, LazyRouter):
+            route.load()
@@ -1,23 +1,106 @@
 from __future__ import annotations
 
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import sys
 from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
-from .db import create_db_and_tables
-from .routers.chat import router as chat_router
-from .routers.mood import router as mood_router
-from .routers.journal import router as journal_router
+from . import journal_search, mood_rollups
+from .admission import (
+    ADMISSION_CONTROL,
+    ADMISSION_LIMITS,
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_RESERVED,
+    ADMISSION_ROUTES,
+    AdmissionMiddleware,
+    parse_routes,
+)
+from .body_limit import BodyLimitMiddleware
+from .chat_history import CHAT_MAX_BODY_BYTES
+from .db import (
+    DB_ASYNC,
+    create_db_and_tables,
+    dispose_async_engine,
+    schema_version,
+    stamp_schema_version,
+    stored_schema_version,
+)
+from .lazy_router import LazyRouter, load_all
+from .metrics import MetricsMiddleware, startup_time
+from .routers.chat import close_client as close_chat_client, router as chat_router
+from .routers.metrics import router as metrics_router
 from .routers.resources import router as resources_router
-from .routers.eeg import router as eeg_router
+
+# Only the selected variant is imported; building routes is most of the
+# app's import time
+if DB_ASYNC:
+    from .routers import journal_async as journal, mood_async as mood
+else:
+    from .routers import journal, mood
+
+
+# Defer the EEG router (numpy, parsing and scoring, the process pool) until
+# the first /api/eeg request, for faster worker start-up
+LAZY_ROUTERS = os.getenv("APP_LAZY_ROUTERS", "0").lower() in ("1", "true", "yes")
+
+_EEG_ROUTER = f"{__package__}.routers.eeg"
+
+
+def _start_eeg() -> None:
+    from .eeg_jobs import jobs as eeg_jobs
+    from .eeg_models import registry as eeg_models
+
+    eeg_models.load()
+    eeg_jobs.recover()
+
+
+async def _stop_eeg() -> None:
+    # Nothing to stop if the EEG stack was never imported
+    if _EEG_ROUTER not in sys.modules:
+        return
+    from .eeg_jobs import jobs as eeg_jobs
+    from .eeg_pool import pool as eeg_pool
+
+    await eeg_jobs.shutdown()
+    eeg_pool.shutdown()
+
+
+def prepare_database() -> None:
+    """Create tables, the search index and rollups, unless the stamped schema version already matches."""
+    version = schema_version(*journal_search.SCHEMA)
+    if stored_schema_version() == version:
+        return
+    create_db_and_tables()
+    journal_search.create_index()
+    mood_rollups.backfill()
+    stamp_schema_version(version)
 
 
 def create_app() -> FastAPI:
     app = FastAPI(title="Mindful Companion", version="0.1.0")
 
+    # Bulk EEG work is shed before crisis resources and chat slow down.
+    # Inside CORS, so browsers can read the 429 and 503 answers, and inside
+    # the metrics middleware so shed requests are still counted.
+    if ADMISSION_CONTROL:
+        app.add_middleware(
+            AdmissionMiddleware,
+            routes=parse_routes(ADMISSION_ROUTES),
+            limits=ADMISSION_LIMITS,
+            max_concurrent=ADMISSION_MAX_CONCURRENT,
+            reserved=ADMISSION_RESERVED,
+        )
+    # Chat histories grow with the conversation; refuse huge ones unread.
+    # Outside admission, so they never take a slot, and inside CORS, so
+    # browsers can read the 413.
+    app.add_middleware(BodyLimitMiddleware, limits=[("/api/chat", CHAT_MAX_BODY_BYTES)])
     # CORS for local dev and simple hosting
     app.add_middleware(
         CORSMiddleware,
@@ -26,13 +109,31 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # Outermost, so the timings include CORS and error handling
+    app.add_middleware(MetricsMiddleware)
 
     # API Routers under /api
     app.include_router(chat_router, prefix="/api")
-    app.include_router(mood_router, prefix="/api")
-    app.include_router(journal_router, prefix="/api")
+    app.include_router(mood.router, prefix="/api")
+    app.include_router(journal.router, prefix="/api")
     app.include_router(resources_router, prefix="/api")
-    app.include_router(eeg_router, prefix="/api")
+    if LAZY_ROUTERS:
+        app.router.routes.append(LazyRouter(app, "/api/eeg", _EEG_ROUTER, prefix="/api", on_load=_start_eeg))
+        build_openapi = app.openapi
+
+        def openapi() -> dict:
+            # The schema has to list every route
+            load_all(app)
+            return build_openapi()
+
+        app.openapi = openapi  # type: ignore[method-assign]
+    else:
+        from .routers.eeg import router as eeg_router
+
+        app.include_router(eeg_router, prefix="/api")
+
+    # Prometheus scrape endpoint, at the conventional path
+    app.include_router(metrics_router)
 
     # Static frontend
     static_dir = Path(__file__).resolve().parent.parent / "frontend"
@@ -42,11 +143,20 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     def on_startup() -> None:  # pragma: no cover - side effect
-        create_db_and_tables()
+        started = time.perf_counter()
+        prepare_database()
+        if not LAZY_ROUTERS:
+            _start_eeg()
+        startup_time.set(time.perf_counter() - started, phase="startup")
+
+    @app.on_event("shutdown")
+    async def on_shutdown() -> None:  # pragma: no cover - side effect
+        await _stop_eeg()
+        await close_chat_client()
+        await dispose_async_engine()
 
     return app
 
 
 app = create_app()
-
-
+startup_time.set(time.perf_counter() - _IMPORT_STARTED, phase="import")
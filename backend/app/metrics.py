@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Latency buckets in seconds, from a cached 304 up to a large batch upload
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Payload buckets in bytes, 256 B to 256 MiB
+SIZE_BUCKETS = tuple(float(256 * 4 ** i) for i in range(11))
+
+# Rows per second for an EEG upload
+RATE_BUCKETS = (10.0, 100.0, 1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6)
+
+# Rows in one coalesced prediction batch
+BATCH_BUCKETS = (1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0, 128.0, 256.0)
+
+# Batching waits are bounded by a window of a few milliseconds
+WAIT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.003, 0.005, 0.01, 0.025, 0.05)
+
+# Estimated prompt tokens of a chat request
+TOKEN_BUCKETS = (64.0, 128.0, 256.0, 512.0, 1024.0, 2048.0, 4096.0, 8192.0, 16384.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(int(value)) if float(value).is_integer() else repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(_Metric):
+    """A monotonically increasing total, or one read from ``function`` at scrape time."""
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.function = function
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            return [f"{self.name} {_number(float(self.function()))}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, or is read from ``function`` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        function: Optional[Callable[[], float]] = None,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.function = function
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self.function is not None:
+            return [f"{self.name} {_number(float(self.function()))}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labels, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; ``observe`` is one bisect and three additions."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum, count
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0, 0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+            entry[1][1] += 1
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return int(entry[1][1]) if entry else 0
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), list(s))) for k, (c, s) in self._values.items())
+        lines = []
+        for key, (counts, (total, count)) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {_number(count)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = (), function: Optional[Callable[[], float]] = None) -> Counter:
+        return self.register(Counter(name, help, labels, function))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, help, labels, function))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+startup_time = registry.gauge("app_startup_seconds", "Seconds spent importing the app and running its startup hooks.", ("phase",))
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_duration = registry.histogram("http_request_duration_seconds", "Time to the last response byte.", ("method", "route"))
+http_in_flight = registry.gauge("http_requests_in_flight", "Requests currently being served.")
+http_request_size = registry.histogram("http_request_size_bytes", "Declared request body size.", ("route",), SIZE_BUCKETS)
+http_response_size = registry.histogram("http_response_size_bytes", "Response body bytes sent.", ("route",), SIZE_BUCKETS)
+http_db_time = registry.histogram("http_request_db_seconds", "Time spent in database calls per request.", ("route",))
+admission_in_flight = registry.gauge("http_admission_in_flight", "Requests holding an admission slot, by priority class.", ("priority",))
+admission_queued = registry.gauge("http_admission_queued", "Requests waiting for an admission slot, by priority class.", ("priority",))
+admission_wait = registry.histogram("http_admission_wait_seconds", "Time a queued request waited for its admission slot.", ("priority",))
+admission_rejected = registry.counter("http_admission_rejected_total", "Requests shed by admission control, by priority class and reason (rate_limited, queue_full, timeout).", ("priority", "reason"))
+db_statements = registry.histogram("db_statement_duration_seconds", "Database statement execution time.", ("verb",))
+
+eeg_parse_time = registry.histogram("eeg_parse_seconds", "Time to parse one EEG unit into a feature matrix.", ("format",))
+eeg_unit_score_time = registry.histogram("eeg_unit_score_seconds", "Time to score one EEG feature matrix (an upload block or a coalesced batch) for every requested target.")
+eeg_request_score_time = registry.histogram("eeg_request_score_seconds", "Time spent scoring one request's EEG rows, summed over its blocks.")
+eeg_rows = registry.counter("eeg_rows_scored_total", "EEG rows scored.")
+eeg_rejected_rows = registry.counter("eeg_rows_rejected_total", "EEG rows skipped while parsing.")
+eeg_upload_rate = registry.histogram("eeg_upload_rows_per_second", "Scoring throughput of one EEG upload.", buckets=RATE_BUCKETS)
+eeg_batch_rows = registry.histogram("eeg_batch_rows", "Rows per coalesced single-row prediction batch.", buckets=BATCH_BUCKETS)
+eeg_batch_wait = registry.histogram("eeg_batch_wait_seconds", "Time a single-row prediction waited for its batch to be scored.", buckets=WAIT_BUCKETS)
+eeg_batch_flushes = registry.counter("eeg_batch_flushes_total", "Prediction batches scored, by trigger (full or window).", ("reason",))
+
+chat_upstream_time = registry.histogram("chat_upstream_seconds", "Latency of the upstream chat model call.", ("mode",))
+chat_first_token = registry.histogram("chat_first_token_seconds", "Time to the first streamed delta from the upstream model.")
+chat_replies = registry.counter("chat_replies_total", "Chat replies by where they came from (model, no_key or error fallback).", ("mode", "source"))
+chat_prompt_tokens = registry.histogram("chat_prompt_history_tokens", "Estimated tokens of the history and message sent upstream, after compaction.", buckets=TOKEN_BUCKETS)
+chat_turns_compacted = registry.counter("chat_history_turns_compacted_total", "History turns folded into conversation summaries.")
+chat_cache_lookups = registry.counter("chat_cache_requests_total", "Chat cache lookups by outcome (hit, coalesced, miss, bypass).", ("outcome",))
+chat_cache_saved_seconds = registry.counter("chat_cache_saved_seconds_total", "Upstream latency avoided by chat cache hits.")
+chat_cache_saved_tokens = registry.counter("chat_cache_saved_tokens_total", "Upstream tokens avoided by chat cache hits and coalesced requests.")
+
+
+# DB time of the current request; the holder is shared with threadpool
+# workers because they run in a copy of the request's context
+_db_time: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("request_db_time", default=None)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement on ``engine`` (an AsyncEngine's ``sync_engine`` works too)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        db_statements.observe(elapsed, verb=statement.lstrip()[:6].upper().rstrip())
+        holder = _db_time.get()
+        if holder is not None:
+            holder[0] += elapsed
+
+
+def _route_label(scope: dict, status: str) -> str:
+    # Templates, not raw paths, so ids do not create new series
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        # The static mount at "/" serves the frontend and 404s everything else
+        return "static" if scope.get("endpoint") is not None and status != "404" else "unmatched"
+    # Some FastAPI versions report included routes relative to their prefix;
+    # every parameter spans one segment, so the leading extra ones are it
+    path = scope["path"]
+    extra = path.count("/") - template.count("/")
+    if extra > 0:
+        return "/".join(path.split("/")[: extra + 1]) + template
+    return template
+
+
+class MetricsMiddleware:
+    """Pure ASGI timing middleware.
+
+    Unlike ``BaseHTTPMiddleware`` it does not buffer or re-wrap the body,
+    so streaming responses pass through untouched and the per-request cost
+    is a few dictionary updates.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = "500"
+        sent = 0
+        holder = [0.0]
+        token = _db_time.set(holder)
+        http_in_flight.inc()
+
+        async def send_wrapper(message) -> None:
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _db_time.reset(token)
+            http_in_flight.dec()
+            route = _route_label(scope, status)
+            method = scope["method"]
+            http_requests.inc(method=method, route=route, status=status)
+            http_duration.observe(time.perf_counter() - start, method=method, route=route)
+            http_response_size.observe(sent, route=route)
+            for name, value in scope.get("headers", ()):
+                if name == b"content-length":
+                    # Client-supplied; a malformed one is not worth failing the request over
+                    try:
+                        size = int(value)
+                    except ValueError:
+                        break
+                    if size >= 0:
+                        http_request_size.observe(size, route=route)
+                    break
+            if holder[0]:
+                http_db_time.observe(holder[0], route=route)
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Optional
+import os
+from datetime import date, datetime
+from typing import Any, Optional
 
-from pydantic import BaseModel, Field as PydanticField
+from pydantic import BaseModel, Field as PydanticField, field_validator
+from sqlalchemy import UniqueConstraint
 from sqlmodel import SQLModel, Field
 
 
+# Most recent history turns a chat request keeps; older ones are dropped
+# before validation
+CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "200"))
+
+
 class MoodEntry(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -14,6 +21,15 @@ class MoodEntry(SQLModel, table=True):
     note: Optional[str] = Field(default=None)
 
 
+class MoodRollup(SQLModel, table=True):
+    # Per-day mood aggregates kept in step with MoodEntry writes
+    day: date = Field(primary_key=True)
+    count: int
+    total: int
+    min_score: int
+    max_score: int
+
+
 class JournalEntry(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -21,12 +37,75 @@ class JournalEntry(SQLModel, table=True):
     content: str
 
 
+class EegJob(SQLModel, table=True):
+    id: str = Field(primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    target: str
+    filename: str
+    upload_format: str
+    shape: Optional[str] = Field(default=None)
+    status: str = Field(default="queued", index=True)
+    model_version: Optional[str] = Field(default=None)
+    rows_processed: int = Field(default=0)
+    rows_rejected: int = Field(default=0)
+    summary: Optional[str] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+
+
+class EegSession(SQLModel, table=True):
+    # Longitudinal store of uploaded feature blocks; rows live in float32
+    # segment files, per-feature moments in the session directory
+    id: str = Field(primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    name: Optional[str] = Field(default=None)
+    rows: int = Field(default=0)
+    segments: int = Field(default=0)
+    # JSON: per-target running moments over every stored prediction
+    target_stats: Optional[str] = Field(default=None)
+
+
+class EegSegment(SQLModel, table=True):
+    # Index of one appended upload: where its rows are and what they scored
+    __table_args__ = (UniqueConstraint("session_id", "seq"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    session_id: str = Field(index=True)
+    seq: int
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    filename: str
+    rows: int
+    rows_rejected: int = Field(default=0)
+    # Comma-separated column order of the segment's score file
+    targets: str
+    # JSON: model label and running moments per target
+    models: str
+    target_stats: str
+
+
+class ChatConversation(SQLModel, table=True):
+    # Rolling summary of the history turns compacted out of a conversation
+    id: str = Field(primary_key=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Digest of the last turn folded in, to find where new turns start
+    last_turn: str
+    summary: str
+    # Whether any folded user turn mentioned a crisis
+    crisis: bool = Field(default=False)
+
+
 # Request/response schemas
 class MoodEntryCreate(BaseModel):
     mood_score: int = PydanticField(ge=1, le=10)
     note: Optional[str] = None
 
 
+class MoodEntryImport(MoodEntryCreate):
+    # Imports may carry the original timestamp; other keys such as id are ignored
+    created_at: Optional[datetime] = None
+
+
 class MoodEntryRead(BaseModel):
     id: int
     created_at: datetime
@@ -34,16 +113,37 @@ class MoodEntryRead(BaseModel):
     note: Optional[str]
 
 
+class MoodEntryListItem(BaseModel):
+    # List views may project a subset of columns
+    id: int
+    created_at: datetime
+    mood_score: Optional[int] = None
+    note: Optional[str] = None
+
+
 class MoodEntryUpdate(BaseModel):
     mood_score: Optional[int] = PydanticField(default=None, ge=1, le=10)
     note: Optional[str] = None
 
 
+class MoodStatsBucket(BaseModel):
+    start: date
+    count: int
+    mean: float
+    min: int
+    max: int
+    rolling_mean: float
+
+
 class JournalEntryCreate(BaseModel):
     title: str
     content: str
 
 
+class JournalEntryImport(JournalEntryCreate):
+    created_at: Optional[datetime] = None
+
+
 class JournalEntryRead(BaseModel):
     id: int
     created_at: datetime
@@ -51,11 +151,104 @@ class JournalEntryRead(BaseModel):
     content: str
 
 
+class JournalEntryListItem(BaseModel):
+    id: int
+    created_at: datetime
+    title: Optional[str] = None
+    content: Optional[str] = None
+
+
+class JournalSearchHit(BaseModel):
+    id: int
+    created_at: datetime
+    title: str
+    # HTML-escaped content excerpt with matches wrapped in <mark>
+    snippet: str
+    rank: float
+
+
 class JournalEntryUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
 
 
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportResult(BaseModel):
+    imported: int
+    rejected: int
+    errors: list[ImportRowError]
+
+
+class EegJobRead(BaseModel):
+    id: str
+    created_at: datetime
+    updated_at: datetime
+    target: str
+    filename: str
+    status: str
+    model_version: Optional[str] = None
+    rows_processed: int
+    rows_rejected: int
+    summary: Optional[dict] = None
+    error: Optional[str] = None
+
+
+class EegSessionCreate(BaseModel):
+    name: Optional[str] = None
+
+
+class EegMoments(BaseModel):
+    count: int
+    mean: Optional[float] = None
+    # Population variance, like the per-row statistics of the heuristic
+    variance: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class EegSessionRead(BaseModel):
+    id: str
+    created_at: datetime
+    updated_at: datetime
+    name: Optional[str] = None
+    rows: int
+    segments: int
+    targets: dict[str, EegMoments]
+
+
+class EegSegmentRead(BaseModel):
+    seq: int
+    created_at: datetime
+    filename: str
+    rows: int
+    rows_rejected: int
+    models: dict[str, str]
+    targets: dict[str, EegMoments]
+
+
+class EegTrendBucket(BaseModel):
+    start: date
+    segments: int
+    count: int
+    mean: Optional[float] = None
+    variance: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class EegFeatureStats(BaseModel):
+    # One value per feature column
+    count: int
+    mean: list[float]
+    variance: list[float]
+    min: list[float]
+    max: list[float]
+
+
 class ChatMessage(BaseModel):
     role: str
     content: str
@@ -64,6 +257,16 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     history: Optional[list[ChatMessage]] = None
+    # Set it to keep a server-side summary of turns compacted out of history
+    conversation_id: Optional[str] = PydanticField(default=None, max_length=128)
+
+    @field_validator("history", mode="before")
+    @classmethod
+    def _recent_history(cls, value: Any) -> Any:
+        # A list slice, so an oversized history never pays per-turn validation
+        if isinstance(value, list) and len(value) > CHAT_HISTORY_MAX_TURNS:
+            return value[-CHAT_HISTORY_MAX_TURNS:]
+        return value
 
 
 class ChatResponse(BaseModel):
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Literal, Optional, Sequence
+
+from sqlalchemy import ColumnElement, Select, delete, func, insert, true
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+
+from .db import session_scope
+from .models import MoodEntry, MoodRollup
+
+
+Period = Literal["day", "week", "month"]
+
+# SQL expression for the first day of the bucket containing a rollup day
+_BUCKET_START: Dict[str, Callable] = {
+    "day": lambda day: func.date(day),
+    # 'weekday 0' moves forward to Sunday; weeks start on Monday
+    "week": lambda day: func.date(day, "weekday 0", "-6 days"),
+    "month": lambda day: func.date(day, "start of month"),
+}
+
+
+_COLUMNS = ["day", "count", "total", "min_score", "max_score"]
+
+
+def _day_totals(where: ColumnElement[bool]) -> Select:
+    # One (day, count, total, min, max) row per day of matching entries
+    day = func.date(MoodEntry.created_at)
+    return (
+        select(
+            day,
+            func.count(),
+            func.sum(MoodEntry.mood_score),
+            func.min(MoodEntry.mood_score),
+            func.max(MoodEntry.mood_score),
+        )
+        .where(where)
+        .group_by(day)
+    )
+
+
+def _upsert(session: Session, days: List[dict]) -> None:
+    stmt = sqlite_insert(MoodRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MoodRollup.day],
+        set_={
+            "count": MoodRollup.count + stmt.excluded.count,
+            "total": MoodRollup.total + stmt.excluded.total,
+            "min_score": func.min(MoodRollup.min_score, stmt.excluded.min_score),
+            "max_score": func.max(MoodRollup.max_score, stmt.excluded.max_score),
+        },
+    )
+    session.execute(stmt, days)
+
+
+def record_mood(session: Session, entry: MoodEntry) -> None:
+    """Add a new entry to its day's rollup in one upsert."""
+    score = entry.mood_score
+    _upsert(session, [{"day": entry.created_at.date(), "count": 1, "total": score, "min_score": score, "max_score": score}])
+
+
+def record_moods(session: Session, rows: Sequence[Dict[str, Any]]) -> None:
+    """Fold a batch of new ``created_at``/``mood_score`` rows into the rollups."""
+    days: Dict[date, dict] = {}
+    for row in rows:
+        day, score = row["created_at"].date(), row["mood_score"]
+        agg = days.get(day)
+        if agg is None:
+            days[day] = {"day": day, "count": 1, "total": score, "min_score": score, "max_score": score}
+        else:
+            agg["count"] += 1
+            agg["total"] += score
+            agg["min_score"] = min(agg["min_score"], score)
+            agg["max_score"] = max(agg["max_score"], score)
+    if days:
+        _upsert(session, list(days.values()))
+
+
+def refresh_day(session: Session, created_at: datetime) -> None:
+    """Recompute the rollup of the day containing ``created_at``.
+
+    Used after an edit or delete, where min/max cannot be updated from the
+    rollup alone. Only that day's entries are read, through the index.
+    """
+    start = datetime.combine(created_at.date(), datetime.min.time())
+    session.flush()
+    session.execute(delete(MoodRollup).where(MoodRollup.day == start.date()))
+    in_day = (MoodEntry.created_at >= start) & (MoodEntry.created_at < start + timedelta(days=1))
+    session.execute(insert(MoodRollup).from_select(_COLUMNS, _day_totals(in_day)))
+
+
+def rebuild(session: Session) -> None:
+    """Recompute every rollup from the raw entries."""
+    session.execute(delete(MoodRollup))
+    session.execute(insert(MoodRollup).from_select(_COLUMNS, _day_totals(true())))
+
+
+def backfill() -> None:
+    """Build rollups for a database that predates them."""
+    with session_scope() as session:
+        if session.exec(select(MoodRollup.day).limit(1)).first() is not None:
+            return
+        if session.exec(select(MoodEntry.id).limit(1)).first() is not None:
+            rebuild(session)
+
+
+def bucket_stats(
+    session: Session,
+    period: Period,
+    window: int,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> List[dict]:
+    """Mood statistics per bucket, oldest first, read from the rollups only.
+
+    ``rolling_mean`` is the entry-weighted mean of this bucket and the
+    ``window - 1`` buckets with entries before it.
+    """
+    start = _BUCKET_START[period](MoodRollup.day).label("start")
+    grouped = select(
+        start,
+        func.sum(MoodRollup.count).label("count"),
+        func.sum(MoodRollup.total).label("total"),
+        func.min(MoodRollup.min_score).label("min"),
+        func.max(MoodRollup.max_score).label("max"),
+    )
+    if since is not None:
+        grouped = grouped.where(MoodRollup.day >= since)
+    if until is not None:
+        grouped = grouped.where(MoodRollup.day < until)
+    buckets = grouped.group_by(start).subquery()
+
+    frame = {"order_by": buckets.c.start, "rows": (-(window - 1), 0)}
+    rolling = func.sum(buckets.c.total).over(**frame) * 1.0 / func.sum(buckets.c.count).over(**frame)
+    statement = select(buckets, rolling.label("rolling_mean")).order_by(buckets.c.start)
+    return [
+        {
+            "start": row.start,
+            "count": row.count,
+            "mean": round(row.total / row.count, 2),
+            "min": row.min,
+            "max": row.max,
+            "rolling_mean": round(row.rolling_mean, 2),
+        }
+        for row in session.execute(statement)
+    ]
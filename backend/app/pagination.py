@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import base64
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Response
+from sqlalchemy import desc, tuple_
+from sqlmodel import Session, SQLModel, select
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Header carrying the cursor of the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Always returned so every row can serve as a cursor
+KEY_FIELDS = ("id", "created_at")
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Rows store naive UTC timestamps
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_fields(fields: Optional[str], model: Type[SQLModel]) -> List[str]:
+    """Columns to return for a ``fields=a,b`` projection; all when unset."""
+    columns = list(model.model_fields)
+    if not fields:
+        return columns
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted.difference(columns)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [c for c in columns if c in KEY_FIELDS or c in wanted]
+
+
+def keyset_page(
+    session: Session,
+    model: Type[SQLModel],
+    response: Response,
+    fields: Sequence[str],
+    limit: int,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """One page of ``model`` rows, newest first, keyed on ``(created_at, id)``.
+
+    Only the requested columns are selected and no ORM objects are built.
+    ``since`` is inclusive and ``until`` exclusive. Every predicate and the
+    sort are served by the ``created_at`` index (SQLite appends the rowid),
+    so a page costs the same however long the history is.
+    """
+    created_at = model.created_at  # type: ignore[attr-defined]
+    row_id = model.id  # type: ignore[attr-defined]
+    statement = select(*(getattr(model, f) for f in fields))
+    since, until = naive_utc(since), naive_utc(until)
+    if since is not None:
+        statement = statement.where(created_at >= since)
+    if until is not None:
+        statement = statement.where(created_at < until)
+    if cursor:
+        statement = statement.where(tuple_(created_at, row_id) < tuple_(*decode_cursor(cursor)))
+    statement = statement.order_by(desc(created_at), desc(row_id)).limit(limit + 1)
+
+    rows = [dict(row._mapping) for row in session.execute(statement)]
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows
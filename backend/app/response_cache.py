@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Mapping, Optional
+
+from fastapi import Request, Response
+
+try:  # optional: brotli is served only when the package is installed
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+
+# Rendered payloads kept in memory; 0 seconds keeps an entry until evicted
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "64"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "0"))
+
+# Cache-Control max-age sent to clients; they revalidate with If-None-Match after that
+RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "300"))
+
+# Bodies smaller than this are not worth compressing
+_MIN_COMPRESS_BYTES = 256
+
+
+def etag_for(*parts: object) -> str:
+    """Strong ETag over ``parts``: body bytes or anything that determines them."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def _variant_etag(etag: str, encoding: str) -> str:
+    # Each encoding is a different byte sequence, so it gets its own strong tag
+    return etag if encoding == "identity" else f'{etag[:-1]}-{encoding}"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """Whether ``If-None-Match`` names ``etag`` in any of its encodings."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    base = etag.strip('"')
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        tag = tag[2:] if tag.startswith("W/") else tag
+        tag = tag.strip('"')
+        if tag == base or tag.rsplit("-", 1)[0] == base:
+            return True
+    return False
+
+
+def _accepts(request: Request, encoding: str) -> bool:
+    for item in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() == encoding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def cache_headers(etag: str, extra: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={RESPONSE_CACHE_MAX_AGE}", "Vary": "Accept-Encoding"}
+    if extra:
+        headers.update(extra)
+    return headers
+
+
+class CachedBody:
+    """One rendered payload with its precompressed encodings and ETag."""
+
+    def __init__(self, body: bytes, media_type: str, expires_at: float) -> None:
+        self.media_type = media_type
+        self.expires_at = expires_at
+        self.etag = etag_for(body)
+        self.encodings: Dict[str, bytes] = {"identity": body}
+        if len(body) >= _MIN_COMPRESS_BYTES:
+            self.encodings["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.encodings["br"] = brotli.compress(body)
+        self.size = sum(len(b) for b in self.encodings.values())
+
+    def response(self, request: Request, headers: Optional[Mapping[str, str]] = None) -> Response:
+        """200 with the smallest encoding the client accepts, or 304 on a matching ``If-None-Match``."""
+        encoding = "identity"
+        for candidate in ("br", "gzip"):
+            if candidate in self.encodings and _accepts(request, candidate):
+                encoding = candidate
+                break
+        etag = _variant_etag(self.etag, encoding)
+        if not_modified(request, self.etag):
+            return Response(status_code=304, headers=cache_headers(etag))
+        out = cache_headers(etag, headers)
+        if encoding != "identity":
+            out["Content-Encoding"] = encoding
+        return Response(self.encodings[encoding], media_type=self.media_type, headers=out)
+
+
+class ResponseCache:
+    """LRU of :class:`CachedBody` keyed by endpoint and parameters.
+
+    Payloads are serialized and compressed once on the first request, after
+    which a hit is a dict lookup plus header comparison. Safe to share
+    between the event loop and threadpool endpoints; two concurrent misses
+    may both build, which is harmless for deterministic payloads.
+    """
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: str, build: Callable[[], bytes], media_type: str) -> CachedBody:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (not entry.expires_at or entry.expires_at > now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = CachedBody(build(), media_type, now + self.ttl if self.ttl > 0 else 0.0)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.max_entries, 1):
+                self._entries.popitem(last=False)
+        return entry
+
+    def respond(
+        self,
+        request: Request,
+        key: str,
+        build: Callable[[], bytes],
+        media_type: str = "application/json",
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> Response:
+        return self.get_or_build(key, build, media_type).response(request, headers)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": sum(e.size for e in self._entries.values()),
+            }
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS)
@@ -1,17 +1,32 @@
 from __future__ import annotations
 
+import json
 import os
-from typing import List
+import time
+from typing import AsyncIterator, List, Optional, Tuple
 
 from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
+from ..chat_cache import chat_cache, chat_key, is_crisis
+from ..chat_history import compact_history
+from ..metrics import chat_first_token, chat_replies, chat_upstream_time
 from ..models import ChatRequest, ChatResponse
 
 
 router = APIRouter(tags=["chat"])
 
 
+# Upstream client settings; OPENAI_BASE_URL is read by the SDK itself
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "1"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+
+_client = None
+
+
 SYSTEM_PROMPT = (
     "You are a supportive, empathetic mental health companion. "
     "Provide brief, validating responses (4-7 sentences), suggest 1-2 gentle next steps, and when appropriate, a simple grounding/breathing exercise. "
@@ -44,27 +59,44 @@ def _fallback_reply(user_message: str) -> ChatResponse:
     )
 
 
-def _openai_reply(req: ChatRequest) -> ChatResponse:
-    # Lazy import to avoid dependency issues if key not set
-    from openai import OpenAI
-
-    client = OpenAI()
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-    if req.history:
-        for m in req.history:
-            if m.role in {"user", "assistant"} and m.content:
-                messages.append({"role": m.role, "content": m.content})
+def _get_client():
+    # One client per process so every request reuses the same connection pool
+    global _client
+    if _client is None:
+        # Lazy import to avoid dependency issues if key not set
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        _client = AsyncOpenAI(
+            timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                ),
+            ),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def _build_messages(req: ChatRequest) -> Tuple[list[dict], bool]:
+    # Also returns whether a turn compacted out of the history was a crisis.
+    # Compaction reads and writes the stored summary, so it runs off the loop.
+    history = await run_in_threadpool(compact_history, req)
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}, *history.messages]
     messages.append({"role": "user", "content": req.message})
+    return messages, history.crisis
 
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    completion = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=0.7,
-        max_tokens=400,
-    )
-    reply_text = completion.choices[0].message.content or "I'm here with you."
 
+def _model_response(reply_text: str, model: str) -> ChatResponse:
     suggestions = [
         "Try a short grounding or breathing exercise",
         "Write what you’re feeling for 2 minutes without editing",
@@ -81,15 +113,124 @@ def _openai_reply(req: ChatRequest) -> ChatResponse:
     )
 
 
+async def _openai_reply(messages: list[dict]) -> Tuple[ChatResponse, int]:
+    # Also returns the tokens the call used, so cache hits can report savings
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    with chat_upstream_time.time(mode="complete"):
+        completion = await _get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=400,
+        )
+    reply_text = completion.choices[0].message.content or "I'm here with you."
+    usage = getattr(completion, "usage", None)
+    return _model_response(reply_text, model), (usage.total_tokens if usage else 0)
+
+
+def _cache_key(messages: list[dict], crisis: bool) -> Optional[str]:
+    # None when the reply must come from the model: the cache is off, or the
+    # user's turns mention a crisis
+    if not chat_cache.enabled:
+        return None
+    if crisis or is_crisis(m["content"] for m in messages if m["role"] == "user"):
+        chat_cache.bypass()
+        return None
+    return chat_key(os.getenv("OPENAI_MODEL", "gpt-4o-mini"), messages)
+
+
+async def _openai_stream(messages: list[dict]) -> AsyncIterator[str]:
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    stream = await _get_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=400,
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+async def _chat_events(req: ChatRequest) -> AsyncIterator[bytes]:
+    # "delta" events carry reply text as it arrives; the final "done" event
+    # carries the complete ChatResponse, which replaces whatever was streamed.
+    if not os.getenv("OPENAI_API_KEY"):
+        chat_replies.inc(mode="stream", source="no_key")
+        fallback = _fallback_reply(req.message)
+        yield _sse("delta", {"text": fallback.reply})
+        yield _sse("done", fallback.model_dump())
+        return
+    parts: List[str] = []
+    start = time.perf_counter()
+    try:
+        # The stored history can fail too, which gets the same fallback
+        messages, crisis = await _build_messages(req)
+        key = _cache_key(messages, crisis)
+        cached = chat_cache.get(key) if key is not None else None
+        if cached is not None:
+            chat_replies.inc(mode="stream", source="model")
+            yield _sse("delta", {"text": cached.reply})
+            yield _sse("done", cached.model_dump())
+            return
+        start = time.perf_counter()
+        async for text in _openai_stream(messages):
+            if not parts:
+                chat_first_token.observe(time.perf_counter() - start)
+            parts.append(text)
+            yield _sse("delta", {"text": text})
+        reply_text = "".join(parts) or "I'm here with you."
+        response = _model_response(reply_text, os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+        chat_replies.inc(mode="stream", source="model")
+        if key is not None:
+            # Streams report no token usage, so hits on this entry save latency only
+            chat_cache.put(key, response, time.perf_counter() - start)
+    except Exception:
+        # Safety fallback on any API or history store failure, even mid-stream
+        chat_replies.inc(mode="stream", source="error")
+        response = _fallback_reply(req.message)
+        if not parts:
+            yield _sse("delta", {"text": response.reply})
+    chat_upstream_time.observe(time.perf_counter() - start, mode="stream")
+    yield _sse("done", response.model_dump())
+
+
 @router.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest) -> ChatResponse:
+async def chat(req: ChatRequest) -> ChatResponse:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
+        chat_replies.inc(mode="complete", source="no_key")
         return _fallback_reply(req.message)
     try:
-        return _openai_reply(req)
+        messages, crisis = await _build_messages(req)
+        key = _cache_key(messages, crisis)
+        if key is None:
+            response, _ = await _openai_reply(messages)
+        else:
+            # Identical requests in flight share one upstream call
+            response = await chat_cache.get_or_call(key, lambda: _openai_reply(messages))
     except Exception:
-        # Safety fallback on any API failure
+        # Safety fallback on any API or history store failure
+        chat_replies.inc(mode="complete", source="error")
         return _fallback_reply(req.message)
+    chat_replies.inc(mode="complete", source="model")
+    return response
+
+
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest) -> StreamingResponse:
+    return StreamingResponse(
+        _chat_events(req),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
+@router.get("/chat/cache/stats")
+def chat_cache_stats() -> dict:
+    return chat_cache.stats()
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import AsyncIterable, Iterable, List, Optional, Type, TypeVar, Union
+
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, SQLModel
+
+from .. import journal_search, mood_rollups
+from ..bulk import MEDIA_TYPES, BulkFormat
+from ..models import JournalEntry, JournalEntryCreate, JournalEntryUpdate, MoodEntry, MoodEntryCreate, MoodEntryUpdate
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, parse_fields
+
+
+# Request parsing and queries shared by the sync mood and journal routers
+# and their async variants; the async ones call the queries through
+# AsyncSession.run_sync.
+
+Entry = TypeVar("Entry", bound=SQLModel)
+
+
+@dataclass
+class PageQuery:
+    limit: int
+    cursor: Optional[str]
+    since: Optional[datetime]
+    until: Optional[datetime]
+    fields: Optional[str]
+
+
+def page_query(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+    since: Optional[datetime] = Query(None, description="Oldest created_at to include"),
+    until: Optional[datetime] = Query(None, description="Exclusive upper bound on created_at"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns; id and created_at are always included"),
+) -> PageQuery:
+    return PageQuery(limit, cursor, since, until, fields)
+
+
+def list_page(session: Session, model: Type[SQLModel], response: Response, query: PageQuery) -> List[dict]:
+    columns = parse_fields(query.fields, model)
+    return keyset_page(session, model, response, columns, query.limit, query.cursor, query.since, query.until)
+
+
+@dataclass
+class StatsQuery:
+    period: mood_rollups.Period
+    window: int
+    since: Optional[date]
+    until: Optional[date]
+
+
+def stats_query(
+    period: mood_rollups.Period = "day",
+    window: int = Query(7, ge=1, le=365, description="Buckets in the rolling mean"),
+    since: Optional[date] = Query(None, description="First day to include"),
+    until: Optional[date] = Query(None, description="Day after the last one to include"),
+) -> StatsQuery:
+    return StatsQuery(period, window, since, until)
+
+
+def mood_stats(session: Session, query: StatsQuery) -> List[dict]:
+    return mood_rollups.bucket_stats(session, query.period, query.window, query.since, query.until)
+
+
+@dataclass
+class SearchQuery:
+    q: str
+    limit: int
+    cursor: Optional[str]
+
+
+def search_query(
+    q: str = Query(..., min_length=1, description="Words to find in titles and content"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page"),
+) -> SearchQuery:
+    return SearchQuery(q, limit, cursor)
+
+
+def search_journal(session: Session, response: Response, query: SearchQuery) -> List[dict]:
+    return journal_search.search_page(session, response, query.q, query.limit, query.cursor)
+
+
+def export_response(name: str, rows: Union[Iterable[bytes], AsyncIterable[bytes]], format: BulkFormat) -> StreamingResponse:
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{format}"'}
+    return StreamingResponse(rows, media_type=MEDIA_TYPES[format], headers=headers)
+
+
+def found(entry: Optional[Entry], detail: str) -> Entry:
+    if not entry:
+        raise HTTPException(status_code=404, detail=detail)
+    return entry
+
+
+def new_mood(payload: MoodEntryCreate) -> MoodEntry:
+    return MoodEntry(mood_score=payload.mood_score, note=payload.note)
+
+
+def update_mood(entry: MoodEntry, payload: MoodEntryUpdate) -> bool:
+    """Apply ``payload`` to ``entry``; returns whether the day's rollup needs a refresh."""
+    if payload.mood_score is not None:
+        entry.mood_score = payload.mood_score
+    if payload.note is not None:
+        entry.note = payload.note
+    return payload.mood_score is not None
+
+
+def new_journal_entry(payload: JournalEntryCreate) -> JournalEntry:
+    return JournalEntry(title=payload.title, content=payload.content)
+
+
+def update_journal_entry(entry: JournalEntry, payload: JournalEntryUpdate) -> None:
+    if payload.title is not None:
+        entry.title = payload.title
+    if payload.content is not None:
+        entry.content = payload.content
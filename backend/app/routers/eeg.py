@@ -1,114 +1,211 @@
 from __future__ import annotations
 
-import io
-import csv
-import random
-from typing import Literal, List
-
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
-
-
-router = APIRouter(prefix="/eeg", tags=["eeg"])
-
-
-NUM_FEATURES = 1024
-
-
-TargetType = Literal[
-    "depression",
-    "severity",
-    "anxiety",
-    "stress",
-    "ptsd",
-    "ocd",
-    "adhd",
-    "burnout",
-    "insomnia",
-    "wellbeing",
-]
-
-
-def _predict_stub(features: list[float], target: TargetType) -> dict:
-    # Simple placeholder model: mean-based heuristic
-    avg = sum(features) / max(len(features), 1)
-    if target == "depression":
-        probability = max(0.0, min(1.0, (avg + 1.0) / 2.0))
-        label = "Depressed" if probability >= 0.5 else "Not Depressed"
-        return {"label": label, "probability": round(probability, 3)}
-    elif target == "severity":
-        # Map average to 0-10 severity scale
-        severity = int(max(0, min(10, round((avg + 1.0) * 5))))
-        return {"severity": severity}
-    elif target == "anxiety":
-        # Probability skewed by variance
-        mean = avg
-        var = sum((x - mean) ** 2 for x in features) / max(len(features), 1)
-        score = min(1.0, (var / 5.0))  # heuristic scaling
-        label = "Anxious" if score >= 0.5 else "Calm"
-        return {"label": label, "probability": round(score, 3)}
-    elif target == "stress":
-        # Map absolute mean to a 0-100 stress score
-        stress = int(max(0, min(100, round(abs(avg) * 100))))
-        return {"stress": stress}
-    elif target == "ptsd":
-        score = max(0.0, min(1.0, abs(avg)))
-        return {"label": "PTSD Risk" if score >= 0.5 else "Low Risk", "probability": round(score, 3)}
-    elif target == "ocd":
-        score = max(0.0, min(1.0, (avg + 1) / 2))
-        return {"label": "OCD Traits" if score >= 0.5 else "Low Traits", "probability": round(score, 3)}
-    elif target == "adhd":
-        score = max(0.0, min(1.0, (sum(x for x in features if x > 0) / max(len(features), 1))))
-        return {"label": "ADHD Traits" if score >= 0.5 else "Low Traits", "probability": round(score, 3)}
-    elif target == "burnout":
-        level = int(max(0, min(100, round((abs(avg) * 100)))))
-        return {"burnout": level}
-    elif target == "insomnia":
-        score = max(0, min(10, round((1 - avg) * 5 + 5)))
-        return {"insomnia": score}
-    else:  # wellbeing
-        score = int(max(0, min(100, round((avg + 1) * 50))))
-        return {"wellbeing": score}
-
-
-def _sample_csv_stream() -> StreamingResponse:
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    header = [f"f{i}" for i in range(NUM_FEATURES)]
-    writer.writerow(header)
-    # Generate 5 random rows in [-1, 1]
-    for _ in range(5):
-        row = [round(random.uniform(-1.0, 1.0), 4) for _ in range(NUM_FEATURES)]
-        writer.writerow(row)
-    buf.seek(0)
-    return StreamingResponse(
-        iter([buf.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=sample_eeg.csv"},
-    )
+import json
+import math
+import time
+from datetime import date, datetime
+from typing import AsyncIterator, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
+from sqlmodel import Session, select
+
+from ..eeg_engine import (
+    ALL_TARGETS,
+    FEATURE_DTYPE,
+    NUM_FEATURES,
+    FeatureUnit,
+    RunningSummary,
+    ScoredUnit,
+    TargetType,
+)
+from ..eeg_io import (
+    UNSUPPORTED_FORMAT,
+    iter_csv_rows,
+    iter_sample_csv,
+    iter_upload_units,
+    open_binary,
+    upload_format,
+)
+from ..db import SessionRoute, get_session
+from ..eeg_batcher import batcher
+from ..eeg_cache import prediction_cache, upload_key
+from ..eeg_jobs import ACTIVE_STATUSES, job_read, jobs
+from ..eeg_models import registry
+from ..eeg_pool import pool
+from ..eeg_sessions import segment_read, session_read, sessions, trend
+from ..metrics import eeg_parse_time, eeg_rows
+from ..models import (
+    EegFeatureStats,
+    EegJob,
+    EegJobRead,
+    EegSegment,
+    EegSegmentRead,
+    EegSession,
+    EegSessionCreate,
+    EegSessionRead,
+    EegTrendBucket,
+)
+from ..mood_rollups import Period
+from ..response_cache import cache_headers, etag_for, not_modified, response_cache
+
+
+router = APIRouter(prefix="/eeg", tags=["eeg"], route_class=SessionRoute)
+
+
+# Per-row results returned inline by the batch endpoint; the summary always
+# covers every row.
+MAX_BATCH_RESULTS = 200
+
+
+# Samples up to this size are rendered and compressed once per seed; larger
+# ones are streamed chunk by chunk
+SAMPLE_CACHE_MAX_ROWS = 100
+MAX_SAMPLE_ROWS = 10_000
+
+_SAMPLE_HEADERS = {"Content-Disposition": "attachment; filename=sample_eeg.csv"}
+
+
+def _sample_csv_response(request: Request, rows: int, seed: Optional[int]) -> Response:
+    if seed is None:
+        # Fresh rows on every request, so nothing to cache or tag
+        return StreamingResponse(
+            iter_sample_csv(rows, None),
+            media_type="text/csv",
+            headers={**_SAMPLE_HEADERS, "Cache-Control": "no-store"},
+        )
+    if rows <= SAMPLE_CACHE_MAX_ROWS:
+        return response_cache.respond(
+            request,
+            f"eeg-sample:{rows}:{seed}",
+            lambda: b"".join(iter_sample_csv(rows, seed)),
+            "text/csv",
+            _SAMPLE_HEADERS,
+        )
+    # Output is a pure function of the parameters, so they tag it
+    etag = etag_for("eeg-sample", rows, seed)
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return StreamingResponse(iter_sample_csv(rows, seed), media_type="text/csv", headers=cache_headers(etag, _SAMPLE_HEADERS))
 
 
 @router.get("/sample.csv")
-def generate_sample_csv() -> StreamingResponse:
-    return _sample_csv_stream()
+def generate_sample_csv(
+    request: Request,
+    rows: int = Query(5, ge=1, le=MAX_SAMPLE_ROWS),
+    seed: Optional[int] = Query(None, ge=0, description="Random seed; the same rows and seed give the same file. Unseeded samples differ every time."),
+) -> Response:
+    return _sample_csv_response(request, rows, seed)
 
 
 @router.get("/sample")
-def generate_sample_csv_alt() -> StreamingResponse:
-    return _sample_csv_stream()
+def generate_sample_csv_alt(
+    request: Request,
+    rows: int = Query(5, ge=1, le=MAX_SAMPLE_ROWS),
+    seed: Optional[int] = Query(None, ge=0, description="Random seed; the same rows and seed give the same file. Unseeded samples differ every time."),
+) -> Response:
+    return _sample_csv_response(request, rows, seed)
+
+
+def _cache_response(key: Optional[str], payload: dict) -> JSONResponse:
+    response = JSONResponse(payload)
+    if key is not None:
+        prediction_cache.put(key, bytes(response.body))
+    return response
+
+
+def _parse_targets(targets: str) -> List[TargetType]:
+    requested = [t.strip() for t in targets.split(",") if t.strip()]
+    if not requested or "all" in requested:
+        return list(ALL_TARGETS)
+    unknown = [t for t in requested if t not in ALL_TARGETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown targets: {', '.join(unknown)}")
+    # Drop duplicates, keep request order
+    return list(dict.fromkeys(requested))  # type: ignore[arg-type]
+
+
+# Registered before /predict/{target} so "multi" is not taken for a target name
+@router.post("/predict/multi")
+async def predict_multi(
+    file: UploadFile = File(...),
+    targets: str = Query("all", description="Comma-separated targets, or 'all'"),
+    shape: Optional[str] = Query(None, description="Declared 'rows,features' of a raw float32 upload"),
+) -> JSONResponse:
+    fmt = upload_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FORMAT)
+    selected = _parse_targets(targets)
+
+    specs = registry.specs(selected)
+    labels = ",".join(spec.label for spec in specs.values())
+    key = await upload_key(file, "multi", ",".join(selected), labels, fmt, shape)
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        return Response(cached, media_type="application/json")
+    pool.check_capacity()
+
+    # Statistics are computed once per block and shared by every target
+    summaries = {t: RunningSummary(t) for t in selected}
+    first: dict = {}
+    count = 0
+    async for scored in pool.score_units(iter_upload_units(file, fmt, shape), selected, specs):
+        rows = len(scored)
+        if not rows:
+            continue
+        for t, results in scored.results.items():
+            summaries[t].update(results)
+            if not count:
+                first[t] = results[0]
+        count += rows
+    if not count:
+        raise HTTPException(status_code=400, detail="Upload has no valid data rows")
+
+    return _cache_response(key, {
+        "count": count,
+        "targets": {
+            t: {"result": first[t], "summary": summaries[t].result(), "model": specs[t].label}
+            for t in selected
+        },
+    })
 
 
 @router.post("/predict/{target}")
 async def predict(
     target: TargetType,
     file: UploadFile = File(...),
+    shape: Optional[str] = Query(None, description="Declared 'rows,features' of a raw float32 upload"),
 ) -> JSONResponse:
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Please upload a CSV file")
+    fmt = upload_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FORMAT)
+
+    specs = registry.specs([target])
+    model = specs[target].label
+    key = await upload_key(file, "predict", target, model, fmt, shape)
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        return Response(cached, media_type="application/json")
+    if fmt != "csv":
+        matrix = open_binary(file, fmt, shape)
+        if not matrix.shape[0]:
+            raise HTTPException(status_code=400, detail="Upload has no data rows")
+        if not np.isfinite(matrix[0]).all():
+            raise HTTPException(status_code=400, detail="Upload contains non-finite values")
+        # Copied out of the upload, which may be closed before the batch is scored
+        result = await batcher.predict(np.array(matrix[:1], dtype=FEATURE_DTYPE), specs[target])
+        eeg_rows.inc()
+        return _cache_response(key, {"target": target, "result": result, "model": model})
 
-    content = (await file.read()).decode("utf-8", errors="ignore")
-    reader = csv.reader(io.StringIO(content))
-    rows = list(reader)
+    # Only the header and first data row are needed
+    start = time.perf_counter()
+    rows: List[List[str]] = []
+    async for chunk_rows in iter_csv_rows(file):
+        rows.extend(chunk_rows)
+        if len(rows) >= 2:
+            break
     if not rows:
         raise HTTPException(status_code=400, detail="CSV is empty")
 
@@ -122,69 +219,268 @@ async def predict(
         features = [float(x) for x in data_rows[0][:NUM_FEATURES]]
     except ValueError:
         raise HTTPException(status_code=400, detail="CSV contains non-numeric values")
+    if not all(math.isfinite(x) for x in features):
+        raise HTTPException(status_code=400, detail="CSV contains non-finite values")
     if len(features) < NUM_FEATURES:
         raise HTTPException(status_code=400, detail=f"Expected {NUM_FEATURES} features, got {len(features)}")
 
-    result = _predict_stub(features, target)
-    return JSONResponse({"target": target, "result": result})
+    matrix = np.asarray([features], dtype=FEATURE_DTYPE)
+    eeg_parse_time.observe(time.perf_counter() - start, format="csv")
+    # Scored together with other single-row requests arriving meanwhile
+    result = await batcher.predict(matrix, specs[target])
+    eeg_rows.inc()
+    return _cache_response(key, {"target": target, "result": result, "model": model})
+
+
+async def _ndjson_batch(target: TargetType, model: str, scored_units: AsyncIterator[ScoredUnit]) -> AsyncIterator[bytes]:
+    # One line per scored block, then a final summary line
+    summary = RunningSummary(target)
+    count = 0
+    async for scored in scored_units:
+        results = scored.results[target]
+        if not results:
+            continue
+        record = {"type": "results", "offset": count, "results": results}
+        count += len(results)
+        summary.update(results)
+        yield (json.dumps(record) + "\n").encode("utf-8")
+    record = {"type": "summary", "target": target, "model": model, "count": count, "summary": summary.result()}
+    yield (json.dumps(record) + "\n").encode("utf-8")
+
+
+async def _prefetched(first: Optional[FeatureUnit], rest: AsyncIterator[FeatureUnit]) -> AsyncIterator[FeatureUnit]:
+    if first is not None:
+        yield first
+        async for unit in rest:
+            yield unit
 
 
 @router.post("/predict/batch/{target}")
 async def predict_batch(
     target: TargetType,
     file: UploadFile = File(...),
-) -> JSONResponse:
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Please upload a CSV file")
+    stream: bool = Query(False, description="Stream every result as NDJSON, one line per scored block"),
+    shape: Optional[str] = Query(None, description="Declared 'rows,features' of a raw float32 upload"),
+) -> Response:
+    fmt = upload_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FORMAT)
 
-    content = (await file.read()).decode("utf-8", errors="ignore")
-    reader = csv.reader(io.StringIO(content))
-    rows = list(reader)
-    if not rows:
-        raise HTTPException(status_code=400, detail="CSV is empty")
+    # Streamed responses are not cached; they are meant for uploads too large
+    # to hold as one body.
+    specs = registry.specs([target])
+    model = specs[target].label
+    key = None
+    if not stream:
+        key = await upload_key(file, "batch", target, model, fmt, shape)
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            return Response(cached, media_type="application/json")
+    pool.check_capacity()
 
-    data_rows = rows[1:] if rows and any(isinstance(v, str) for v in rows[0]) else rows
-    results: List[dict] = []
-    for row in data_rows:
+    units = iter_upload_units(file, fmt, shape)
+    if stream:
+        # Read the first block up front so upload errors still map to a 400
         try:
-            feats = [float(x) for x in row[:NUM_FEATURES]]
-        except ValueError:
-            continue
-        if len(feats) < NUM_FEATURES:
-            continue
-        results.append(_predict_stub(feats, target))
-
-    summary = {}
-    if target in {"depression", "anxiety", "ptsd", "ocd", "adhd"}:
-        probs = [r["probability"] for r in results if "probability" in r]
-        if probs:
-            summary = {"mean_probability": round(sum(probs) / len(probs), 3)}
-    elif target == "severity":
-        vals = [r["severity"] for r in results if "severity" in r]
-        if vals:
-            summary = {
-                "mean": round(sum(vals) / len(vals), 2),
-                "min": min(vals),
-                "max": max(vals),
-            }
-    elif target in {"stress", "burnout", "wellbeing"}:
-        key = "stress" if target == "stress" else ("burnout" if target == "burnout" else "wellbeing")
-        vals = [r[key] for r in results if key in r]
-        if vals:
-            summary = {
-                "mean": round(sum(vals) / len(vals), 2),
-                "min": min(vals),
-                "max": max(vals),
-            }
-    elif target == "insomnia":
-        vals = [r["insomnia"] for r in results if "insomnia" in r]
-        if vals:
-            summary = {
-                "mean": round(sum(vals) / len(vals), 2),
-                "min": min(vals),
-                "max": max(vals),
-            }
-
-    return JSONResponse({"target": target, "count": len(results), "results": results[:200], "summary": summary})
+            first: Optional[FeatureUnit] = await units.__anext__()
+        except StopAsyncIteration:
+            first = None
+        scored = pool.score_units(_prefetched(first, units), [target], specs)
+        return StreamingResponse(_ndjson_batch(target, model, scored), media_type="application/x-ndjson")
+
+    # Rows are parsed and scored block by block; only running totals and the
+    # first MAX_BATCH_RESULTS results are kept in memory.
+    summary = RunningSummary(target)
+    results: List[dict] = []
+    count = 0
+    async for scored in pool.score_units(units, [target], specs):
+        block_results = scored.results[target]
+        count += len(block_results)
+        summary.update(block_results)
+        if len(results) < MAX_BATCH_RESULTS:
+            results.extend(block_results[: MAX_BATCH_RESULTS - len(results)])
+
+    return _cache_response(key, {
+        "target": target,
+        "model": model,
+        "count": count,
+        "results": results,
+        "summary": summary.result(),
+    })
+
+
+@router.post("/jobs/{target}", response_model=EegJobRead, status_code=202)
+async def submit_job(
+    target: TargetType,
+    file: UploadFile = File(...),
+    shape: Optional[str] = Query(None, description="Declared 'rows,features' of a raw float32 upload"),
+) -> EegJobRead:
+    fmt = upload_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FORMAT)
+    return await jobs.submit(file, target, fmt, shape)
+
+
+@router.get("/jobs/{job_id}", response_model=EegJobRead)
+def get_job(job_id: str, session: Session = Depends(get_session)) -> EegJobRead:
+    job = session.get(EegJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_read(job)
+
+
+@router.get("/jobs/{job_id}/results")
+def get_job_results(job_id: str, session: Session = Depends(get_session)) -> FileResponse:
+    job = session.get(EegJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return FileResponse(
+        jobs.results_path(job_id),
+        media_type="application/x-ndjson",
+        filename=f"eeg_job_{job_id}.ndjson",
+    )
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=EegJobRead)
+async def cancel_job(job_id: str) -> EegJobRead:
+    # On the event loop, which owns the job's task; the returned row is
+    # already "cancelled"
+    cancelled = await jobs.cancel(job_id)
+    if cancelled is not None:
+        return cancelled
+    job = await run_in_threadpool(jobs.read, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+
+@router.delete("/jobs/{job_id}", status_code=204, response_class=Response)
+def delete_job(job_id: str, session: Session = Depends(get_session)) -> Response:
+    job = session.get(EegJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in ACTIVE_STATUSES:
+        raise HTTPException(status_code=409, detail="Cancel the job before deleting it")
+    jobs.delete_files(job_id)
+    session.delete(job)
+    session.commit()
+    return Response(status_code=204)
+
+
+def _get_session(session: Session, session_id: str) -> EegSession:
+    record = session.get(EegSession, session_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return record
+
+
+@router.post("/sessions", response_model=EegSessionRead, status_code=201)
+def create_session(payload: EegSessionCreate) -> EegSessionRead:
+    return sessions.create(payload.name)
+
+
+@router.get("/sessions", response_model=List[EegSessionRead])
+def list_sessions(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_session),
+) -> List[EegSessionRead]:
+    query = select(EegSession).order_by(EegSession.created_at.desc()).offset(offset).limit(limit)
+    return [session_read(record) for record in session.exec(query)]
+
+
+@router.get("/sessions/{session_id}", response_model=EegSessionRead)
+def get_eeg_session(session_id: str, session: Session = Depends(get_session)) -> EegSessionRead:
+    return session_read(_get_session(session, session_id))
+
+
+@router.delete("/sessions/{session_id}", status_code=204, response_class=Response)
+def delete_eeg_session(session_id: str, session: Session = Depends(get_session)) -> Response:
+    sessions.delete(session, _get_session(session, session_id))
+    return Response(status_code=204)
+
+
+@router.post("/sessions/{session_id}/segments", response_model=EegSegmentRead, status_code=201)
+async def append_segment(
+    session_id: str,
+    file: UploadFile = File(...),
+    targets: str = Query("all", description="Comma-separated targets, or 'all'"),
+    shape: Optional[str] = Query(None, description="Declared 'rows,features' of a raw float32 upload"),
+    recorded_at: Optional[datetime] = Query(None, description="When the block was recorded; defaults to now"),
+) -> EegSegmentRead:
+    fmt = upload_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_FORMAT)
+    selected = _parse_targets(targets)
+    pool.check_capacity()
+    return await sessions.append(session_id, file, fmt, shape, selected, recorded_at)
+
+
+@router.get("/sessions/{session_id}/segments", response_model=List[EegSegmentRead])
+def list_segments(session_id: str, session: Session = Depends(get_session)) -> List[EegSegmentRead]:
+    _get_session(session, session_id)
+    query = select(EegSegment).where(EegSegment.session_id == session_id).order_by(EegSegment.seq)
+    return [segment_read(segment) for segment in session.exec(query)]
+
+
+@router.get("/sessions/{session_id}/segments/{seq}/features")
+def get_segment_features(session_id: str, seq: int, session: Session = Depends(get_session)) -> FileResponse:
+    segment = session.exec(
+        select(EegSegment).where(EegSegment.session_id == session_id, EegSegment.seq == seq)
+    ).first()
+    if not segment:
+        raise HTTPException(status_code=404, detail="Segment not found")
+    # The stored rows as a raw float32 file, ready to upload again
+    return FileResponse(
+        sessions.features_path(session_id, seq),
+        media_type="application/octet-stream",
+        filename=f"eeg_session_{session_id}_{seq}.f32",
+        headers={"X-Shape": f"{segment.rows},{NUM_FEATURES}"},
+    )
+
+
+@router.get("/sessions/{session_id}/features", response_model=EegFeatureStats)
+def get_feature_stats(session_id: str, session: Session = Depends(get_session)) -> dict:
+    record = _get_session(session, session_id)
+    moments = sessions.feature_moments(session_id, record.segments)
+    if not moments.count:
+        return {"count": 0, "mean": [], "variance": [], "min": [], "max": []}
+    return {
+        "count": moments.count,
+        "mean": moments.mean.tolist(),
+        "variance": moments.variance.tolist(),
+        "min": moments.min.tolist(),
+        "max": moments.max.tolist(),
+    }
+
+
+@router.get("/sessions/{session_id}/trend", response_model=List[EegTrendBucket])
+def get_trend(
+    session_id: str,
+    target: TargetType,
+    period: Period = "day",
+    since: Optional[date] = Query(None, description="First day to include"),
+    until: Optional[date] = Query(None, description="Day after the last one to include"),
+    session: Session = Depends(get_session),
+) -> List[dict]:
+    _get_session(session, session_id)
+    return trend(session, session_id, target, period, since, until)
+
+
+@router.get("/models")
+def list_models() -> List[dict]:
+    return registry.describe()
+
+
+@router.post("/models/reload")
+def reload_models() -> dict:
+    # Requests already in flight finish on the versions they started with
+    errors = registry.load()
+    return {"models": registry.describe(), "errors": errors}
 
 
+@router.get("/cache/stats")
+def cache_stats() -> dict:
+    return prediction_cache.stats()
@@ -1,32 +1,65 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy import desc
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, File, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
 
-from ..db import get_session
+from ..bulk import BulkFormat, bulk_format, export_rows, import_rows
+from ..db import SessionRoute, get_session
 from ..models import (
+    ImportResult,
     JournalEntry,
     JournalEntryCreate,
+    JournalEntryImport,
+    JournalEntryListItem,
     JournalEntryRead,
     JournalEntryUpdate,
+    JournalSearchHit,
 )
+from . import common
 
 
-router = APIRouter(prefix="/journal", tags=["journal"])
+router = APIRouter(prefix="/journal", tags=["journal"], route_class=SessionRoute)
 
 
-@router.get("/", response_model=List[JournalEntryRead])
-def list_journal(session: Session = Depends(get_session)) -> List[JournalEntry]:
-    statement = select(JournalEntry).order_by(desc(JournalEntry.created_at))
-    return list(session.exec(statement))
+@router.get("/", response_model=List[JournalEntryListItem], response_model_exclude_unset=True)
+def list_journal(
+    response: Response,
+    query: common.PageQuery = Depends(common.page_query),
+    session: Session = Depends(get_session),
+) -> List[dict]:
+    return common.list_page(session, JournalEntry, response, query)
+
+
+@router.get("/search", response_model=List[JournalSearchHit])
+def search_journal(
+    response: Response,
+    query: common.SearchQuery = Depends(common.search_query),
+    session: Session = Depends(get_session),
+) -> List[dict]:
+    return common.search_journal(session, response, query)
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_journal(
+    file: UploadFile = File(...),
+    format: Optional[BulkFormat] = Query(None, description="Defaults from the file extension"),
+    session: Session = Depends(get_session),
+) -> dict:
+    fmt = bulk_format(format, file.filename)
+    return await import_rows(session, file, fmt, JournalEntry, JournalEntryImport)
+
+
+@router.get("/export")
+def export_journal(format: BulkFormat = "ndjson") -> StreamingResponse:
+    return common.export_response("journal", export_rows(JournalEntry, list(JournalEntry.model_fields), format), format)
 
 
 @router.post("/", response_model=JournalEntryRead)
 def create_entry(payload: JournalEntryCreate, session: Session = Depends(get_session)) -> JournalEntry:
-    entry = JournalEntry(title=payload.title, content=payload.content)
+    entry = common.new_journal_entry(payload)
     session.add(entry)
     session.commit()
     session.refresh(entry)
@@ -35,21 +68,13 @@ def create_entry(payload: JournalEntryCreate, session: Session = Depends(get_ses
 
 @router.get("/{entry_id}", response_model=JournalEntryRead)
 def get_entry(entry_id: int, session: Session = Depends(get_session)) -> JournalEntry:
-    entry = session.get(JournalEntry, entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Journal entry not found")
-    return entry
+    return common.found(session.get(JournalEntry, entry_id), "Journal entry not found")
 
 
 @router.patch("/{entry_id}", response_model=JournalEntryRead)
 def update_entry(entry_id: int, payload: JournalEntryUpdate, session: Session = Depends(get_session)) -> JournalEntry:
-    entry = session.get(JournalEntry, entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Journal entry not found")
-    if payload.title is not None:
-        entry.title = payload.title
-    if payload.content is not None:
-        entry.content = payload.content
+    entry = common.found(session.get(JournalEntry, entry_id), "Journal entry not found")
+    common.update_journal_entry(entry, payload)
     session.add(entry)
     session.commit()
     session.refresh(entry)
@@ -58,11 +83,7 @@ def update_entry(entry_id: int, payload: JournalEntryUpdate, session: Session =
 
 @router.delete("/{entry_id}", status_code=204, response_class=Response)
 def delete_entry(entry_id: int, session: Session = Depends(get_session)) -> Response:
-    entry = session.get(JournalEntry, entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Journal entry not found")
+    entry = common.found(session.get(JournalEntry, entry_id), "Journal entry not found")
     session.delete(entry)
     session.commit()
     return Response(status_code=204)
-
-
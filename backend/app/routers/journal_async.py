@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..bulk import BulkFormat, bulk_format, export_rows_async, import_rows
+from ..db import get_async_session
+from ..models import (
+    ImportResult,
+    JournalEntry,
+    JournalEntryCreate,
+    JournalEntryImport,
+    JournalEntryListItem,
+    JournalEntryRead,
+    JournalEntryUpdate,
+    JournalSearchHit,
+)
+from . import common
+
+
+# The journal endpoints on the async engine, selected with APP_DB_ASYNC
+router = APIRouter(prefix="/journal", tags=["journal"])
+
+
+@router.get("/", response_model=List[JournalEntryListItem], response_model_exclude_unset=True)
+async def list_journal_async(
+    response: Response,
+    query: common.PageQuery = Depends(common.page_query),
+    session: AsyncSession = Depends(get_async_session),
+) -> List[dict]:
+    return await session.run_sync(common.list_page, JournalEntry, response, query)
+
+
+@router.get("/search", response_model=List[JournalSearchHit])
+async def search_journal_async(
+    response: Response,
+    query: common.SearchQuery = Depends(common.search_query),
+    session: AsyncSession = Depends(get_async_session),
+) -> List[dict]:
+    return await session.run_sync(common.search_journal, response, query)
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_journal_async(
+    file: UploadFile = File(...),
+    format: Optional[BulkFormat] = Query(None, description="Defaults from the file extension"),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    fmt = bulk_format(format, file.filename)
+    return await import_rows(session, file, fmt, JournalEntry, JournalEntryImport)
+
+
+@router.get("/export")
+async def export_journal_async(format: BulkFormat = "ndjson") -> StreamingResponse:
+    return common.export_response("journal", export_rows_async(JournalEntry, list(JournalEntry.model_fields), format), format)
+
+
+@router.post("/", response_model=JournalEntryRead)
+async def create_entry_async(payload: JournalEntryCreate, session: AsyncSession = Depends(get_async_session)) -> JournalEntry:
+    entry = common.new_journal_entry(payload)
+    session.add(entry)
+    await session.commit()
+    await session.refresh(entry)
+    return entry
+
+
+@router.get("/{entry_id}", response_model=JournalEntryRead)
+async def get_entry_async(entry_id: int, session: AsyncSession = Depends(get_async_session)) -> JournalEntry:
+    return common.found(await session.get(JournalEntry, entry_id), "Journal entry not found")
+
+
+@router.patch("/{entry_id}", response_model=JournalEntryRead)
+async def update_entry_async(entry_id: int, payload: JournalEntryUpdate, session: AsyncSession = Depends(get_async_session)) -> JournalEntry:
+    entry = common.found(await session.get(JournalEntry, entry_id), "Journal entry not found")
+    common.update_journal_entry(entry, payload)
+    session.add(entry)
+    await session.commit()
+    await session.refresh(entry)
+    return entry
+
+
+@router.delete("/{entry_id}", status_code=204, response_class=Response)
+async def delete_entry_async(entry_id: int, session: AsyncSession = Depends(get_async_session)) -> Response:
+    entry = common.found(await session.get(JournalEntry, entry_id), "Journal entry not found")
+    await session.delete(entry)
+    await session.commit()
+    return Response(status_code=204)
@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Response
+
+from ..metrics import CONTENT_TYPE, registry
+from ..response_cache import response_cache
+
+
+router = APIRouter(tags=["metrics"])
+
+
+# Read at scrape time; the EEG modules register theirs when they are imported
+registry.counter("response_cache_hits_total", "Precompressed response cache hits.", function=lambda: response_cache.hits)
+registry.counter("response_cache_misses_total", "Precompressed response cache misses.", function=lambda: response_cache.misses)
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -1,28 +1,64 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy import desc
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, File, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
 
-from ..db import get_session
-from ..models import MoodEntry, MoodEntryCreate, MoodEntryRead, MoodEntryUpdate
+from .. import mood_rollups
+from ..bulk import BulkFormat, bulk_format, export_rows, import_rows
+from ..db import SessionRoute, get_session
+from ..models import (
+    ImportResult,
+    MoodEntry,
+    MoodEntryCreate,
+    MoodEntryImport,
+    MoodEntryListItem,
+    MoodEntryRead,
+    MoodEntryUpdate,
+    MoodStatsBucket,
+)
+from . import common
 
 
-router = APIRouter(prefix="/moods", tags=["moods"])
+router = APIRouter(prefix="/moods", tags=["moods"], route_class=SessionRoute)
 
 
-@router.get("/", response_model=List[MoodEntryRead])
-def list_moods(session: Session = Depends(get_session)) -> List[MoodEntry]:
-    statement = select(MoodEntry).order_by(desc(MoodEntry.created_at))
-    return list(session.exec(statement))
+@router.get("/", response_model=List[MoodEntryListItem], response_model_exclude_unset=True)
+def list_moods(
+    response: Response,
+    query: common.PageQuery = Depends(common.page_query),
+    session: Session = Depends(get_session),
+) -> List[dict]:
+    return common.list_page(session, MoodEntry, response, query)
+
+
+@router.get("/stats", response_model=List[MoodStatsBucket])
+def mood_stats(query: common.StatsQuery = Depends(common.stats_query), session: Session = Depends(get_session)) -> List[dict]:
+    return common.mood_stats(session, query)
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_moods(
+    file: UploadFile = File(...),
+    format: Optional[BulkFormat] = Query(None, description="Defaults from the file extension"),
+    session: Session = Depends(get_session),
+) -> dict:
+    fmt = bulk_format(format, file.filename)
+    return await import_rows(session, file, fmt, MoodEntry, MoodEntryImport, on_batch=mood_rollups.record_moods)
+
+
+@router.get("/export")
+def export_moods(format: BulkFormat = "ndjson") -> StreamingResponse:
+    return common.export_response("mood", export_rows(MoodEntry, list(MoodEntry.model_fields), format), format)
 
 
 @router.post("/", response_model=MoodEntryRead)
 def create_mood(payload: MoodEntryCreate, session: Session = Depends(get_session)) -> MoodEntry:
-    entry = MoodEntry(mood_score=payload.mood_score, note=payload.note)
+    entry = common.new_mood(payload)
     session.add(entry)
+    mood_rollups.record_mood(session, entry)
     session.commit()
     session.refresh(entry)
     return entry
@@ -30,22 +66,15 @@ def create_mood(payload: MoodEntryCreate, session: Session = Depends(get_session
 
 @router.get("/{entry_id}", response_model=MoodEntryRead)
 def get_mood(entry_id: int, session: Session = Depends(get_session)) -> MoodEntry:
-    entry = session.get(MoodEntry, entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Mood entry not found")
-    return entry
+    return common.found(session.get(MoodEntry, entry_id), "Mood entry not found")
 
 
 @router.patch("/{entry_id}", response_model=MoodEntryRead)
 def update_mood(entry_id: int, payload: MoodEntryUpdate, session: Session = Depends(get_session)) -> MoodEntry:
-    entry = session.get(MoodEntry, entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Mood entry not found")
-    if payload.mood_score is not None:
-        entry.mood_score = payload.mood_score
-    if payload.note is not None:
-        entry.note = payload.note
+    entry = common.found(session.get(MoodEntry, entry_id), "Mood entry not found")
     session.add(entry)
+    if common.update_mood(entry, payload):
+        mood_rollups.refresh_day(session, entry.created_at)
     session.commit()
     session.refresh(entry)
     return entry
@@ -53,11 +82,8 @@ def update_mood(entry_id: int, payload: MoodEntryUpdate, session: Session = Depe
 
 @router.delete("/{entry_id}", status_code=204, response_class=Response)
 def delete_mood(entry_id: int, session: Session = Depends(get_session)) -> Response:
-    entry = session.get(MoodEntry, entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Mood entry not found")
+    entry = common.found(session.get(MoodEntry, entry_id), "Mood entry not found")
     session.delete(entry)
+    mood_rollups.refresh_day(session, entry.created_at)
     session.commit()
     return Response(status_code=204)
-
-
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .. import mood_rollups
+from ..bulk import BulkFormat, bulk_format, export_rows_async, import_rows
+from ..db import get_async_session
+from ..models import (
+    ImportResult,
+    MoodEntry,
+    MoodEntryCreate,
+    MoodEntryImport,
+    MoodEntryListItem,
+    MoodEntryRead,
+    MoodEntryUpdate,
+    MoodStatsBucket,
+)
+from . import common
+
+
+# The mood endpoints on the async engine, selected with APP_DB_ASYNC
+router = APIRouter(prefix="/moods", tags=["moods"])
+
+
+@router.get("/", response_model=List[MoodEntryListItem], response_model_exclude_unset=True)
+async def list_moods_async(
+    response: Response,
+    query: common.PageQuery = Depends(common.page_query),
+    session: AsyncSession = Depends(get_async_session),
+) -> List[dict]:
+    return await session.run_sync(common.list_page, MoodEntry, response, query)
+
+
+@router.get("/stats", response_model=List[MoodStatsBucket])
+async def mood_stats_async(query: common.StatsQuery = Depends(common.stats_query), session: AsyncSession = Depends(get_async_session)) -> List[dict]:
+    return await session.run_sync(common.mood_stats, query)
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_moods_async(
+    file: UploadFile = File(...),
+    format: Optional[BulkFormat] = Query(None, description="Defaults from the file extension"),
+    session: AsyncSession = Depends(get_async_session),
+) -> dict:
+    fmt = bulk_format(format, file.filename)
+    return await import_rows(session, file, fmt, MoodEntry, MoodEntryImport, on_batch=mood_rollups.record_moods)
+
+
+@router.get("/export")
+async def export_moods_async(format: BulkFormat = "ndjson") -> StreamingResponse:
+    return common.export_response("mood", export_rows_async(MoodEntry, list(MoodEntry.model_fields), format), format)
+
+
+@router.post("/", response_model=MoodEntryRead)
+async def create_mood_async(payload: MoodEntryCreate, session: AsyncSession = Depends(get_async_session)) -> MoodEntry:
+    entry = common.new_mood(payload)
+    session.add(entry)
+    await session.run_sync(mood_rollups.record_mood, entry)
+    await session.commit()
+    await session.refresh(entry)
+    return entry
+
+
+@router.get("/{entry_id}", response_model=MoodEntryRead)
+async def get_mood_async(entry_id: int, session: AsyncSession = Depends(get_async_session)) -> MoodEntry:
+    return common.found(await session.get(MoodEntry, entry_id), "Mood entry not found")
+
+
+@router.patch("/{entry_id}", response_model=MoodEntryRead)
+async def update_mood_async(entry_id: int, payload: MoodEntryUpdate, session: AsyncSession = Depends(get_async_session)) -> MoodEntry:
+    entry = common.found(await session.get(MoodEntry, entry_id), "Mood entry not found")
+    session.add(entry)
+    if common.update_mood(entry, payload):
+        await session.run_sync(mood_rollups.refresh_day, entry.created_at)
+    await session.commit()
+    await session.refresh(entry)
+    return entry
+
+
+@router.delete("/{entry_id}", status_code=204, response_class=Response)
+async def delete_mood_async(entry_id: int, session: AsyncSession = Depends(get_async_session)) -> Response:
+    entry = common.found(await session.get(MoodEntry, entry_id), "Mood entry not found")
+    await session.delete(entry)
+    await session.run_sync(mood_rollups.refresh_day, entry.created_at)
+    await session.commit()
+    return Response(status_code=204)
@@ -0,0 +1,363 @@
+"""Latency, throughput and memory of every API hot path, with regression diffs.
+
+Run from the repository root::
+
+    python -m backend.benchmarks.api_suite --out bench.json
+    python -m backend.benchmarks.api_suite --out new.json --compare bench.json
+    python -m backend.benchmarks.api_suite --diff bench.json new.json
+
+The real app is served in-process through httpx's ASGI transport against a
+fresh database filled with seeded synthetic moods, journal entries and EEG
+uploads, so two runs on the same machine see the same data. Nothing leaves
+the machine: chat uses the built-in fallback, or with ``--chat-stub`` a
+local OpenAI-compatible stub on the loopback interface.
+
+``--compare``/``--diff`` flag any endpoint whose p50 or p95 latency grew,
+or whose throughput fell, by more than ``--threshold``; the exit status is
+1 when something regressed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+_WORDS = (
+    "calm anxious walk tired grateful sleep work family friend rain sun run "
+    "breathe music stress hope quiet coffee read garden call therapy better"
+).split()
+
+# Metrics compared between runs, and the direction that counts as worse
+_COMPARED = {"p50_ms": 1, "p95_ms": 1, "rps": -1}
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    json: Optional[dict] = None
+    files: Optional[Dict[str, Tuple[str, bytes]]] = None
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _rss_bytes() -> int:
+    # Current resident set size; falls back to the lifetime peak off Linux
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _RssSampler:
+    """Peak RSS seen while a scenario runs, sampled from a background thread."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.start = self.peak = _rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self) -> "_RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # Just enough of the chat completions API for the chat router
+    reply = "I hear you. Try a slow breath in for four and out for six."
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for word in self.reply.split(" "):
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+        body = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+def start_chat_stub() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def synthetic_eeg_csv(rows: int, seed: int) -> bytes:
+    from backend.app.eeg_io import iter_sample_csv
+
+    return b"".join(iter_sample_csv(rows, seed))
+
+
+def seed_tables(moods: int, journal: int, seed: int) -> None:
+    """Fill the app database with ``moods`` mood rows and ``journal`` entries, one per hour back from now."""
+    from sqlalchemy import insert
+    from sqlmodel import Session
+
+    from backend.app import mood_rollups
+    from backend.app.db import engine
+    from backend.app.models import JournalEntry, MoodEntry
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        for start in range(0, moods, 5000):
+            session.execute(insert(MoodEntry), [
+                {"created_at": now - timedelta(hours=i), "mood_score": rng.randint(1, 10), "note": rng.choice(_WORDS)}
+                for i in range(start, min(start + 5000, moods))
+            ])
+        for start in range(0, journal, 1000):
+            session.execute(insert(JournalEntry), [
+                {
+                    "created_at": now - timedelta(hours=i),
+                    "title": " ".join(rng.choices(_WORDS, k=3)),
+                    "content": " ".join(rng.choices(_WORDS, k=rng.randint(30, 120))),
+                }
+                for i in range(start, min(start + 1000, journal))
+            ])
+        mood_rollups.rebuild(session)
+        session.commit()
+
+
+def scenarios(eeg_rows: int, seed: int) -> List[Scenario]:
+    eeg = synthetic_eeg_csv(eeg_rows, seed)
+    single = synthetic_eeg_csv(1, seed)
+    chat = {"message": "I have been feeling anxious about work", "history": []}
+    return [
+        Scenario("resources", "GET", "/api/resources/"),
+        Scenario("moods.list", "GET", "/api/moods/?limit=100"),
+        Scenario("moods.list.window", "GET", "/api/moods/?limit=100&since=2000-01-01T00:00:00&fields=mood_score"),
+        Scenario("moods.stats", "GET", "/api/moods/stats?period=week&window=4"),
+        Scenario("moods.create", "POST", "/api/moods/", json={"mood_score": 6, "note": "bench"}),
+        Scenario("journal.list", "GET", "/api/journal/?limit=50&fields=title"),
+        Scenario("journal.search", "GET", "/api/journal/search?q=calm%20wa&limit=20"),
+        Scenario("eeg.predict", "POST", "/api/eeg/predict/depression", files={"file": ("one.csv", single)}),
+        Scenario("eeg.predict.batch", "POST", "/api/eeg/predict/batch/depression", files={"file": ("batch.csv", eeg)}),
+        Scenario("eeg.predict.multi", "POST", "/api/eeg/predict/multi?targets=all", files={"file": ("batch.csv", eeg)}),
+        Scenario("chat", "POST", "/api/chat", json=chat),
+        Scenario("chat.stream", "POST", "/api/chat/stream", json=chat),
+    ]
+
+
+async def run_scenario(client: Any, scenario: Scenario, requests: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    async def call() -> Tuple[float, int]:
+        t0 = time.perf_counter()
+        response = await client.request(scenario.method, scenario.path, json=scenario.json, files=scenario.files)
+        await response.aread()
+        return time.perf_counter() - t0, response.status_code
+
+    for _ in range(warmup):
+        await call()
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            elapsed, status = await call()
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    with _RssSampler() as rss:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "rss_peak_mb": round(rss.peak / 2 ** 20, 1),
+        "rss_growth_mb": round((rss.peak - rss.start) / 2 ** 20, 1),
+        "statuses": statuses,
+    }
+
+
+async def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    import httpx
+
+    from backend.app.main import app
+
+    only = set(args.only.split(",")) if args.only else None
+    results: Dict[str, Any] = {}
+    async with app.router.lifespan_context(app):
+        seed_tables(args.moods, args.journal, args.seed)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            for scenario in scenarios(args.eeg_rows, args.seed):
+                if only is not None and scenario.name not in only:
+                    continue
+                results[scenario.name] = await run_scenario(client, scenario, args.requests, args.concurrency, args.warmup)
+                _print_row(scenario.name, results[scenario.name])
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Human-readable regressions of ``current`` against ``baseline``."""
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        for metric, direction in _COMPARED.items():
+            old, new = before.get(metric), now.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * direction > threshold:
+                regressions.append(f"{name}: {metric} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def _report(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> int:
+    skip = {"only", "threshold"}
+    options = [{k: v for k, v in run["meta"].get("args", {}).items() if k not in skip} for run in (baseline, current)]
+    if options[0] != options[1]:
+        print("Note: the runs used different options, so differences may not be regressions")
+    regressions = compare(baseline, current, threshold)
+    print("\n".join(regressions) or "No regressions")
+    return 1 if regressions else 0
+
+
+def _print_header() -> None:
+    print(f"{'endpoint':<20}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>9}{'+MB':>7}  statuses")
+
+
+def _print_row(name: str, r: Dict[str, Any]) -> None:
+    print(f"{name:<20}{r['rps']:>9}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['rss_peak_mb']:>9}{r['rss_growth_mb']:>7}  {r['statuses']}")
+
+
+def _configure_env(args: argparse.Namespace) -> Optional[ThreadingHTTPServer]:
+    # Must run before the app is imported: every setting is read at import
+    os.environ["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="api-bench-"), "bench.db")
+    os.environ["EEG_JOB_DIR"] = os.path.join(os.path.dirname(os.environ["APP_DB_PATH"]), "jobs")
+    os.environ["EEG_POOL_WORKERS"] = str(args.eeg_workers)
+    # Repeated uploads and messages would otherwise be answered from the caches
+    os.environ["EEG_CACHE_MAX_ENTRIES"] = "0"
+    os.environ["CHAT_CACHE_MAX_ENTRIES"] = "0"
+    # One client sends every request, so per-client rate limits would throttle it
+    os.environ["APP_ADMISSION_CONTROL"] = "0"
+    os.environ.pop("EEG_CACHE_DIR", None)
+    if not args.chat_stub:
+        os.environ.pop("OPENAI_API_KEY", None)
+        return None
+    server = start_chat_stub()
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--moods", type=int, default=50000, help="synthetic mood rows")
+    parser.add_argument("--journal", type=int, default=5000, help="synthetic journal entries")
+    parser.add_argument("--eeg-rows", type=int, default=500, help="rows per synthetic EEG upload")
+    parser.add_argument("--eeg-workers", type=int, default=0, help="EEG_POOL_WORKERS for the run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="comma-separated endpoint names")
+    parser.add_argument("--chat-stub", action="store_true", help="exercise the OpenAI client against a local stub")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON to check this run against")
+    parser.add_argument("--diff", nargs=2, metavar=("BASELINE", "CURRENT"), help="compare two saved runs and exit")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    args = parser.parse_args()
+
+    if args.diff:
+        with open(args.diff[0]) as fh:
+            baseline = json.load(fh)
+        with open(args.diff[1]) as fh:
+            current = json.load(fh)
+        sys.exit(_report(baseline, current, args.threshold))
+
+    server = _configure_env(args)
+    _print_header()
+    try:
+        results = asyncio.run(run_suite(args))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    run = {
+        "meta": {
+            "started": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "diff")},
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(run, fh, indent=2)
+    if args.compare:
+        with open(args.compare) as fh:
+            sys.exit(_report(json.load(fh), run, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
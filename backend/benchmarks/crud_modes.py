@@ -0,0 +1,139 @@
+"""Load test of the mood/journal API in sync (threadpool) and async DB modes.
+
+Run from the repository root::
+
+    python -m backend.benchmarks.crud_modes --concurrency 200 --seconds 10
+
+Each mode runs in a fresh interpreter with ``APP_DB_ASYNC`` set, serving the
+real app in-process through httpx's ASGI transport. Clients loop over a mix
+of list pages, stats, searches and creates.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+MODES = {"sync": "0", "async": "1"}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _seed(client, rows: int) -> None:
+    lines = "\n".join(
+        json.dumps({"mood_score": 1 + i % 10, "note": f"note {i}", "created_at": "2024-01-01T00:00:00Z"})
+        for i in range(rows)
+    )
+    await client.post("/api/moods/import", files={"file": ("seed.ndjson", lines.encode())})
+    entries = "\n".join(json.dumps({"title": f"entry {i}", "content": f"felt calm after walk {i}"}) for i in range(rows // 10))
+    await client.post("/api/journal/import", files={"file": ("seed.ndjson", entries.encode())})
+
+
+async def _load(concurrency: int, seconds: float, seed_rows: int) -> Dict[str, object]:
+    import httpx
+
+    from backend.app.main import app
+
+    latencies: Dict[str, List[float]] = {}
+    statuses: Dict[int, int] = {}
+    requests = [
+        ("list", "GET", "/api/moods/?limit=20"),
+        ("list", "GET", "/api/journal/?limit=20&fields=title"),
+        ("stats", "GET", "/api/moods/stats?period=week"),
+        ("search", "GET", "/api/journal/search?q=calm"),
+        ("create", "POST", "/api/moods/"),
+    ]
+    weights = [4, 2, 1, 1, 2]
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await _seed(client, seed_rows)
+            deadline = time.perf_counter() + seconds
+
+            async def worker(index: int) -> None:
+                rng = random.Random(index)
+                while time.perf_counter() < deadline:
+                    kind, method, path = rng.choices(requests, weights)[0]
+                    body = {"mood_score": rng.randint(1, 10), "note": "bench"} if method == "POST" else None
+                    t0 = time.perf_counter()
+                    response = await client.request(method, path, json=body)
+                    latencies.setdefault(kind, []).append(time.perf_counter() - t0)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(worker(i) for i in range(concurrency)))
+            wall = time.perf_counter() - t0
+
+    total = [v for values in latencies.values() for v in values]
+    result: Dict[str, object] = {
+        "requests": len(total),
+        "rps": round(len(total) / wall, 1),
+        "p50_ms": round(_percentile(total, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(total, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(total, 0.99) * 1000, 1),
+        "statuses": statuses,
+    }
+    result["by_kind"] = {
+        kind: {"count": len(values), "p50_ms": round(_percentile(values, 0.5) * 1000, 1), "p99_ms": round(_percentile(values, 0.99) * 1000, 1)}
+        for kind, values in sorted(latencies.items())
+    }
+    return result
+
+
+def run_mode(mode: str, concurrency: int, seconds: float, seed_rows: int) -> Dict[str, object]:
+    env = dict(os.environ)
+    env["APP_DB_ASYNC"] = MODES[mode]
+    env["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="crud-bench-"), "bench.db")
+    env.setdefault("EEG_POOL_WORKERS", "0")
+    # Every client shares one address, so per-client rate limits would throttle them
+    env["APP_ADMISSION_CONTROL"] = "0"
+    args = [sys.executable, "-m", "backend.benchmarks.crud_modes", "--child", "--concurrency", str(concurrency), "--seconds", str(seconds), "--seed-rows", str(seed_rows)]
+    proc = subprocess.run(args, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"{mode} run failed:\n{proc.stderr}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["mode"] = mode
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed-rows", type=int, default=20000)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_load(args.concurrency, args.seconds, args.seed_rows))))
+        return
+
+    results = [run_mode(m.strip(), args.concurrency, args.seconds, args.seed_rows) for m in args.modes.split(",")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for r in results:
+        print(f"{r['mode']:<8}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}  {r['statuses']}")
+        for kind, k in r["by_kind"].items():
+            print(f"  {kind:<8}{k['count']:>7} req  p50 {k['p50_ms']} ms  p99 {k['p99_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Mixed read/write throughput of the SQLite engine profiles.
+
+Run from the repository root::
+
+    python -m backend.benchmarks.db_profile --threads 40 --seconds 10
+
+Each profile gets a fresh database seeded with mood entries. Worker threads
+then mimic the API: list pages through the keyset pagination, mood writes
+through the rollup upsert, and journal inserts.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from fastapi import Response
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel
+
+from backend.app import mood_rollups
+from backend.app.db import build_engine
+from backend.app.models import JournalEntry, MoodEntry
+from backend.app.pagination import keyset_page
+
+
+def _seed(engine, rows: int) -> None:
+    start = datetime.utcnow() - timedelta(hours=rows)
+    with Session(engine) as session:
+        for i in range(rows):
+            session.add(MoodEntry(created_at=start + timedelta(hours=i), mood_score=1 + i % 10))
+        session.commit()
+        mood_rollups.rebuild(session)
+        session.commit()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_profile(profile: str, threads: int, seconds: float, write_ratio: float, seed_rows: int) -> Dict[str, object]:
+    directory = tempfile.mkdtemp(prefix="db-bench-")
+    engine = build_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", profile)
+    SQLModel.metadata.create_all(engine)
+    _seed(engine, seed_rows)
+
+    lock = threading.Lock()
+    latencies: Dict[str, List[float]] = {"read": [], "write": []}
+    errors: Dict[str, int] = {}
+    deadline = time.perf_counter() + seconds
+
+    def worker(index: int) -> None:
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            kind = "write" if rng.random() < write_ratio else "read"
+            t0 = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    if kind == "read":
+                        keyset_page(session, MoodEntry, Response(), ["id", "created_at", "mood_score"], 100)
+                    elif rng.random() < 0.5:
+                        entry = MoodEntry(mood_score=rng.randint(1, 10))
+                        session.add(entry)
+                        mood_rollups.record_mood(session, entry)
+                        session.commit()
+                    else:
+                        session.add(JournalEntry(title="bench", content="x" * 512))
+                        session.commit()
+            except OperationalError as exc:
+                message = str(exc.orig)
+                with lock:
+                    errors[message] = errors.get(message, 0) + 1
+                continue
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies[kind].append(elapsed)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    wall = time.perf_counter() - t0
+    engine.dispose()
+
+    result: Dict[str, object] = {"profile": profile, "seconds": round(wall, 2), "errors": errors}
+    for kind, values in latencies.items():
+        result[kind] = {
+            "ops": len(values),
+            "ops_per_s": round(len(values) / wall, 1),
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 2),
+        }
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", default="basic,production")
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--seed-rows", type=int, default=20000)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        run_profile(p.strip(), args.threads, args.seconds, args.write_ratio, args.seed_rows)
+        for p in args.profiles.split(",")
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'profile':<12}{'kind':<7}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for result in results:
+        for kind in ("read", "write"):
+            r = result[kind]
+            print(f"{result['profile']:<12}{kind:<7}{r['ops_per_s']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+        for message, count in result["errors"].items():
+            print(f"{'':<12}error  {count} x {message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Load test of single-row EEG predictions with and without micro-batching.
+
+Run from the repository root::
+
+    python -m backend.benchmarks.eeg_batching --concurrency 200 --seconds 10
+
+Each batching window runs in a fresh interpreter with ``EEG_BATCH_WINDOW_MS``
+set, serving the real app in-process through httpx's ASGI transport. Every
+client posts one distinct row at a time to ``/api/eeg/predict/{target}`` from
+its own address, as devices do, with admission control on unless
+``--admission off``; shed devices wait out ``Retry-After``. The prediction
+cache is off so every request is scored. With ``--trees`` the target is
+served by a synthetic tree ensemble instead of the heuristic, whose per-call
+cost is what batching amortizes.
+
+Compare throughput. An unbatched request never yields to the event loop,
+so its measured latency leaves out the time it queued behind the other
+clients; concurrency / req/s is the mean time in the system either way.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _rows(count: int, seed: int) -> List[bytes]:
+    rng = random.Random(seed)
+    header = ",".join(f"f{i}" for i in range(1024))
+    return [
+        (header + "\n" + ",".join(f"{rng.uniform(-1, 1):.4f}" for _ in range(1024)) + "\n").encode()
+        for _ in range(count)
+    ]
+
+
+def _write_trees(directory: str, target: str, trees: int, depth: int) -> None:
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    nodes = 2 ** (depth + 1) - 1
+    index = np.arange(nodes)
+    internal = index < 2 ** depth - 1
+    path = os.path.join(directory, target, "1")
+    os.makedirs(path)
+    np.savez(
+        os.path.join(path, "trees.npz"),
+        feature=rng.integers(0, 1024, (trees, nodes)),
+        threshold=rng.uniform(-1, 1, (trees, nodes)),
+        left=np.tile(np.where(internal, 2 * index + 1, -1), (trees, 1)),
+        right=np.tile(np.where(internal, 2 * index + 2, -1), (trees, 1)),
+        value=rng.normal(0, 0.1, (trees, nodes)),
+    )
+    with open(os.path.join(path, "model.json"), "w", encoding="utf-8") as fh:
+        json.dump({"kind": "trees", "trees": "trees.npz"}, fh)
+
+
+async def _load(concurrency: int, seconds: float, target: str) -> Dict[str, object]:
+    import httpx
+
+    from backend.app.main import app
+    from backend.app.metrics import eeg_batch_rows
+
+    bodies = _rows(256, 0)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async with app.router.lifespan_context(app):
+        deadline = time.perf_counter() + seconds
+
+        async def worker(index: int) -> None:
+            # One address per device, so per-client rate limits apply as in production
+            transport = httpx.ASGITransport(app=app, client=(f"10.0.{index // 250}.{index % 250 + 1}", 50000))
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                n = index
+                while time.perf_counter() < deadline:
+                    body = bodies[n % len(bodies)]
+                    n += concurrency
+                    t0 = time.perf_counter()
+                    response = await client.post(f"/api/eeg/predict/{target}", files={"file": ("row.csv", body)})
+                    latencies.append(time.perf_counter() - t0)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                    # Shed devices back off as told rather than spinning
+                    retry_after = response.headers.get("retry-after")
+                    if retry_after:
+                        await asyncio.sleep(min(float(retry_after), max(0.0, deadline - time.perf_counter())))
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        wall = time.perf_counter() - t0
+
+    batches = eeg_batch_rows.count()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "mean_batch": round(len(latencies) / batches, 1) if batches else 1.0,
+        "statuses": statuses,
+    }
+
+
+def run_window(
+    window_ms: str,
+    concurrency: int,
+    seconds: float,
+    target: str,
+    max_rows: int,
+    model_dir: str = "",
+    admission: bool = True,
+) -> Dict[str, object]:
+    env = dict(os.environ)
+    if model_dir:
+        env["EEG_MODEL_DIR"] = model_dir
+    env["EEG_BATCH_WINDOW_MS"] = window_ms
+    env["EEG_BATCH_MAX_ROWS"] = str(max_rows)
+    env["EEG_CACHE_MAX_ENTRIES"] = "0"
+    # Single-row predictions must get through the default limits; see
+    # load_shedding for what is shed under overload
+    env["APP_ADMISSION_CONTROL"] = "1" if admission else "0"
+    env["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="batch-bench-"), "bench.db")
+    env.setdefault("EEG_POOL_WORKERS", "0")
+    args = [sys.executable, "-m", "backend.benchmarks.eeg_batching", "--child", "--concurrency", str(concurrency), "--seconds", str(seconds), "--target", target]
+    proc = subprocess.run(args, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"window {window_ms} ms run failed:\n{proc.stderr}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["window_ms"] = window_ms
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--windows", default="0,2,5", help="comma-separated EEG_BATCH_WINDOW_MS values; 0 is unbatched")
+    parser.add_argument("--max-rows", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--target", default="depression")
+    parser.add_argument("--trees", type=int, default=0, help="serve the target from a synthetic ensemble of this many trees")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--admission", choices=("on", "off"), default="on", help="APP_ADMISSION_CONTROL with its default limits")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_load(args.concurrency, args.seconds, args.target))))
+        return
+
+    model_dir = ""
+    if args.trees:
+        model_dir = tempfile.mkdtemp(prefix="batch-models-")
+        _write_trees(model_dir, args.target, args.trees, args.depth)
+    results = [
+        run_window(w.strip(), args.concurrency, args.seconds, args.target, args.max_rows, model_dir, args.admission == "on")
+        for w in args.windows.split(",")
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'window':<8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'batch':>8}  statuses")
+    for r in results:
+        print(f"{r['window_ms'] + ' ms':<8}{r['rps']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['mean_batch']:>8}  {r['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Load test of crisis-path latency while EEG uploads saturate the server.
+
+Run from the repository root::
+
+    python -m backend.benchmarks.load_shedding --eeg-clients 100 --seconds 10
+
+Each mode runs in a fresh interpreter, serving the real app in-process
+through httpx's ASGI transport:
+
+- ``idle``: crisis clients only, the baseline
+- ``off``: crisis clients plus the EEG flood, ``APP_ADMISSION_CONTROL=0``
+- ``on``: the same with admission control
+
+Crisis clients poll ``/api/resources/`` and post to ``/api/chat`` (the
+no-key fallback) on a fixed schedule, and latency is measured from when
+each request was due. Each EEG client uploads ``--eeg-rows`` rows to
+``/api/eeg/predict/batch/{target}`` back to back from its own address,
+waiting out ``Retry-After`` when shed. Compare the resources p99 across
+modes; the EEG row shows what was shed to keep it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+MODES = ("idle", "off", "on")
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _upload(rows: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    lines = [",".join(f"f{i}" for i in range(1024))]
+    lines.extend(",".join(f"{rng.uniform(-1, 1):.4f}" for _ in range(1024)) for _ in range(rows))
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def _load(args: argparse.Namespace) -> Dict[str, Dict[str, object]]:
+    import httpx
+
+    from backend.app.main import app
+
+    latencies: Dict[str, List[float]] = {"resources": [], "chat": [], "eeg": []}
+    statuses: Dict[str, Dict[int, int]] = {name: {} for name in latencies}
+    body = _upload(args.eeg_rows, 0)
+
+    def record(name: str, started: float, response: httpx.Response) -> None:
+        latencies[name].append(time.perf_counter() - started)
+        statuses[name][response.status_code] = statuses[name].get(response.status_code, 0) + 1
+
+    async with app.router.lifespan_context(app):
+
+        def client(index: int) -> httpx.AsyncClient:
+            # One address per simulated device, so per-client rate limits apply as in production
+            transport = httpx.ASGITransport(app=app, client=(f"10.0.{index // 250}.{index % 250 + 1}", 50000))
+            return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120)
+
+        deadline = time.perf_counter() + args.seconds
+
+        async def crisis(index: int) -> None:
+            async with client(index) as http:
+                n = 0
+                scheduled = time.perf_counter()
+                while scheduled < deadline:
+                    await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                    # Timed from when the request was due, so time the event
+                    # loop was too busy to send it counts against it
+                    if n % 4 == 3:
+                        response = await http.post("/api/chat", json={"message": f"I feel overwhelmed {n}"})
+                        record("chat", scheduled, response)
+                    else:
+                        response = await http.get("/api/resources/")
+                        record("resources", scheduled, response)
+                    n += 1
+                    scheduled += args.pause_ms / 1000
+
+        async def eeg(index: int) -> None:
+            async with client(1000 + index) as http:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    response = await http.post(f"/api/eeg/predict/batch/{args.target}", files={"file": ("rows.csv", body)})
+                    record("eeg", started, response)
+                    retry_after = response.headers.get("retry-after")
+                    if retry_after:
+                        await asyncio.sleep(min(float(retry_after), max(0.0, deadline - time.perf_counter())))
+
+        eeg_clients = 0 if args.mode == "idle" else args.eeg_clients
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(crisis(i) for i in range(args.clients)),
+            *(eeg(i) for i in range(eeg_clients)),
+        )
+        wall = time.perf_counter() - started
+
+    return {
+        name: {
+            "requests": len(values),
+            "rps": round(len(values) / wall, 1),
+            "p50_ms": round(_percentile(values, 0.50) * 1000, 1),
+            "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+            "p99_ms": round(_percentile(values, 0.99) * 1000, 1),
+            "statuses": statuses[name],
+        }
+        for name, values in latencies.items()
+    }
+
+
+def run_mode(mode: str, args: argparse.Namespace) -> Dict[str, Dict[str, object]]:
+    env = dict(os.environ)
+    env["APP_ADMISSION_CONTROL"] = "0" if mode == "off" else "1"
+    env["APP_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="shed-bench-"), "bench.db")
+    # Every upload is scored, and chat answers from the local fallback
+    env["EEG_CACHE_MAX_ENTRIES"] = "0"
+    env["EEG_POOL_WORKERS"] = str(args.eeg_workers)
+    env.pop("OPENAI_API_KEY", None)
+    child = [
+        sys.executable, "-m", "backend.benchmarks.load_shedding", "--child", "--mode", mode,
+        "--clients", str(args.clients), "--eeg-clients", str(args.eeg_clients), "--eeg-rows", str(args.eeg_rows),
+        "--seconds", str(args.seconds), "--pause-ms", str(args.pause_ms), "--target", args.target,
+    ]
+    proc = subprocess.run(child, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"{mode} run failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default=",".join(MODES), help=f"comma-separated subset of {', '.join(MODES)}")
+    parser.add_argument("--clients", type=int, default=10, help="crisis-path clients (resources and chat)")
+    parser.add_argument("--pause-ms", type=float, default=50.0, help="interval between a crisis client's requests")
+    parser.add_argument("--eeg-clients", type=int, default=100)
+    parser.add_argument("--eeg-rows", type=int, default=200, help="rows per EEG upload")
+    parser.add_argument("--eeg-workers", type=int, default=0, help="EEG_POOL_WORKERS; 0 scores on the event loop")
+    parser.add_argument("--target", default="depression")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_load(args))))
+        return
+
+    results = {mode: run_mode(mode.strip(), args) for mode in args.modes.split(",")}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<6}{'endpoint':<11}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for mode, endpoints in results.items():
+        for name, r in endpoints.items():
+            if r["requests"]:
+                print(f"{mode:<6}{name:<11}{r['rps']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}  {r['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Cold-start cost of the app: import time, startup hooks and first requests.
+
+Run from the repository root::
+
+    python -m backend.benchmarks.startup --runs 5
+
+Every run is a fresh interpreter, as when the autoscaler adds a worker.
+Modes are the default eager app and ``APP_LAZY_ROUTERS=1``. The first run
+of each mode starts on an empty database (schema created and stamped); the
+rest reuse it, so their startup skips schema work; "warm" is their median
+and "best" their fastest run. Process wall time includes interpreter
+start-up and exit.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+MODES = {"eager": "0", "lazy": "1"}
+
+_PHASES = ("import_ms", "startup_ms", "first_request_ms", "first_eeg_ms", "ready_ms", "process_ms")
+
+
+async def _child() -> Dict[str, float]:
+    t0 = time.perf_counter()
+    from backend.app.main import app
+
+    imported = time.perf_counter()
+    # The client is not part of a real worker, so it is imported outside the timings
+    import httpx
+
+    # Built by hand: the sample generator would import numpy ahead of the EEG router
+    sample = (",".join(f"f{i}" for i in range(1024)) + "\n" + ",".join(["0.25"] * 1024) + "\n").encode()
+    timings: Dict[str, float] = {"import_ms": (imported - t0) * 1000}
+    after_client = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        started = time.perf_counter()
+        timings["startup_ms"] = (started - after_client) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            t = time.perf_counter()
+            (await client.get("/api/moods/?limit=20")).raise_for_status()
+            timings["first_request_ms"] = (time.perf_counter() - t) * 1000
+            t = time.perf_counter()
+            response = await client.post("/api/eeg/predict/depression", files={"file": ("one.csv", sample)})
+            response.raise_for_status()
+            timings["first_eeg_ms"] = (time.perf_counter() - t) * 1000
+    timings["ready_ms"] = timings["import_ms"] + timings["startup_ms"] + timings["first_request_ms"]
+    return timings
+
+
+def run_once(mode: str, db_path: str) -> Dict[str, float]:
+    env = dict(os.environ)
+    env["APP_LAZY_ROUTERS"] = MODES[mode]
+    env["APP_DB_PATH"] = db_path
+    env.setdefault("EEG_POOL_WORKERS", "0")
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-m", "backend.benchmarks.startup", "--child"], env=env, capture_output=True, text=True)
+    wall = (time.perf_counter() - t0) * 1000
+    if proc.returncode:
+        raise RuntimeError(f"{mode} run failed:\n{proc.stderr}")
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    timings["process_ms"] = wall
+    return timings
+
+
+def run_mode(mode: str, runs: int) -> Dict[str, object]:
+    db_path = os.path.join(tempfile.mkdtemp(prefix="startup-bench-"), "bench.db")
+    samples: List[Dict[str, float]] = [run_once(mode, db_path) for _ in range(runs + 1)]
+    cold, warm = samples[0], samples[1:]
+    return {
+        "mode": mode,
+        "cold": {k: round(cold[k], 1) for k in _PHASES},
+        "warm": {k: round(statistics.median(s[k] for s in warm), 1) for k in _PHASES},
+        # Start-up times are noisy on shared hosts; the fastest run is the steadiest estimate
+        "best": {k: round(min(s[k] for s in warm), 1) for k in _PHASES},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", default="eager,lazy")
+    parser.add_argument("--runs", type=int, default=5, help="warm runs per mode, after one cold run")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child())))
+        return
+
+    results = [run_mode(m.strip(), max(args.runs, 1)) for m in args.modes.split(",")]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':<7}{'db':<6}" + "".join(f"{p[:-3]:>15}" for p in _PHASES) + "   (ms)")
+    for r in results:
+        for kind in ("cold", "warm", "best"):
+            print(f"{r['mode']:<7}{kind:<6}" + "".join(f"{r[kind][p]:>15}" for p in _PHASES))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ const API_BASE = `${location.origin}/api`;
 const state = {
   chatHistory: [],
   mood: [],
+  moodStats: [],
   journal: [],
   moodChart: null,
   eegTarget: 'depression',
@@ -52,6 +53,41 @@ function renderSuggestions(suggestions){
   });
 }
 
+// Streams /chat/stream (server-sent events); the final "done" event carries
+// the full ChatResponse. Falls back to the plain endpoint if streaming fails.
+async function streamChat(payload, onText){
+  let res;
+  try{
+    res = await fetch(`${API_BASE}/chat/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(payload),
+    });
+  }catch(_){ res = null; }
+  if (!res || !res.ok || !res.body){
+    return api('/chat', { method: 'POST', body: JSON.stringify(payload) });
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let text = '';
+  while (true){
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) !== -1){
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      const event = (block.match(/^event: (.*)$/m) || [])[1];
+      const data = JSON.parse((block.match(/^data: (.*)$/m) || [])[1] || '{}');
+      if (event === 'delta'){ text += data.text; onText(text); }
+      else if (event === 'done'){ return data; }
+    }
+  }
+  throw new Error('Chat stream ended early');
+}
+
 async function sendChat(){
   const box = document.getElementById('chat-message');
   const sendBtn = document.getElementById('send-chat');
@@ -67,7 +103,7 @@ async function sendChat(){
   box.disabled = true;
   try{
     const payload = { message: text, history: state.chatHistory.filter(m => m.role !== 'system') };
-    const res = await api('/chat', { method: 'POST', body: JSON.stringify(payload) });
+    const res = await streamChat(payload, (partial) => { pending.content = partial; renderChat(); });
     pending.content = res.reply;
     renderChat();
     renderSuggestions(res.suggestions);
@@ -104,11 +140,14 @@ function renderMoodList(){
 
 function renderMoodChart(){
   const ctx = document.getElementById('mood-chart');
-  const labels = state.mood.slice().reverse().map(m => new Date(m.created_at).toLocaleDateString());
-  const data = state.mood.slice().reverse().map(m => m.mood_score);
+  // Daily buckets are aggregated server-side
+  const labels = state.moodStats.map(b => new Date(b.start + 'T00:00:00').toLocaleDateString());
+  const data = state.moodStats.map(b => b.mean);
+  const rolling = state.moodStats.map(b => b.rolling_mean);
   if (state.moodChart){
     state.moodChart.data.labels = labels;
     state.moodChart.data.datasets[0].data = data;
+    state.moodChart.data.datasets[1].data = rolling;
     state.moodChart.update();
     return;
   }
@@ -116,7 +155,10 @@ function renderMoodChart(){
     type: 'line',
     data: {
       labels,
-      datasets: [{ label: 'Mood', data, borderColor: '#22c55e', backgroundColor: 'rgba(34,197,94,0.2)' }]
+      datasets: [
+        { label: 'Mood', data, borderColor: '#22c55e', backgroundColor: 'rgba(34,197,94,0.2)' },
+        { label: 'Rolling average', data: rolling, borderColor: '#60a5fa', backgroundColor: 'rgba(96,165,250,0.2)' }
+      ]
     },
     options: { scales: { y: { min: 1, max: 10 } } }
   });
@@ -124,7 +166,7 @@ function renderMoodChart(){
 
 async function refreshMood(){
   try{
-    state.mood = await api('/moods/');
+    [state.mood, state.moodStats] = await Promise.all([api('/moods/?limit=50'), api('/moods/stats?period=day&window=7')]);
     renderMoodList();
     renderMoodChart();
   }catch(e){ /* ignore */ }
@@ -163,7 +205,7 @@ function renderJournal(){
 
 async function refreshJournal(){
   try{
-    state.journal = await api('/journal/');
+    state.journal = await api('/journal/?fields=title');
     renderJournal();
   }catch(e){ /* ignore */ }
 }
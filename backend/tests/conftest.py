@@ -0,0 +1,118 @@
+"""Shared fixtures.
+
+Every setting is read when the app is imported, so the environment is set
+up here first: a throwaway database and data directories, EEG scoring in
+process, no caches answering repeated requests, and no OpenAI key.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+_DATA_DIR = tempfile.mkdtemp(prefix="app-tests-")
+os.environ["APP_DB_PATH"] = os.path.join(_DATA_DIR, "test.db")
+os.environ["EEG_JOB_DIR"] = os.path.join(_DATA_DIR, "eeg_jobs")
+os.environ["EEG_SESSION_DIR"] = os.path.join(_DATA_DIR, "eeg_sessions")
+os.environ["EEG_POOL_WORKERS"] = "0"
+os.environ["EEG_CACHE_MAX_ENTRIES"] = "0"
+os.environ["CHAT_CACHE_MAX_ENTRIES"] = "0"
+# Every test request comes from one address; admission is tested on its own
+os.environ["APP_ADMISSION_CONTROL"] = "0"
+for name in ("OPENAI_API_KEY", "OPENAI_BASE_URL", "EEG_CACHE_DIR", "EEG_MODEL_DIR"):
+    os.environ.pop(name, None)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from backend.app.main import app
+
+    # Entering the client runs the startup hooks
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def _eeg_csv(rows: int, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    lines = [",".join(f"f{i}" for i in range(1024))]
+    lines.extend(",".join(f"{rng.uniform(-1, 1):.4f}" for _ in range(1024)) for _ in range(rows))
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.fixture
+def eeg_csv():
+    """Builds a synthetic CSV upload of ``rows`` feature rows."""
+    return _eeg_csv
+
+
+def _eeg_rows(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [[float(f"{rng.uniform(-1, 1):.4f}") for _ in range(1024)] for _ in range(count)]
+
+
+@pytest.fixture
+def eeg_rows():
+    """Builds ``count`` random feature rows with four decimals, as a CSV upload has them."""
+    return _eeg_rows
+
+
+def _eeg_edge_rows(count: int) -> list:
+    rows = []
+    for seed in range(count):
+        row = _eeg_rows(1, seed)[0]
+        # A mean of 0.001 puts the depression probability on its 0.5005
+        # rounding edge, where the order of the additions decides the result
+        row[-1] = float(f"{1.024 - sum(row[:-1]):.4f}")
+        rows.append(row)
+    return rows
+
+
+@pytest.fixture
+def eeg_edge_rows():
+    """Builds ``count`` feature rows whose depression probability sits on a rounding edge."""
+    return _eeg_edge_rows
+
+
+def _predict_stub(features: list, target: str) -> dict:
+    # The original per-row heuristic, kept as the reference the engine must match
+    avg = sum(features) / max(len(features), 1)
+    if target == "depression":
+        probability = max(0.0, min(1.0, (avg + 1.0) / 2.0))
+        label = "Depressed" if probability >= 0.5 else "Not Depressed"
+        return {"label": label, "probability": round(probability, 3)}
+    elif target == "severity":
+        return {"severity": int(max(0, min(10, round((avg + 1.0) * 5))))}
+    elif target == "anxiety":
+        var = sum((x - avg) ** 2 for x in features) / max(len(features), 1)
+        score = min(1.0, (var / 5.0))
+        return {"label": "Anxious" if score >= 0.5 else "Calm", "probability": round(score, 3)}
+    elif target == "stress":
+        return {"stress": int(max(0, min(100, round(abs(avg) * 100))))}
+    elif target == "ptsd":
+        score = max(0.0, min(1.0, abs(avg)))
+        return {"label": "PTSD Risk" if score >= 0.5 else "Low Risk", "probability": round(score, 3)}
+    elif target == "ocd":
+        score = max(0.0, min(1.0, (avg + 1) / 2))
+        return {"label": "OCD Traits" if score >= 0.5 else "Low Traits", "probability": round(score, 3)}
+    elif target == "adhd":
+        score = max(0.0, min(1.0, (sum(x for x in features if x > 0) / max(len(features), 1))))
+        return {"label": "ADHD Traits" if score >= 0.5 else "Low Traits", "probability": round(score, 3)}
+    elif target == "burnout":
+        return {"burnout": int(max(0, min(100, round((abs(avg) * 100)))))}
+    elif target == "insomnia":
+        return {"insomnia": max(0, min(10, round((1 - avg) * 5 + 5)))}
+    return {"wellbeing": int(max(0, min(100, round((avg + 1) * 50))))}
+
+
+@pytest.fixture
+def predict_stub():
+    """The original per-row heuristic of ``(features, target)``."""
+    return _predict_stub
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from backend.app import main
+from backend.app.admission import AdmissionMiddleware, parse_limits, parse_routes
+
+ROUTES = parse_routes("/crisis=critical,/bulk=bulk")
+
+
+def _held_app(gate: asyncio.Event):
+    async def app(scope, receive, send) -> None:
+        if scope["path"].endswith("/hold"):
+            await gate.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    return app
+
+
+def _limits(**specs: str) -> dict:
+    return {name: parse_limits(specs.get(name, "")) for name in ("critical", "default", "bulk")}
+
+
+def _client(middleware: AdmissionMiddleware, host: str = "10.0.0.1") -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=middleware, client=(host, 50000))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def test_client_over_its_rate_gets_429_with_retry_after():
+    async def run() -> None:
+        middleware = AdmissionMiddleware(
+            _held_app(asyncio.Event()), ROUTES, _limits(default="rate=1,burst=2"), max_concurrent=0, reserved=0,
+        )
+        async with _client(middleware) as first, _client(middleware, "10.0.0.2") as second:
+            statuses = [(await first.get("/other")).status_code for _ in range(3)]
+            assert statuses == [200, 200, 429]
+            response = await first.get("/other")
+            assert response.headers["retry-after"] == "1"
+            assert response.json() == {"detail": "Too many requests, please slow down"}
+            # Buckets are per client and per class
+            assert (await second.get("/other")).status_code == 200
+            assert (await first.get("/crisis")).status_code == 200
+
+    asyncio.run(run())
+
+
+def test_full_queue_and_queue_timeout_get_503():
+    async def run() -> None:
+        gate = asyncio.Event()
+        middleware = AdmissionMiddleware(
+            _held_app(gate), ROUTES, _limits(bulk="concurrency=1,queue=1,timeout=0.2"), max_concurrent=0, reserved=0,
+        )
+        async with _client(middleware) as http:
+            holding = asyncio.create_task(http.get("/bulk/hold"))
+            await asyncio.sleep(0.05)
+            queued = asyncio.create_task(http.get("/bulk"))
+            await asyncio.sleep(0.05)
+            # The one queue place is taken, so this is shed straight away
+            full = await http.get("/bulk")
+            assert full.status_code == 503
+            assert full.headers["retry-after"] == "1"
+            timed_out = await queued
+            assert timed_out.status_code == 503
+            assert timed_out.json() == {"detail": "Server is busy, please retry shortly"}
+            # Other classes are not held up by the bulk limit
+            assert (await http.get("/crisis")).status_code == 200
+            gate.set()
+            assert (await holding).status_code == 200
+            assert middleware.slots.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_reserved_slots_only_serve_critical_requests():
+    async def run() -> None:
+        gate = asyncio.Event()
+        middleware = AdmissionMiddleware(
+            _held_app(gate), ROUTES, _limits(bulk="queue=4,timeout=5"), max_concurrent=2, reserved=1,
+        )
+        async with _client(middleware) as http:
+            holding = asyncio.create_task(http.get("/bulk/hold"))
+            await asyncio.sleep(0.05)
+            waiting = asyncio.create_task(http.get("/bulk"))
+            await asyncio.sleep(0.05)
+            assert not waiting.done()
+            assert (await http.get("/crisis")).status_code == 200
+            gate.set()
+            assert [(await task).status_code for task in (holding, waiting)] == [200, 200]
+
+    asyncio.run(run())
+
+
+def test_rejections_carry_cors_headers(monkeypatch):
+    monkeypatch.setattr(main, "ADMISSION_CONTROL", True)
+    monkeypatch.setattr(main, "ADMISSION_LIMITS", _limits(critical="rate=1,burst=1"))
+    # Not entered, so the startup hooks do not run; the resources route needs none
+    http = TestClient(main.create_app())
+    headers = {"Origin": "https://example.org"}
+    assert http.get("/api/resources/", headers=headers).status_code == 200
+    response = http.get("/api/resources/", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["access-control-allow-origin"] == "https://example.org"
+    assert "retry-after" in response.headers
+
+
+def test_default_routes_keep_single_predictions_out_of_bulk():
+    middleware = AdmissionMiddleware(None, parse_routes(main.ADMISSION_ROUTES), _limits(), 0, 0)
+    assert middleware.classify("POST", "/api/eeg/predict/depression") == "default"
+    assert middleware.classify("POST", "/api/eeg/predict/batch/depression") == "bulk"
+    assert middleware.classify("POST", "/api/eeg/predict/multi") == "bulk"
+    assert middleware.classify("POST", "/api/eeg/jobs/depression") == "bulk"
+    assert middleware.classify("POST", "/api/eeg/sessions/abc/segments") == "bulk"
+    assert middleware.classify("GET", "/api/eeg/jobs/abc") == "default"
+    assert middleware.classify("GET", "/api/resources/") == "critical"
+
+
+def test_back_to_back_single_predictions_pass_the_default_limits(monkeypatch, eeg_csv):
+    monkeypatch.setattr(main, "ADMISSION_CONTROL", True)
+    http = TestClient(main.create_app())
+    statuses = [
+        http.post("/api/eeg/predict/depression", files={"file": ("one.csv", eeg_csv(1, seed))}).status_code
+        for seed in range(40)
+    ]
+    assert statuses == [200] * 40
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from backend.app.body_limit import BodyLimitMiddleware
+from backend.app.chat_history import CHAT_MAX_BODY_BYTES
+
+
+def test_oversized_chat_bodies_get_a_413_browsers_can_read(client):
+    body = {"message": "x" * (CHAT_MAX_BODY_BYTES + 1)}
+    response = client.post("/api/chat", json=body, headers={"Origin": "http://example.com"})
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == "http://example.com"
+
+
+def test_bodies_within_the_limit_reach_the_app(client):
+    response = client.post("/api/chat", json={"message": "x" * 1000})
+    assert response.status_code == 200
+
+
+def test_chunked_bodies_are_cut_off_at_the_limit():
+    seen = []
+
+    async def app(scope, receive, send):
+        while True:
+            message = await receive()
+            seen.append(message["type"])
+            if message["type"] == "http.disconnect" or not message.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def chunks():
+        for _ in range(10):
+            yield b"x" * 40
+
+    async def main():
+        transport = httpx.ASGITransport(app=BodyLimitMiddleware(app, limits=[("/limited", 100)]))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            limited = await http.post("/limited", content=chunks())
+            other = await http.post("/other", content=chunks())
+        return limited, other
+
+    limited, other = asyncio.run(main())
+    assert limited.status_code == 413
+    assert seen[:3] == ["http.request", "http.request", "http.disconnect"]
+    assert other.status_code == 200 and other.text == "ok"
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import csv
+import io
+
+from backend.app import bulk
+from backend.app.eeg_io import CHUNK_SIZE
+
+
+def _journal_csv(rows: int, tag: str) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["title", "content"])
+    for i in range(rows):
+        # Every entry spans several physical lines, with commas and quotes
+        content = "\n".join(f'line {j} of entry {i}, with "quotes"' for j in range(8))
+        writer.writerow([f"{tag} {i}", content])
+    return out.getvalue().encode("utf-8")
+
+
+def _exported(client, tag: str) -> list:
+    response = client.get("/api/journal/export", params={"format": "csv"})
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    return sorted((r for r in rows if r["title"].startswith(f"{tag} ")), key=lambda r: int(r["title"].split()[-1]))
+
+
+def test_csv_import_keeps_quoted_newlines_across_chunks(client):
+    body = _journal_csv(6000, "chunked")
+    assert len(body) > CHUNK_SIZE
+    # The chunk boundary falls inside a quoted field: an odd number of
+    # quotes precedes the chunk's last newline
+    cut = body.rfind(b"\n", 0, CHUNK_SIZE)
+    assert body[:cut].count(b'"') % 2 == 1
+
+    response = client.post("/api/journal/import", files={"file": ("journal.csv", body)})
+    assert response.status_code == 200
+    assert response.json()["imported"] == 6000
+    assert response.json()["rejected"] == 0
+
+    expected = list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+    stored = _exported(client, "chunked")
+    assert [(r["title"], r["content"]) for r in stored] == [(r["title"], r["content"]) for r in expected]
+
+
+def test_csv_export_round_trips(client):
+    client.post("/api/journal/import", files={"file": ("journal.csv", _journal_csv(3000, "roundtrip"))})
+    exported = _exported(client, "roundtrip")
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=["title", "content"], extrasaction="ignore")
+    writer.writeheader()
+    for row in exported:
+        writer.writerow({**row, "title": row["title"].replace("roundtrip", "reimported")})
+
+    response = client.post("/api/journal/import", files={"file": ("journal.csv", out.getvalue().encode("utf-8"))})
+    assert response.json()["imported"] == 3000
+    assert response.json()["rejected"] == 0
+    assert [r["content"] for r in _exported(client, "reimported")] == [r["content"] for r in exported]
+
+
+def test_csv_import_reports_physical_line_numbers(client):
+    body = b'title,content\n"ok","two\nlines"\n"missing content"\n'
+    response = client.post("/api/journal/import", files={"file": ("journal.csv", body)})
+    assert response.json()["imported"] == 1
+    assert [e["line"] for e in response.json()["errors"]] == [4]
+
+
+def test_ndjson_import_splits_on_newlines_only(client):
+    # U+2028 and U+0085 are valid unescaped in JSON strings; CRLF line ends are accepted
+    rows = [
+        '{"title": "ndjson-seps 0", "content": "one two\u0085three"}',
+        '{"title": "ndjson-seps 1"}',
+        '{"title": "ndjson-seps 2", "content": "plain"}',
+    ]
+    body = ("\r\n".join(rows) + "\r\n").encode("utf-8")
+    response = client.post("/api/journal/import", files={"file": ("journal.ndjson", body)})
+    assert response.json()["imported"] == 2
+    assert [e["line"] for e in response.json()["errors"]] == [2]
+    assert [r["content"] for r in _exported(client, "ndjson-seps")] == ["one two\u0085three", "plain"]
+
+
+def test_csv_rows_with_an_unbalanced_quote_are_cut_off(client, monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_CSV_RECORD_CHARS", 10_000)
+    filler = [f"unbalanced {i},filler line {i}" for i in range((CHUNK_SIZE // 30) + 1000)]
+    lines = ["title,content", "cutoff 0,fine", 'unbalanced bad,"never closed'] + filler + ["no content"]
+    body = ("\n".join(lines) + "\n").encode("utf-8")
+    response = client.post("/api/journal/import", files={"file": ("journal.csv", body)})
+    result = response.json()
+    # The open quote swallows the rest of the first chunk; later rows import
+    # with their physical line numbers
+    assert [e["line"] for e in result["errors"]] == [3, len(lines)]
+    assert "longer than 10000 characters" in result["errors"][0]["error"]
+    assert result["rejected"] == 2
+    assert 0 < result["imported"] < len(filler) + 1
+    assert _exported(client, "unbalanced")[-1]["title"] == f"unbalanced {len(filler) - 1}"
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from backend.app.chat_cache import ChatCache
+from backend.app.models import ChatResponse
+from backend.app.routers import chat
+
+
+def _reply(text: str) -> ChatResponse:
+    return ChatResponse(reply=text, suggestions=[], used_model="stub", safety_notice="")
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    # Counts the model calls the chat routes make, through a fresh cache
+    calls = []
+
+    async def reply(messages):
+        calls.append(messages[-1]["content"])
+        return _reply(f"reply {len(calls)}"), 10
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(chat, "_openai_reply", reply)
+    monkeypatch.setattr(chat, "chat_cache", ChatCache(8, 60))
+    return calls
+
+
+def test_repeated_messages_are_served_from_the_cache(client, upstream):
+    first = client.post("/api/chat", json={"message": "I feel anxious today"}).json()
+    second = client.post("/api/chat", json={"message": "i feel  ANXIOUS today!"}).json()
+    assert first == second
+    assert len(upstream) == 1
+    assert chat.chat_cache.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("message", ["I want to kill myself", "thinking about Self-harm", "I overdosed last year"])
+def test_crisis_messages_always_reach_the_model(client, upstream, message):
+    replies = [client.post("/api/chat", json={"message": message}).json()["reply"] for _ in range(3)]
+    assert replies == ["reply 1", "reply 2", "reply 3"]
+    assert len(chat.chat_cache) == 0
+    assert chat.chat_cache.stats()["bypassed"] == 3
+
+
+def test_crisis_turns_in_the_history_bypass_the_cache(client, upstream):
+    history = [{"role": "user", "content": "I want to end my life"}, {"role": "assistant", "content": "I'm here."}]
+    for _ in range(2):
+        client.post("/api/chat", json={"message": "thanks", "history": history})
+    assert len(upstream) == 2
+    assert len(chat.chat_cache) == 0
+
+
+def test_concurrent_identical_requests_make_one_upstream_call():
+    cache = ChatCache(8, 60)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return _reply("shared"), 10
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_call("key", call) for _ in range(20)))
+
+    responses = asyncio.run(main())
+    assert len(calls) == 1
+    assert {r.reply for r in responses} == {"shared"}
+    assert cache.stats()["misses"] == 1 and cache.stats()["coalesced"] == 19
+
+
+def test_failed_calls_are_not_cached():
+    cache = ChatCache(8, 60)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("upstream failed")
+        return _reply("second try"), 10
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_call("key", call)
+        return await cache.get_or_call("key", call)
+
+    assert asyncio.run(main()).reply == "second try"
+    assert len(calls) == 2
+
+
+def test_expired_entries_are_fetched_again():
+    cache = ChatCache(8, 0.05)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        return _reply(f"reply {len(calls)}"), 10
+
+    async def main():
+        first = await cache.get_or_call("key", call)
+        cached = await cache.get_or_call("key", call)
+        time.sleep(0.1)
+        refetched = await cache.get_or_call("key", call)
+        return first, cached, refetched
+
+    first, cached, refetched = asyncio.run(main())
+    assert (first.reply, cached.reply, refetched.reply) == ("reply 1", "reply 1", "reply 2")
+    assert len(calls) == 2
+    assert cache.get("key").reply == "reply 2"
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import uuid
+
+import pytest
+
+from backend.app import chat_history
+from backend.app.chat_history import compact_history
+from backend.app.db import session_scope
+from backend.app.models import ChatConversation, ChatRequest
+
+
+def _turns(count: int, start: int = 0) -> list:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i} says something. Then more detail follows."}
+        for i in range(start, start + count)
+    ]
+
+
+def _request(history: list, conversation_id: str = None) -> ChatRequest:
+    return ChatRequest(message="and now?", history=history, conversation_id=conversation_id)
+
+
+@pytest.fixture(autouse=True)
+def small_budgets(client, monkeypatch):
+    # The client's startup creates the tables stored summaries live in.
+    # Each turn is about 17 estimated tokens
+    monkeypatch.setattr(chat_history, "CHAT_HISTORY_TOKEN_BUDGET", 60)
+    monkeypatch.setattr(chat_history, "CHAT_SUMMARY_TOKEN_BUDGET", 1000)
+
+
+def test_short_histories_are_sent_verbatim():
+    history = _turns(3)
+    result = compact_history(_request(history))
+    assert result.messages == history
+    assert not result.crisis
+
+
+def test_older_turns_are_folded_into_a_summary():
+    history = _turns(10)
+    messages = compact_history(_request(history)).messages
+    summary, recent = messages[0], messages[1:]
+    assert summary["role"] == "system"
+    # The newest turns that fit the budget stay verbatim, in order
+    assert recent == history[-len(recent):] and 0 < len(recent) < 10
+    assert sum(chat_history.estimate_tokens(m["content"]) for m in recent) <= 60
+    # One line per older turn, cut at its first sentence
+    lines = summary["content"].split("\n")[1:]
+    assert lines == [f"{'User' if i % 2 == 0 else 'Assistant'}: Turn {i} says something." for i in range(10 - len(recent))]
+
+
+def test_the_latest_turn_is_kept_even_over_budget():
+    history = _turns(2) + [{"role": "user", "content": "word " * 400}]
+    messages = compact_history(_request(history)).messages
+    assert messages[-1] == history[-1]
+    assert messages[0]["role"] == "system"
+
+
+def test_summary_drops_its_oldest_lines_beyond_its_budget(monkeypatch):
+    monkeypatch.setattr(chat_history, "CHAT_SUMMARY_TOKEN_BUDGET", 30)
+    messages = compact_history(_request(_turns(20))).messages
+    lines = messages[0]["content"].split("\n")[1:]
+    assert sum(chat_history.estimate_tokens(line) for line in lines) <= 30
+    # The newest compacted turn is kept, the first one is gone
+    assert lines[-1].endswith(f"Turn {20 - len(messages)} says something.")
+    assert not lines[0].endswith("Turn 0 says something.")
+
+
+def test_stored_summaries_grow_with_the_conversation():
+    conversation_id = uuid.uuid4().hex
+    history = _turns(10)
+    first = compact_history(_request(history, conversation_id)).messages
+    history += _turns(4, start=10)
+    second = compact_history(_request(history, conversation_id)).messages
+    # Extending the stored summary gives what rebuilding it would
+    assert second == compact_history(_request(history)).messages
+    assert second[0]["content"].startswith(first[0]["content"])
+    with session_scope() as session:
+        assert session.get(ChatConversation, conversation_id).summary == second[0]["content"].split("\n", 1)[1]
+
+
+def test_crisis_in_compacted_turns_is_reported_and_sticky():
+    conversation_id = uuid.uuid4().hex
+    history = [{"role": "user", "content": "I want to end my life."}] + _turns(9, start=1)
+    assert compact_history(_request(history)).crisis
+    assert compact_history(_request(history, conversation_id)).crisis
+    # Still flagged once the turn has scrolled out of what the client sends
+    assert compact_history(_request(_turns(10, start=20), conversation_id)).crisis
+    assert not compact_history(_request(_turns(10, start=20))).crisis
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from backend.app.routers import chat
+
+
+class _Stub(BaseHTTPRequestHandler):
+    # Keep-alive, so connection reuse is visible as one client port
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        server = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with server.lock:
+            server.requests += 1
+            server.ports.add(self.client_address[1])
+        if server.mode == "slow":
+            time.sleep(1.0)
+        if server.mode == "error":
+            body = json.dumps({"error": {"message": "upstream failed", "type": "server_error"}}).encode()
+            status = 500
+        else:
+            body = json.dumps({
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-4o-mini",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "Stub reply."}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+            }).encode()
+            status = 200
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and went away
+            pass
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def upstream(client, monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.ports = set()
+    server.mode = "ok"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setattr(chat, "OPENAI_TIMEOUT", 0.3)
+    monkeypatch.setattr(chat, "OPENAI_MAX_RETRIES", 1)
+    # A fresh client picks up the stub URL and the settings above
+    client.portal.call(chat.close_client)
+    yield server
+    client.portal.call(chat.close_client)
+    server.shutdown()
+    server.server_close()
+
+
+def _chat(client, message: str) -> dict:
+    response = client.post("/api/chat", json={"message": message})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_replies_reuse_one_client_and_connection(client, upstream):
+    assert _chat(client, "first")["reply"] == "Stub reply."
+    first = chat._client
+    assert _chat(client, "second")["reply"] == "Stub reply."
+    assert chat._client is first
+    assert upstream.requests == 2
+    assert len(upstream.ports) == 1
+
+
+def test_timeout_falls_back_after_retrying(client, upstream):
+    upstream.mode = "slow"
+    assert _chat(client, "are you there")["used_model"] == "fallback"
+    # The first attempt and OPENAI_MAX_RETRIES more
+    assert upstream.requests == 2
+
+
+def test_upstream_errors_are_retried_then_fall_back(client, upstream):
+    upstream.mode = "error"
+    assert _chat(client, "hello")["used_model"] == "fallback"
+    assert upstream.requests == 2
+
+
+def test_stream_falls_back_on_upstream_error(client, upstream):
+    upstream.mode = "error"
+    response = client.post("/api/chat/stream", json={"message": "hello"})
+    events = [line for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events[-1] == "event: done"
+    assert '"used_model": "fallback"' in response.text
+
+
+def test_history_store_failures_fall_back(client, upstream, monkeypatch):
+    def broken(req):
+        raise OperationalError("SELECT summary", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(chat, "compact_history", broken)
+    assert _chat(client, "hello")["used_model"] == "fallback"
+    response = client.post("/api/chat/stream", json={"message": "hello"})
+    assert response.status_code == 200
+    assert '"used_model": "fallback"' in response.text
+    assert upstream.requests == 0
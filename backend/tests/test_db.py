@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import List
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from pydantic import BaseModel, field_validator
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+from sqlmodel import Session
+
+from backend.app import db
+from backend.app.models import MoodEntry
+
+
+def test_production_profile_sets_its_pragmas(tmp_path):
+    engine = db.build_engine(f"sqlite:///{tmp_path / 'prod.db'}", "production")
+    with engine.connect() as conn:
+        def pragma(name: str) -> object:
+            return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("cache_size") == -db.DB_CACHE_KIB
+        assert pragma("busy_timeout") == db.DB_BUSY_TIMEOUT_MS
+        assert pragma("temp_store") == 2  # MEMORY
+    engine.dispose()
+
+
+def test_basic_profile_is_plain_sqlite(tmp_path):
+    engine = db.build_engine(f"sqlite:///{tmp_path / 'basic.db'}", "basic")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+        assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 0
+    engine.dispose()
+
+
+def test_the_pool_is_bounded():
+    assert isinstance(db.engine.pool, QueuePool)
+    assert db.engine.pool.size() == db.DB_POOL_SIZE == 40
+    assert db.DB_POOL_OVERFLOW == 40
+    assert db.engine.pool._max_overflow == db.DB_POOL_OVERFLOW
+    assert db.engine.pool.timeout() == db.DB_POOL_TIMEOUT
+
+
+def _write(session: Session) -> None:
+    session.add(MoodEntry(mood_score=5, note="db lock test"))
+    session.flush()
+
+
+def test_writers_queue_on_the_lock_until_commit(client):
+    order: List[str] = []
+    first_wrote = threading.Event()
+
+    def first() -> None:
+        with db.session_scope() as session:
+            _write(session)
+            first_wrote.set()
+            time.sleep(0.2)
+            order.append("first commits")
+
+    def second() -> None:
+        first_wrote.wait()
+        with db.session_scope() as session:
+            _write(session)
+            order.append("second writes")
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert order == ["first commits", "second writes"]
+
+
+def test_nested_writers_on_one_thread_raise_at_once(client):
+    start = time.monotonic()
+    with pytest.raises(RuntimeError):
+        with db.session_scope() as outer:
+            _write(outer)
+            with db.session_scope() as inner:
+                _write(inner)
+    assert time.monotonic() - start < db.DB_BUSY_TIMEOUT_MS / 1000
+    # Both rolled back, so the lock is free again
+    with db.session_scope() as session:
+        _write(session)
+
+
+def test_sync_endpoints_release_their_session_before_validation(client):
+    seen = {}
+
+    class Checked(BaseModel):
+        value: int
+
+        @field_validator("value")
+        @classmethod
+        def _record(cls, value: int) -> int:
+            seen["in_transaction"] = seen["session"].in_transaction()
+            return value
+
+    def endpoint(session: Session = Depends(db.get_session)) -> dict:
+        seen["session"] = session
+        return {"value": session.exec(text("SELECT 1")).scalar()}
+
+    for route_class, held in ((db.SessionRoute, False), (APIRoute, True)):
+        router = APIRouter(route_class=route_class)
+        router.add_api_route("/check", endpoint, response_model=Checked)
+        app = FastAPI()
+        app.include_router(router)
+        assert TestClient(app).get("/check").json() == {"value": 1}
+        assert seen["in_transaction"] is held
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+_TESTS = os.path.dirname(os.path.abspath(__file__))
+_ROOT = os.path.dirname(os.path.dirname(_TESTS))
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    # The engine mode is read when the app is imported, so each run is a new process
+    env = dict(os.environ, APP_DB_ASYNC="1")
+    return subprocess.run([sys.executable, *args], cwd=_ROOT, env=env, capture_output=True, text=True, timeout=300)
+
+
+def test_async_mode_serves_the_async_routers():
+    result = _run("-c", "from backend.app import main; print(main.mood.__name__, main.journal.__name__)")
+    assert result.stdout.split() == ["backend.app.routers.mood_async", "backend.app.routers.journal_async"], result.stderr
+
+
+@pytest.mark.parametrize("suite", ["test_mood_rollups.py", "test_journal_search.py", "test_pagination.py", "test_bulk.py"])
+def test_mood_and_journal_suites_pass_on_the_async_engine(suite):
+    result = _run("-m", "pytest", "-q", "-p", "no:cacheprovider", os.path.join(_TESTS, suite))
+    assert result.returncode == 0, result.stdout[-4000:]
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import functools
+import json
+
+import pytest
+
+from backend.app import eeg_io
+from backend.app.eeg_engine import ALL_TARGETS
+
+
+def _use_small_blocks(monkeypatch) -> None:
+    # About nine CSV rows per block instead of a thousand
+    monkeypatch.setattr(eeg_io, "iter_csv_units", functools.partial(eeg_io.iter_csv_units, block_bytes=64 << 10))
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    _use_small_blocks(monkeypatch)
+
+
+def _batch(client, target: str, body: bytes, **params) -> dict:
+    response = client.post(f"/api/eeg/predict/batch/{target}", params=params, files={"file": ("rows.csv", body)})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_csv_batches_do_not_depend_on_block_size(client, eeg_csv, eeg_rows, predict_stub, monkeypatch):
+    # Over 2 MiB of text, so rows are also split across upload reads
+    body = eeg_csv(300, 5)
+    whole = _batch(client, "depression", body)
+    _use_small_blocks(monkeypatch)
+    blocked = _batch(client, "depression", body)
+    assert blocked["count"] == whole["count"] == 300
+    assert blocked["results"] == whole["results"] == [predict_stub(row, "depression") for row in eeg_rows(200, 5)]
+    assert blocked["summary"] == whole["summary"]
+
+
+def test_invalid_csv_rows_are_left_out_of_every_block(client, eeg_csv, eeg_rows, predict_stub, small_blocks):
+    lines = eeg_csv(40, 6).decode().splitlines()
+    lines.insert(11, "0.1,0.2")
+    lines.insert(25, ",".join(["x"] * 1024))
+    body = "\r\n".join(lines).encode()
+    result = _batch(client, "severity", body)
+    assert result["count"] == 40
+    assert result["results"] == [predict_stub(row, "severity") for row in eeg_rows(40, 6)]
+
+
+def _ndjson(client, target: str, body: bytes) -> list:
+    response = client.post(f"/api/eeg/predict/batch/{target}", params={"stream": "true"}, files={"file": ("rows.csv", body)})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_streamed_batches_emit_every_result(client, eeg_csv, eeg_rows, predict_stub, small_blocks):
+    body = eeg_csv(250, 7)
+    records = _ndjson(client, "stress", body)
+    *blocks, summary = records
+    assert len(blocks) > 1
+    assert all(record["type"] == "results" for record in blocks)
+
+    results = []
+    for record in blocks:
+        assert record["offset"] == len(results)
+        results.extend(record["results"])
+    # The 200-result cap only applies to the JSON response
+    assert results == [predict_stub(row, "stress") for row in eeg_rows(250, 7)]
+
+    whole = _batch(client, "stress", body)
+    assert summary == {
+        "type": "summary",
+        "target": "stress",
+        "model": whole["model"],
+        "count": 250,
+        "summary": whole["summary"],
+    }
+
+
+def test_streamed_batches_reject_empty_uploads(client):
+    response = client.post("/api/eeg/predict/batch/stress", params={"stream": "true"}, files={"file": ("rows.csv", b"")})
+    assert response.status_code == 400
+
+
+def _multi(client, targets: str, body: bytes):
+    return client.post("/api/eeg/predict/multi", params={"targets": targets}, files={"file": ("rows.csv", body)})
+
+
+def test_multi_target_predictions_match_each_batch(client, eeg_csv, small_blocks):
+    body = eeg_csv(60, 8)
+    response = _multi(client, "all", body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["count"] == 60
+    assert list(result["targets"]) == list(ALL_TARGETS)
+    for target in ALL_TARGETS:
+        batch = _batch(client, target, body)
+        assert result["targets"][target] == {
+            "result": batch["results"][0],
+            "summary": batch["summary"],
+            "model": batch["model"],
+        }
+
+
+def test_multi_target_lists_are_checked_and_deduplicated(client, eeg_csv):
+    body = eeg_csv(3, 9)
+    response = _multi(client, "ptsd, stress,ptsd", body)
+    assert response.status_code == 200
+    assert list(response.json()["targets"]) == ["ptsd", "stress"]
+
+    response = _multi(client, "stress,mood", body)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Unknown targets: mood"
+
+    assert _multi(client, "all", eeg_csv(0)).status_code == 400
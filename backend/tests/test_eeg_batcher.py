@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from backend.app.eeg_batcher import MicroBatcher
+from backend.app.eeg_engine import FEATURE_DTYPE
+from backend.app.eeg_models import registry
+
+
+@pytest.mark.parametrize("target", ["depression", "severity", "anxiety", "adhd"])
+def test_batched_rows_score_as_if_alone(target, eeg_edge_rows, predict_stub, monkeypatch):
+    rows = eeg_edge_rows(300)
+    spec = registry.specs([target])[target]
+    matrices = [np.asarray([row], dtype=FEATURE_DTYPE) for row in rows]
+    batcher = MicroBatcher(window=0.05, max_rows=64)
+    sizes = []
+    score = batcher._score
+
+    def spy(batch_rows, batch_spec):
+        sizes.append(len(batch_rows))
+        return score(batch_rows, batch_spec)
+
+    monkeypatch.setattr(batcher, "_score", spy)
+
+    async def concurrent() -> list:
+        return await asyncio.gather(*(batcher.predict(m, spec) for m in matrices))
+
+    batched = asyncio.run(concurrent())
+    # Full batches, then the rest once the window closed
+    assert sizes == [64, 64, 64, 64, 44]
+
+    alone = MicroBatcher(window=0, max_rows=64)
+
+    async def sequential() -> list:
+        return [await alone.predict(m, spec) for m in matrices]
+
+    assert batched == asyncio.run(sequential()) == [predict_stub(row, target) for row in rows]
+    assert batcher.pending == 0
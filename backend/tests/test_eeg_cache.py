@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import os
+import time
+
+from backend.app.eeg_cache import PredictionCache
+
+
+def _files(directory) -> set:
+    return {name for name in os.listdir(directory) if name.endswith(".json")}
+
+
+def test_disk_tier_stays_within_its_byte_budget(tmp_path):
+    cache = PredictionCache(0, 0, 3600, str(tmp_path), disk_max_bytes=2500)
+    for i in range(5):
+        cache.put(f"k{i}", b"x" * 1000)
+    # Only the newest two fit; the oldest went first
+    assert _files(tmp_path) == {"k3.json", "k4.json"}
+    assert cache.disk_size == 2000
+    assert cache.get("k4") == b"x" * 1000
+    assert cache.get("k0") is None
+
+    # Larger than the whole budget: never written
+    cache.put("huge", b"x" * 3000)
+    assert "huge.json" not in _files(tmp_path)
+    assert cache.stats()["disk_bytes"] == 2000
+
+
+def test_budget_counts_files_from_before_a_restart(tmp_path):
+    old = PredictionCache(0, 0, 3600, str(tmp_path))
+    for i in range(3):
+        old.put(f"old{i}", b"y" * 1000)
+        # Distinct mtimes, so age order is unambiguous
+        past = time.time() - 100 + i
+        os.utime(tmp_path / f"old{i}.json", (past, past))
+
+    cache = PredictionCache(0, 0, 3600, str(tmp_path), disk_max_bytes=3500)
+    assert cache.disk_size == 3000
+    cache.put("new", b"z" * 1000)
+    assert _files(tmp_path) == {"old1.json", "old2.json", "new.json"}
+    assert cache.get("old2") == b"y" * 1000
+
+
+def test_zero_budget_is_unlimited(tmp_path):
+    cache = PredictionCache(0, 0, 3600, str(tmp_path), disk_max_bytes=0)
+    for i in range(4):
+        cache.put(f"k{i}", b"x" * 1000)
+    assert len(_files(tmp_path)) == 4
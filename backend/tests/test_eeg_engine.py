@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from backend.app.eeg_engine import ALL_TARGETS, FEATURE_DTYPE, NUM_FEATURES, compute_stats, predict_matrix
+
+
+@pytest.mark.parametrize("count", [1, 2, 64, 65, 129])
+def test_engine_matches_the_per_row_stub(count, predict_stub, eeg_rows):
+    for seed in range(5):
+        rows = eeg_rows(count, seed)
+        matrix = np.asarray(rows, dtype=FEATURE_DTYPE)
+        for target in ALL_TARGETS:
+            assert predict_matrix(matrix, target) == [predict_stub(row, target) for row in rows], (seed, target)
+
+
+@pytest.mark.parametrize("count", [1, 2, 64, 65])
+def test_row_sums_are_left_to_right(count, eeg_rows):
+    # Rounded results hide most differences; the means themselves must be exact
+    rows = eeg_rows(count, 7)
+    stats = compute_stats(np.asarray(rows, dtype=FEATURE_DTYPE))
+    assert stats.mean.tolist() == [sum(row) / NUM_FEATURES for row in rows]
+    assert stats.pos_mass.tolist() == [sum(x for x in row if x > 0) / NUM_FEATURES for row in rows]
+    assert stats.var.tolist() == [sum((x - m) ** 2 for x in row) / NUM_FEATURES for row, m in zip(rows, stats.mean.tolist())]
+
+
+def test_row_results_do_not_depend_on_their_block(eeg_edge_rows, predict_stub):
+    rows = eeg_edge_rows(300)
+    matrix = np.asarray(rows, dtype=FEATURE_DTYPE)
+    together = predict_matrix(matrix, "depression")
+    alone = [predict_matrix(matrix[i:i + 1], "depression")[0] for i in range(len(rows))]
+    assert together == alone == [predict_stub(row, "depression") for row in rows]
+
+
+def test_single_row_prediction_matches_the_stub(client, predict_stub, eeg_rows):
+    row = eeg_rows(1, 3)[0]
+    body = ",".join(f"f{i}" for i in range(NUM_FEATURES)) + "\n" + ",".join(f"{x:.4f}" for x in row) + "\n"
+    response = client.post("/api/eeg/predict/depression", files={"file": ("one.csv", body.encode())})
+    assert response.status_code == 200
+    assert response.json()["result"] == predict_stub(row, "depression")
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+from backend.app import eeg_jobs
+
+
+def _wait(client, job_id: str) -> dict:
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/eeg/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_job_runs_to_completion_with_final_counts(client, eeg_csv):
+    response = client.post("/api/eeg/jobs/depression", files={"file": ("rows.csv", eeg_csv(300))})
+    assert response.status_code == 202
+    job = _wait(client, response.json()["id"])
+    assert job["status"] == "done"
+    # Progress writes are throttled, but the final counts are always stored
+    assert job["rows_processed"] == 300
+    assert job["model_version"]
+
+    lines = client.get(f"/api/eeg/jobs/{job['id']}/results").text.splitlines()
+    records = [json.loads(line) for line in lines]
+    assert sum(len(r["results"]) for r in records if r["type"] == "results") == 300
+    assert records[-1]["type"] == "summary" and records[-1]["count"] == 300
+
+
+def test_cancelling_a_running_job_returns_it_cancelled(client, eeg_csv, monkeypatch):
+    async def stalled(units, targets, specs):
+        await asyncio.sleep(3600)
+        yield
+
+    monkeypatch.setattr(eeg_jobs.pool, "score_units", stalled)
+    response = client.post("/api/eeg/jobs/depression", files={"file": ("rows.csv", eeg_csv(10))})
+    job_id = response.json()["id"]
+    deadline = time.monotonic() + 30
+    while client.get(f"/api/eeg/jobs/{job_id}").json()["status"] != "running":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+    response = client.post(f"/api/eeg/jobs/{job_id}/cancel")
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+    assert client.get(f"/api/eeg/jobs/{job_id}").json()["status"] == "cancelled"
+    assert client.post(f"/api/eeg/jobs/{job_id}/cancel").status_code == 409
+    assert client.post("/api/eeg/jobs/missing/cancel").status_code == 404
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import shutil
+import sys
+import threading
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from backend.app import eeg_models
+from backend.app.eeg_engine import NUM_FEATURES
+from backend.app.eeg_models import ModelRegistry, ModelUnavailable, load_model
+from backend.app.eeg_pool import pool
+
+
+def _write_linear(root: str, version: str, bias: float) -> None:
+    path = os.path.join(root, "depression", version)
+    os.makedirs(path)
+    np.save(os.path.join(path, "weights.npy"), np.zeros(NUM_FEATURES))
+    with open(os.path.join(path, "model.json"), "w", encoding="utf-8") as fh:
+        json.dump({"kind": "linear", "bias": bias}, fh)
+
+
+def _depression(registry: ModelRegistry):
+    return registry.specs(["depression"])["depression"]
+
+
+def test_pinned_version_outlives_a_hot_swap(tmp_path, monkeypatch):
+    monkeypatch.setattr(eeg_models, "_loaded", eeg_models.OrderedDict())
+    root = str(tmp_path)
+    _write_linear(root, "1", 0.0)
+    registry = ModelRegistry(root)
+    assert registry.load() == {}
+    pinned = _depression(registry)
+
+    _write_linear(root, "2", 1.0)
+    assert registry.load() == {}
+    assert _depression(registry).version == "2"
+    # The upload that pinned version 1 still finds it loaded, files or not
+    shutil.rmtree(pinned.path)
+    assert load_model(pinned).bias == 0.0
+
+    matrix = np.zeros((2, NUM_FEATURES), dtype=np.float32)
+    scored = asyncio.run(pool.score(matrix, ["depression"], {"depression": pinned}))
+    assert len(scored) == 2
+
+
+def test_evicted_version_without_files_is_a_409(tmp_path, monkeypatch):
+    monkeypatch.setattr(eeg_models, "_loaded", eeg_models.OrderedDict())
+    monkeypatch.setattr(eeg_models, "EEG_MODEL_VERSIONS_KEPT", 2)
+    root = str(tmp_path)
+    _write_linear(root, "1", 0.0)
+    registry = ModelRegistry(root)
+    registry.load()
+    pinned = _depression(registry)
+    for version in ("2", "3"):
+        _write_linear(root, version, 1.0)
+        registry.load()
+    assert pinned not in eeg_models._loaded
+    shutil.rmtree(pinned.path)
+
+    with pytest.raises(ModelUnavailable):
+        load_model(pinned)
+    matrix = np.zeros((1, NUM_FEATURES), dtype=np.float32)
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(pool.score(matrix, ["depression"], {"depression": pinned}))
+    assert raised.value.status_code == 409
+    assert "depression linear@1" in raised.value.detail
+
+
+def test_concurrent_loads_and_reloads_keep_the_cache_consistent(tmp_path, monkeypatch):
+    monkeypatch.setattr(eeg_models, "_loaded", eeg_models.OrderedDict())
+    monkeypatch.setattr(eeg_models, "EEG_MODEL_VERSIONS_KEPT", 1)
+    root = str(tmp_path)
+    for version in ("1", "2", "3", "4"):
+        _write_linear(root, version, float(version))
+    registry = ModelRegistry(root)
+    registry.load()
+    specs = [eeg_models.ModelSpec(target="depression", kind="linear", version=v, path=os.path.join(root, "depression", v)) for v in ("1", "2", "3", "4")]
+    errors = []
+
+    def load(offset: int) -> None:
+        try:
+            for i in range(1000):
+                spec = specs[(i + offset) % len(specs)]
+                assert load_model(spec).bias == float(spec.version)
+                if i % 50 == 0:
+                    assert registry.load() == {}
+        except Exception as exc:
+            errors.append(exc)
+
+    # Switch threads as often as possible to surface races
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=load, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(eeg_models._loaded) == 1
+    assert _depression(registry).version == "4"
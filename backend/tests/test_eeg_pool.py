@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backend.app import eeg_pool
+from backend.app.eeg_engine import NUM_FEATURES, ScoredUnit
+from backend.app.eeg_pool import ScoringPool
+
+
+async def _units(count: int):
+    for _ in range(count):
+        yield np.zeros((2, NUM_FEATURES), dtype=np.float32)
+        await asyncio.sleep(0)
+
+
+def test_pending_units_never_exceed_the_bound(monkeypatch):
+    pool = ScoringPool(workers=2, max_pending=3, inline_bytes=0)
+    executor = ThreadPoolExecutor(max_workers=8)
+    monkeypatch.setattr(pool, "_get_executor", lambda: executor)
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def predict_unit(unit, targets, specs):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return ScoredUnit({t: [{}] * unit.shape[0] for t in targets})
+
+    monkeypatch.setattr(eeg_pool, "predict_unit", predict_unit)
+
+    async def upload() -> int:
+        return sum([len(scored) async for scored in pool.score_units(_units(6), ["depression"], {})])
+
+    async def run() -> list:
+        # Four uploads passed check_capacity together, each with two units in flight
+        highest = 0
+
+        async def watch() -> None:
+            nonlocal highest
+            while True:
+                highest = max(highest, pool.pending)
+                await asyncio.sleep(0)
+
+        watcher = asyncio.create_task(watch())
+        rows = await asyncio.gather(*(upload() for _ in range(4)))
+        watcher.cancel()
+        assert highest == 3
+        return rows
+
+    try:
+        assert asyncio.run(run()) == [12] * 4
+    finally:
+        executor.shutdown()
+    assert running[1] <= 3
+    assert pool.pending == 0
+
+
+def test_cancelled_waiters_give_back_nothing():
+    pool = ScoringPool(workers=1, max_pending=1, inline_bytes=0)
+
+    async def run() -> None:
+        await pool._acquire()
+        waiter = asyncio.create_task(pool._acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert pool.pending == 1
+        pool._release()
+        assert pool.pending == 0
+        assert not pool._waiting
+
+    asyncio.run(run())
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+
+def test_unseeded_samples_differ_and_are_not_cached(client):
+    first = client.get("/api/eeg/sample", params={"rows": 3})
+    second = client.get("/api/eeg/sample", params={"rows": 3})
+    assert first.status_code == second.status_code == 200
+    assert first.text.splitlines()[0] == second.text.splitlines()[0]
+    assert first.text != second.text
+    assert len(first.text.splitlines()) == 4
+    assert first.headers["cache-control"] == "no-store"
+    assert "etag" not in first.headers
+
+
+def test_seeded_samples_are_reproducible(client):
+    first = client.get("/api/eeg/sample.csv", params={"rows": 3, "seed": 7})
+    second = client.get("/api/eeg/sample.csv", params={"rows": 3, "seed": 7})
+    assert first.content == second.content
+    assert first.headers["etag"] == second.headers["etag"]
+    again = client.get("/api/eeg/sample.csv", params={"rows": 3, "seed": 7}, headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
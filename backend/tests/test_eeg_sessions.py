@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from backend.app.db import session_scope
+from backend.app.eeg_sessions import sessions
+from backend.app.models import EegSegment
+
+
+def _append(client, session_id: str, body: bytes):
+    return client.post(
+        f"/api/eeg/sessions/{session_id}/segments",
+        params={"targets": "depression"},
+        files={"file": ("rows.csv", body)},
+    )
+
+
+def test_concurrent_appends_get_distinct_segments(client, eeg_csv):
+    session_id = client.post("/api/eeg/sessions", json={"name": "concurrent"}).json()["id"]
+    with ThreadPoolExecutor(4) as executor:
+        responses = list(executor.map(lambda seed: _append(client, session_id, eeg_csv(50 + seed, seed)), range(4)))
+    assert [r.status_code for r in responses] == [201] * 4
+    assert sorted(r.json()["seq"] for r in responses) == [0, 1, 2, 3]
+
+    record = client.get(f"/api/eeg/sessions/{session_id}").json()
+    assert record["segments"] == 4 and record["rows"] == 50 * 4 + 6
+    assert client.get(f"/api/eeg/sessions/{session_id}/features").json()["count"] == record["rows"]
+    for seq in range(4):
+        assert client.get(f"/api/eeg/sessions/{session_id}/segments/{seq}/features").status_code == 200
+
+
+def test_failed_append_leaves_moments_and_no_files(client, eeg_csv):
+    session_id = client.post("/api/eeg/sessions", json={"name": "failed"}).json()["id"]
+    assert _append(client, session_id, eeg_csv(20)).status_code == 201
+    before = client.get(f"/api/eeg/sessions/{session_id}/features").json()
+
+    header_only = eeg_csv(0)
+    assert _append(client, session_id, header_only).status_code == 400
+    assert client.get(f"/api/eeg/sessions/{session_id}/features").json() == before
+    assert not [name for name in os.listdir(sessions.session_dir(session_id)) if name.endswith(".tmp")]
+
+
+def test_segment_sequence_numbers_are_unique(client):
+    session_id = client.post("/api/eeg/sessions", json={"name": "unique"}).json()["id"]
+
+    def segment() -> EegSegment:
+        return EegSegment(session_id=session_id, seq=0, filename="", rows=1, targets="", models="{}", target_stats="{}")
+
+    with session_scope() as session:
+        session.add(segment())
+    with pytest.raises(IntegrityError):
+        with session_scope() as session:
+            session.add(segment())
+
+
+def test_feature_moments_change_with_the_segment_count(client, eeg_csv, monkeypatch):
+    session_id = client.post("/api/eeg/sessions", json={"name": "atomic"}).json()["id"]
+    assert _append(client, session_id, eeg_csv(20)).status_code == 201
+    before = client.get(f"/api/eeg/sessions/{session_id}/features").json()
+
+    real_replace = os.replace
+
+    def failing_replace(source, target):
+        if os.path.basename(target).startswith("features."):
+            raise OSError("disk full")
+        real_replace(source, target)
+
+    # Renaming the moments fails, so the segment must not be committed either
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        _append(client, session_id, eeg_csv(30, 1))
+    monkeypatch.setattr(os, "replace", real_replace)
+
+    record = client.get(f"/api/eeg/sessions/{session_id}").json()
+    assert (record["segments"], record["rows"]) == (1, 20)
+    assert client.get(f"/api/eeg/sessions/{session_id}/features").json() == before
+    assert sorted(os.listdir(sessions.session_dir(session_id))) == ["000000.f32", "000000.scores.f32", "features.000001.npz"]
+
+    for seed in range(3):
+        assert _append(client, session_id, eeg_csv(10, seed)).status_code == 201
+    assert client.get(f"/api/eeg/sessions/{session_id}/features").json()["count"] == 50
+    # The current moments and the previous ones, for readers of the old row
+    assert [n for n in sorted(os.listdir(sessions.session_dir(session_id))) if n.endswith(".npz")] == ["features.000003.npz", "features.000004.npz"]
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import io
+import time
+
+import numpy as np
+
+from backend.app.eeg_engine import NUM_FEATURES
+
+
+def _npy(matrix: np.ndarray) -> bytes:
+    out = io.BytesIO()
+    np.save(out, matrix)
+    return out.getvalue()
+
+
+def _with_non_finite(eeg_rows, count: int) -> np.ndarray:
+    matrix = np.asarray(eeg_rows(count, 11), dtype=np.float32)
+    matrix[1, 0] = np.nan
+    matrix[4, NUM_FEATURES - 1] = np.inf
+    matrix[7, 3] = -np.inf
+    return matrix
+
+
+def test_non_finite_binary_rows_are_left_out_of_batches(client, eeg_rows, predict_stub):
+    matrix = _with_non_finite(eeg_rows, 10)
+    finite = [row for i, row in enumerate(matrix.astype(np.float64).tolist()) if i not in (1, 4, 7)]
+    for target in ("severity", "depression"):
+        response = client.post(f"/api/eeg/predict/batch/{target}", files={"file": ("rows.npy", _npy(matrix))})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["count"] == 7
+        assert body["results"] == [predict_stub(row, target) for row in finite]
+
+
+def test_non_finite_binary_rows_are_counted_as_rejected_by_jobs(client, eeg_rows):
+    response = client.post("/api/eeg/jobs/severity", files={"file": ("rows.npy", _npy(_with_non_finite(eeg_rows, 10)))})
+    assert response.status_code == 202
+    deadline = time.monotonic() + 30
+    job = response.json()
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = client.get(f"/api/eeg/jobs/{job['id']}").json()
+    assert job["status"] == "done"
+    assert job["rows_processed"] == 7
+    assert job["rows_rejected"] == 3
+
+
+def test_non_finite_single_row_predictions_are_rejected(client, eeg_rows):
+    # The first row of the upload is the one predicted
+    matrix = _with_non_finite(eeg_rows, 10)[1:]
+    response = client.post("/api/eeg/predict/severity", files={"file": ("row.npy", _npy(matrix))})
+    assert response.status_code == 400
+
+    row = ",".join(["nan"] + ["0.1"] * (NUM_FEATURES - 1))
+    response = client.post("/api/eeg/predict/severity", files={"file": ("row.csv", row.encode())})
+    assert response.status_code == 400
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from sqlmodel import Session
+
+from backend.app import journal_search
+from backend.app.db import engine
+from backend.app.pagination import NEXT_CURSOR_HEADER
+
+
+def test_entry_deleted_between_rank_and_snippets_is_skipped(client, monkeypatch):
+    ids = [
+        client.post("/api/journal/", json={"title": f"zephyrine {i}", "content": "a zephyrine morning"}).json()["id"]
+        for i in range(3)
+    ]
+    ranked_query = journal_search._RANKED
+    with Session(engine) as session:
+        execute = session.execute
+
+        def racing(statement, params=None, *args, **kwargs):
+            result = execute(statement, params, *args, **kwargs)
+            if statement is not ranked_query:
+                return result
+            rows = result.all()
+            # Another request deletes a ranked entry before its snippet is read
+            assert client.delete(f"/api/journal/{rows[0].id}").status_code == 204
+            return SimpleNamespace(all=lambda: rows)
+
+        monkeypatch.setattr(session, "execute", racing)
+        hits, more = journal_search.search(session, "zephyrine", 2, 0)
+
+    assert len(hits) == 1
+    assert hits[0]["id"] in ids
+    assert "<mark>" in hits[0]["snippet"]
+    # The page still knows a third match follows
+    assert more
+
+
+def test_search_pages_follow_the_cursor(client):
+    for i in range(5):
+        client.post("/api/journal/", json={"title": f"quillwort {i}", "content": "notes on quillwort"})
+    seen, cursor = [], None
+    while True:
+        params = {"q": "quillwort", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/journal/search", params=params)
+        assert response.status_code == 200
+        seen.extend(hit["id"] for hit in response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 5
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.lazy_router import LazyRouter
+
+
+def _app(module: str) -> FastAPI:
+    app = FastAPI()
+    app.router.routes.append(LazyRouter(app, "/api/resources", module, prefix="/api"))
+    return app
+
+
+def test_failed_import_is_raised_again_on_every_request():
+    client = TestClient(_app("backend.app.routers.missing"))
+    for _ in range(2):
+        with pytest.raises(ModuleNotFoundError):
+            client.get("/api/resources/")
+
+
+def test_router_replaces_placeholder_on_first_request():
+    app = _app("backend.app.routers.resources")
+    client = TestClient(app)
+    assert client.get("/api/resources/").status_code == 200
+    assert not any(isinstance(route, LazyRouter) for route in app.router.routes)
+    assert client.get("/api/resources/").status_code == 200
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+
+from backend.app import metrics
+from backend.app.metrics import MetricsMiddleware
+
+
+def _count(text: str, name: str, **labels: str) -> float:
+    # Summed over every series of ``name`` carrying ``labels``
+    total = 0.0
+    for line in text.splitlines():
+        series, _, value = line.rpartition(" ")
+        if series != name and not series.startswith(name + "{"):
+            continue
+        if all(f'{k}="{v}"' in series for k, v in labels.items()):
+            total += float(value)
+    return total
+
+
+def test_routes_are_labelled_by_template(client):
+    client.get("/api/moods/987654")
+    client.get("/index.html")
+    client.get("/no/such/page")
+    text = client.get("/metrics").text
+    assert _count(text, "http_requests_total", route="/api/moods/{entry_id}", status="404") >= 1
+    assert _count(text, "http_requests_total", route="static", status="200") >= 1
+    assert _count(text, "http_requests_total", route="unmatched", status="404") >= 1
+    assert 'route="/api/moods/987654"' not in text
+
+
+def test_score_time_is_split_by_block_and_request(client, eeg_csv):
+    before = client.get("/metrics").text
+    response = client.post("/api/eeg/predict/batch/depression", files={"file": ("rows.csv", eeg_csv(20))})
+    assert response.status_code == 200
+    after = client.get("/metrics").text
+    for name in ("eeg_unit_score_seconds_count", "eeg_request_score_seconds_count"):
+        assert _count(after, name) > _count(before, name)
+    assert _count(after, "eeg_request_score_seconds_count") - _count(before, "eeg_request_score_seconds_count") == 1
+    assert "eeg_score_seconds" not in after
+
+
+def test_malformed_content_length_is_ignored():
+    async def app(scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message) -> None:
+        sent.append(message)
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b""}
+
+    route = "unmatched"
+    before = metrics.http_request_size.count(route=route)
+    for value in (b"abc", b"-5", b"nan"):
+        scope = {"type": "http", "method": "POST", "path": "/x", "headers": [(b"content-length", value)]}
+        asyncio.run(MetricsMiddleware(app)(scope, receive, send))
+    assert [m["status"] for m in sent if m["type"] == "http.response.start"] == [204] * 3
+    assert metrics.http_request_size.count(route=route) == before
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+
+WINDOW = {"since": "2002-05-01", "until": "2002-06-01"}
+
+
+def _expected(client, window: int) -> list:
+    # Daily stats recomputed from the entries themselves
+    response = client.get("/api/moods/", params={
+        "since": f"{WINDOW['since']}T00:00:00", "until": f"{WINDOW['until']}T00:00:00", "limit": 500,
+    })
+    assert response.status_code == 200
+    days = defaultdict(list)
+    for row in response.json():
+        days[row["created_at"][:10]].append(row["mood_score"])
+    expected, history = [], []
+    for day in sorted(days):
+        scores = days[day]
+        history.append(scores)
+        recent = [s for bucket in history[-window:] for s in bucket]
+        expected.append({
+            "start": day,
+            "count": len(scores),
+            "mean": round(sum(scores) / len(scores), 2),
+            "min": min(scores),
+            "max": max(scores),
+            "rolling_mean": round(sum(recent) / len(recent), 2),
+        })
+    return expected
+
+
+def _stats(client, window: int = 3) -> list:
+    response = client.get("/api/moods/stats", params=dict(WINDOW, period="day", window=window))
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_rollups_follow_imports_updates_and_deletes(client):
+    rows = [
+        {"mood_score": score, "created_at": f"2002-05-{day:02d}T{hour:02d}:00:00"}
+        for day, hour, score in [(3, 9, 2), (3, 18, 7), (4, 10, 5), (6, 8, 9), (6, 12, 1), (6, 20, 4), (9, 7, 6)]
+    ]
+    body = "\n".join(json.dumps(row) for row in rows).encode("utf-8")
+    response = client.post("/api/moods/import", files={"file": ("moods.ndjson", body)})
+    assert response.status_code == 200
+    assert _stats(client) == _expected(client, 3)
+
+    entries = client.get("/api/moods/", params={
+        "since": "2002-05-01T00:00:00", "until": "2002-06-01T00:00:00", "limit": 500,
+    }).json()
+    by_time = {row["created_at"][:13]: row["id"] for row in entries}
+
+    # Raising the day's minimum and changing only a note
+    assert client.patch(f"/api/moods/{by_time['2002-05-06T12']}", json={"mood_score": 8}).status_code == 200
+    assert client.patch(f"/api/moods/{by_time['2002-05-03T09']}", json={"note": "edited"}).status_code == 200
+    stats = _stats(client)
+    assert stats == _expected(client, 3)
+    assert next(b for b in stats if b["start"] == "2002-05-06")["min"] == 4
+
+    # Deleting the only entry of a day drops its bucket
+    assert client.delete(f"/api/moods/{by_time['2002-05-04T10']}").status_code == 204
+    assert client.delete(f"/api/moods/{by_time['2002-05-06T08']}").status_code == 204
+    stats = _stats(client)
+    assert stats == _expected(client, 3)
+    assert [b["start"] for b in stats] == ["2002-05-03", "2002-05-06", "2002-05-09"]
+    assert next(b for b in stats if b["start"] == "2002-05-06")["max"] == 8
+
+
+def test_week_buckets_sum_their_days(client):
+    rows = [{"mood_score": day % 10 + 1, "created_at": f"2002-07-{day:02d}T12:00:00"} for day in range(1, 20)]
+    body = "\n".join(json.dumps(row) for row in rows).encode("utf-8")
+    assert client.post("/api/moods/import", files={"file": ("moods.ndjson", body)}).status_code == 200
+    window = {"since": "2002-07-01", "until": "2002-08-01", "window": 1}
+    days = client.get("/api/moods/stats", params=dict(window, period="day")).json()
+    weeks = client.get("/api/moods/stats", params=dict(window, period="week")).json()
+    # Weeks start on Monday, as 2002-07-01 did
+    assert len(days) == 19
+    assert [b["start"] for b in weeks] == ["2002-07-01", "2002-07-08", "2002-07-15"]
+    assert sum(b["count"] for b in weeks) == sum(b["count"] for b in days) == 19
+    assert min(b["min"] for b in weeks) == 1
+    assert max(b["max"] for b in weeks) == 10
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+
+from backend.app.pagination import NEXT_CURSOR_HEADER
+
+WINDOW = {"since": "2001-01-01T00:00:00", "until": "2001-02-01T00:00:00"}
+
+
+def _import(client, rows: list) -> None:
+    body = "\n".join(json.dumps(row) for row in rows).encode("utf-8")
+    response = client.post("/api/moods/import", files={"file": ("moods.ndjson", body)})
+    assert response.status_code == 200
+    assert response.json()["imported"] == len(rows)
+
+
+def test_cursor_pages_cover_window_once_newest_first(client):
+    # Groups of three share a timestamp, so pages split ties and fall back on id
+    _import(client, [
+        {"mood_score": i % 10 + 1, "note": f"page {i}", "created_at": f"2001-01-{i // 3 + 1:02d}T12:00:00"}
+        for i in range(23)
+    ])
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = dict(WINDOW, limit=5, **({"cursor": cursor} if cursor else {}))
+        response = client.get("/api/moods/", params=params)
+        assert response.status_code == 200
+        seen.extend(response.json())
+        pages += 1
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+
+    assert pages == 5
+    ids = [row["id"] for row in seen]
+    assert len(ids) == len(set(ids)) == 23
+    keys = [(row["created_at"], row["id"]) for row in seen]
+    assert keys == sorted(keys, reverse=True)
+    assert sorted(row["note"] for row in seen) == sorted(f"page {i}" for i in range(23))
+
+
+def test_cursor_survives_newer_rows_and_projection(client):
+    _import(client, [{"mood_score": 5, "created_at": f"2001-03-{i + 1:02d}T08:00:00"} for i in range(6)])
+    window = {"since": "2001-03-01T00:00:00", "until": "2001-04-01T00:00:00"}
+    first = client.get("/api/moods/", params=dict(window, limit=3, fields="mood_score"))
+    assert first.status_code == 200
+    assert all(set(row) == {"id", "created_at", "mood_score"} for row in first.json())
+
+    # A row landing ahead of the cursor does not shift the next page
+    _import(client, [{"mood_score": 9, "created_at": "2001-03-20T08:00:00"}])
+    second = client.get("/api/moods/", params=dict(window, limit=3, cursor=first.headers[NEXT_CURSOR_HEADER]))
+    assert second.status_code == 200
+    assert [row["created_at"][:10] for row in second.json()] == ["2001-03-03", "2001-03-02", "2001-03-01"]
+    assert NEXT_CURSOR_HEADER not in second.headers
+
+
+def test_invalid_cursor_and_fields_are_rejected(client):
+    assert client.get("/api/moods/", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/api/moods/", params={"fields": "mood_score,nope"}).status_code == 400